@@ -6,11 +6,15 @@ NoneBot 相关的依赖注入。
 from .dependencies import (
     DataManagerDep,
     JmServiceDep,
+    JobsDep,
     SessionsDep,
+    UploadsDep,
 )
 
 __all__ = [
     "DataManagerDep",
     "JmServiceDep",
+    "JobsDep",
     "SessionsDep",
+    "UploadsDep",
 ]
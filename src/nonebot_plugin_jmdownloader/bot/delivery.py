@@ -0,0 +1,152 @@
+"""下载文件并上传
+
+命令处理器（即时模式）和 JobRunner（后台任务模式）共用的下载上传流程：
+准备输出文件、固定后上传、本子集逐章节上传及逐章节失败提示。
+调用方只决定上传目标、通知方式和失败后的处理。
+"""
+
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from jmcomic import JmAlbumDetail, JmPhotoDetail
+from nonebot import logger
+from nonebot.adapters.onebot.v11 import ActionFailed, Bot
+
+from ..core.enums import DownloadPriority
+from ..infra.data_manager import DataManager
+from ..infra.jm_service import JMService
+from .nonebot_utils import UploadLimiter
+
+DOWNLOAD_FAILED = "下载失败"
+UPLOAD_FAILED = "发送文件失败"
+
+
+@dataclass(frozen=True)
+class UploadTarget:
+    """上传目标：group_id 不为 None 时上传到群文件（folder_id 为群文件夹），否则私聊
+
+    Attributes:
+        user_id: 请求者
+        group_id: 群号，私聊为 None
+        folder_id: 群文件夹 ID
+    """
+
+    user_id: int
+    group_id: int | None = None
+    folder_id: str | None = None
+
+    @classmethod
+    def of(
+        cls, dm: DataManager, user_id: int, group_id: int | None = None
+    ) -> "UploadTarget":
+        """按群配置的文件夹构建上传目标"""
+        folder_id = dm.get_group(group_id).folder_id if group_id is not None else None
+        return cls(user_id, group_id, folder_id)
+
+
+class FileDelivery:
+    """下载并上传一个本子或本子集到指定会话"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        jm: JMService,
+        uploads: UploadLimiter,
+        target: UploadTarget,
+        notify: Callable[[str], Awaitable[object]],
+        *,
+        queue_key: str = "",
+        priority: DownloadPriority = DownloadPriority.NORMAL,
+    ):
+        """
+        Args:
+            bot: 上传使用的 Bot
+            jm: 下载服务
+            uploads: 上传并发限制
+            target: 上传目标
+            notify: 发送提示消息（本子集逐章节上传时的单章失败提示）
+            queue_key: 下载调度的轮询分组
+            priority: 下载调度优先级
+        """
+        self.bot = bot
+        self.jm = jm
+        self.uploads = uploads
+        self.target = target
+        self.notify = notify
+        self.queue_key = queue_key
+        self.priority = priority
+
+    async def photo(self, photo: JmPhotoDetail) -> str | None:
+        """下载并上传本子，成功返回 None，失败返回 DOWNLOAD_FAILED 或 UPLOAD_FAILED"""
+        try:
+            result = await self.jm.prepare_photo_file(
+                photo, queue_key=self.queue_key, priority=self.priority
+            )
+        except Exception:
+            logger.warning(f"下载本子失败: photo_id={photo.id}", exc_info=True)
+            return DOWNLOAD_FAILED
+        if result is None:
+            return DOWNLOAD_FAILED
+        file_path, ext = result
+        if not await self._upload(file_path, f"{photo.id}{ext}"):
+            return UPLOAD_FAILED
+        return None
+
+    async def album(
+        self, album: JmAlbumDetail, episodes: list[int] | None, *, stream: bool
+    ) -> str | None:
+        """下载并上传本子集，成功返回 None，失败返回 DOWNLOAD_FAILED 或 UPLOAD_FAILED
+
+        stream: 逐章节打包上传，任一章节上传成功即视为成功
+        """
+        if stream:
+            return await self._stream_album(album, episodes)
+        try:
+            result = await self.jm.prepare_album_file(
+                album, episodes, queue_key=self.queue_key, priority=self.priority
+            )
+        except Exception:
+            logger.warning(f"下载本子集失败: album_id={album.id}", exc_info=True)
+            return DOWNLOAD_FAILED
+        if result is None:
+            return DOWNLOAD_FAILED
+        file_path, ext = result
+        name = f"{self.jm.get_album_output_name(album, episodes)}{ext}"
+        if not await self._upload(file_path, name):
+            return UPLOAD_FAILED
+        return None
+
+    async def _stream_album(
+        self, album: JmAlbumDetail, episodes: list[int] | None
+    ) -> str | None:
+        """逐章节打包上传本子集，后续章节在上传期间继续下载"""
+        uploaded = 0
+        async for index, result in self.jm.stream_album_files(
+            album, episodes, queue_key=self.queue_key, priority=self.priority
+        ):
+            if result is None:
+                await self.notify(f"第{index + 1}话下载失败")
+                continue
+            file_path, ext = result
+            name = f"{self.jm.get_album_output_name(album, [index])}{ext}"
+            if await self._upload(file_path, name):
+                uploaded += 1
+            else:
+                await self.notify(f"第{index + 1}话发送失败")
+        return None if uploaded else DOWNLOAD_FAILED
+
+    async def _upload(self, file_path: str, name: str) -> bool:
+        try:
+            with self.jm.hold_file(file_path):
+                await self.uploads.upload_to(
+                    self.bot,
+                    file_path,
+                    name,
+                    user_id=self.target.user_id,
+                    group_id=self.target.group_id,
+                    folder_id=self.target.folder_id,
+                )
+        except ActionFailed:
+            logger.warning(f"上传文件失败: name={name}")
+            return False
+        return True
@@ -11,17 +11,21 @@ from typing import Annotated
 
 from jmcomic import JmAlbumDetail, JmPhotoDetail, MissingAlbumPhotoException
 from nonebot import get_driver, get_plugin_config, logger, require
-from nonebot.adapters.onebot.v11 import Message
+from nonebot.adapters.onebot.v11 import Bot, Message
 from nonebot.matcher import Matcher
 from nonebot.params import CommandArg, Depends
 
 from ..config import PluginConfig
 from ..infra.data_manager import DataManager
+from ..infra.image_utils import shutdown_image_workers, start_image_workers
 from ..infra.jm_service import (
     JMOptionContext,
     JMService,
 )
+from ..infra.job_journal import JobJournal
 from ..infra.search_session import SessionCache
+from .job_runner import JobRunner
+from .nonebot_utils import UploadLimiter
 
 # 确保依赖插件已加载
 require("nonebot_plugin_localstore")
@@ -68,14 +72,32 @@ _cache_dir = get_plugin_cache_dir().as_posix()
 
 _jm_option_config = JMOptionContext(
     cache_dir=_cache_dir,
+    shared_cache_dir=plugin_config.jmcomic_shared_cache_dir,
     output_format=plugin_config.jmcomic_output_format,
     zip_password=plugin_config.jmcomic_zip_password,
     log=plugin_config.jmcomic_log,
     proxies=plugin_config.jmcomic_proxies,
     thread_count=plugin_config.jmcomic_thread_count,
+    image_download_workers=plugin_config.jmcomic_image_download_workers,
     username=plugin_config.jmcomic_username,
     password=plugin_config.jmcomic_password,
     modify_md5=plugin_config.jmcomic_modify_real_md5,
+    max_concurrent_downloads=plugin_config.jmcomic_max_concurrent_downloads,
+    cache_max_bytes=plugin_config.jmcomic_cache_max_size * 1024 * 1024,
+    image_store_max_bytes=plugin_config.jmcomic_image_cache_max_size * 1024 * 1024,
+    cache_max_age=plugin_config.jmcomic_cache_max_age * 3600,
+    cover_timeout=plugin_config.jmcomic_cover_timeout,
+    cover_hedge_delay=plugin_config.jmcomic_cover_hedge_delay,
+    cover_cache_memory_bytes=plugin_config.jmcomic_cover_cache_memory * 1024 * 1024,
+    cover_cache_ttl=plugin_config.jmcomic_cover_cache_ttl * 3600,
+    cover_max_edge=plugin_config.jmcomic_cover_max_edge,
+    cover_quality=plugin_config.jmcomic_cover_quality,
+    cover_format=plugin_config.jmcomic_cover_format,
+    metadata_cache_size=plugin_config.jmcomic_metadata_cache_size,
+    metadata_cache_ttl=plugin_config.jmcomic_metadata_cache_ttl * 60,
+    search_cache_ttl=plugin_config.jmcomic_search_cache_ttl * 60,
+    search_concurrency=plugin_config.jmcomic_search_concurrency,
+    search_deadline=plugin_config.jmcomic_search_deadline,
 )
 _jm_service = JMService(_jm_option_config, logger)
 
@@ -91,6 +113,22 @@ async def _warmup_jm_client():
     task.add_done_callback(_background_tasks.discard)
 
 
+@get_driver().on_startup
+async def _start_image_workers():
+    """启动图片处理进程池（配置为 0 时使用线程池），在线程中拉起子进程不阻塞启动。"""
+    if await asyncio.to_thread(
+        start_image_workers, plugin_config.jmcomic_image_workers
+    ):
+        logger.info(f"已启动 {plugin_config.jmcomic_image_workers} 个图片处理进程")
+
+
+@get_driver().on_shutdown
+async def _close_jm_service():
+    """关闭时释放 JMService 的网络连接和图片处理进程池。"""
+    await _jm_service.aclose()
+    shutdown_image_workers()
+
+
 def get_jm_service() -> JMService:
     """获取共享的 JMService。"""
     return _jm_service
@@ -134,6 +172,62 @@ SessionsDep = Annotated[SessionCache, Depends(get_sessions)]
 
 # endregion
 
+# region Uploads
+
+_uploads = UploadLimiter(plugin_config.jmcomic_upload_concurrency)
+
+
+def get_uploads() -> UploadLimiter:
+    """获取 UploadLimiter 实例"""
+    return _uploads
+
+
+UploadsDep = Annotated[UploadLimiter, Depends(get_uploads)]
+
+# endregion
+
+# region Jobs
+
+_jobs = JobRunner(
+    JobJournal(get_plugin_data_dir() / "jobs.db"),
+    _jm_service,
+    _data_manager,
+    _uploads,
+    stream_album=plugin_config.jmcomic_album_stream_episodes,
+)
+
+
+@get_driver().on_startup
+async def _resume_jobs():
+    """恢复上次运行未结束的后台任务，任务在对应 Bot 连接后开始执行。"""
+    if count := _jobs.resume():
+        logger.info(f"已恢复 {count} 个未完成的下载任务")
+
+
+@get_driver().on_bot_connect
+async def _wake_jobs(bot: Bot):
+    """Bot 连接后开始执行等待它的后台任务。"""
+    _jobs.bot_connected(bot)
+
+
+@get_driver().on_shutdown
+async def _stop_jobs():
+    """取消进行中的后台任务，下次启动时继续。
+
+    关闭钩子按注册的逆序执行，先于 JMService 关闭，任务不会因连接关闭而被记为失败。
+    """
+    await _jobs.aclose()
+
+
+def get_jobs() -> JobRunner:
+    """获取 JobRunner 实例"""
+    return _jobs
+
+
+JobsDep = Annotated[JobRunner, Depends(get_jobs)]
+
+# endregion
+
 # region ArgText
 
 
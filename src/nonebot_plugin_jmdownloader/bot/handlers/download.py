@@ -1,6 +1,7 @@
 """下载命令处理
 
 jm下载 和 jm本子集 命令，群聊和私聊统一处理。
+开启后台任务模式时，前置检查通过后提交后台任务并结束处理，下载、上传和扣减次数由 JobRunner 完成。
 """
 
 from jmcomic import JmAlbumDetail, JmPhotoDetail
@@ -18,7 +19,11 @@ from nonebot.adapters.onebot.v11.permission import GROUP_ADMIN, GROUP_OWNER
 from nonebot.matcher import Matcher
 from nonebot.permission import SUPERUSER
 
-from .. import DataManagerDep, JmServiceDep
+from ...core.download_job import DownloadJob
+from ...core.enums import DownloadPriority, JobKind
+from ...infra.download_scheduler import QueueSnapshot
+from .. import DataManagerDep, JmServiceDep, JobsDep, UploadsDep
+from ..delivery import UPLOAD_FAILED, FileDelivery, UploadTarget
 from ..dependencies import AlbumWithSelection, Photo, plugin_config
 from .common import group_enabled_check, private_enabled_check
 
@@ -35,12 +40,15 @@ async def user_blacklist_check(
 
 
 async def download_limit_check(
-    bot: Bot, event: MessageEvent, matcher: Matcher, dm: DataManagerDep
+    bot: Bot, event: MessageEvent, matcher: Matcher, dm: DataManagerDep, jobs: JobsDep
 ):
-    """下载次数检查：检查用户是否有剩余下载次数（群聊和私聊都触发）"""
+    """下载次数检查：检查用户是否有剩余下载次数（群聊和私聊都触发）
+
+    未完成的后台任务完成后才扣次数，检查时预先计入。
+    """
     if await SUPERUSER(bot, event):
         return  # 超管不限制
-    if not dm.users.has_limit(event.user_id, dm.default_user_limit):
+    if remaining_limit(event, dm, jobs) <= 0:
         await matcher.finish("你的下载次数已经用完了！")
 
 
@@ -49,11 +57,70 @@ async def download_limit_check(
 # region 辅助函数
 
 
+def remaining_limit(event: MessageEvent, dm: DataManagerDep, jobs: JobsDep) -> int:
+    """用户剩余下载次数，扣除未完成的后台任务"""
+    limit = dm.users.get_limit(event.user_id, dm.default_user_limit)
+    return limit - jobs.pending_charges(event.user_id)
+
+
+async def submit_job(
+    bot: Bot,
+    event: MessageEvent,
+    jobs: JobsDep,
+    kind: JobKind,
+    jm_id: str,
+    episodes: list[int] | None = None,
+) -> DownloadJob:
+    """提交后台下载任务，超管走高优先级通道且不扣次数"""
+    is_su = await SUPERUSER(bot, event)
+    return jobs.submit(
+        DownloadJob(
+            kind=kind,
+            jm_id=jm_id,
+            bot_id=bot.self_id,
+            user_id=event.user_id,
+            group_id=event.group_id if isinstance(event, GroupMessageEvent) else None,
+            episodes=episodes,
+            priority=DownloadPriority.HIGH if is_su else DownloadPriority.NORMAL,
+            charge=not is_su,
+        )
+    )
+
+
+def download_queue_key(event: MessageEvent) -> str:
+    """下载调度的轮询分组：群聊按群，私聊按用户"""
+    if isinstance(event, GroupMessageEvent):
+        return f"group_{event.group_id}"
+    return f"private_{event.user_id}"
+
+
+async def download_priority(bot: Bot, event: MessageEvent) -> DownloadPriority:
+    """下载调度优先级：超管走高优先级通道"""
+    if await SUPERUSER(bot, event):
+        return DownloadPriority.HIGH
+    return DownloadPriority.NORMAL
+
+
+def format_queue_status(snapshot: QueueSnapshot) -> str | None:
+    """格式化排队状态，无需排队时返回 None"""
+    if snapshot.estimated_wait == 0:
+        return None
+    status = f"⏳ 当前有 {snapshot.waiting} 个任务排队"
+    if snapshot.estimated_wait is not None:
+        status += f"，预计等待约 {round(snapshot.estimated_wait)} 秒"
+    return status
+
+
 def build_progress_message(
-    photo: JmPhotoDetail, remaining_limit: int | None, jm: JmServiceDep
+    photo: JmPhotoDetail,
+    remaining_limit: int | None,
+    jm: JmServiceDep,
+    queue_status: str | None = None,
 ) -> str:
     """构建进度消息"""
     info = jm.format_photo_info(photo)
+    if queue_status:
+        info += f"\n{queue_status}"
     if remaining_limit is not None:
         return f"你本周还有 {remaining_limit} 次下载次数，开始下载...\n{info}"
     return f"开始下载...\n{info}"
@@ -64,12 +131,15 @@ def build_album_progress_message(
     episodes: list[int] | None,
     remaining_limit: int | None,
     jm: JmServiceDep,
+    queue_status: str | None = None,
 ) -> str:
     """构建本子集进度消息"""
     info = jm.format_album_info(album)
     if episodes is not None:
         ep_display = ", ".join(str(i + 1) for i in episodes)
         info += f"\n📖 选择章节: 第{ep_display}话"
+    if queue_status:
+        info += f"\n{queue_status}"
     prefix = (
         f"你本周还有 {remaining_limit} 次下载次数，开始下载..."
         if remaining_limit is not None
@@ -78,6 +148,27 @@ def build_album_progress_message(
     return f"{prefix}\n{info}"
 
 
+async def event_delivery(
+    bot: Bot,
+    event: MessageEvent,
+    matcher: Matcher,
+    dm: DataManagerDep,
+    jm: JmServiceDep,
+    uploads: UploadsDep,
+) -> FileDelivery:
+    """上传到事件所在会话，提示消息直接回复"""
+    group_id = event.group_id if isinstance(event, GroupMessageEvent) else None
+    return FileDelivery(
+        bot,
+        jm,
+        uploads,
+        UploadTarget.of(dm, event.user_id, group_id),
+        matcher.send,
+        queue_key=download_queue_key(event),
+        priority=await download_priority(bot, event),
+    )
+
+
 # endregion
 
 # region 事件处理函数
@@ -202,6 +293,7 @@ async def send_progress_message(
     photo: Photo,
     dm: DataManagerDep,
     jm: JmServiceDep,
+    jobs: JobsDep,
 ):
     """发送进度消息（不扣额度，群聊和私聊都触发）"""
     is_su = await SUPERUSER(bot, event)
@@ -209,17 +301,30 @@ async def send_progress_message(
     # 查询剩余次数（不扣减）
     remaining: int | None = None
     if not is_su:
-        remaining = dm.users.get_limit(event.user_id, dm.default_user_limit)
+        remaining = remaining_limit(event, dm, jobs)
+
+    priority = DownloadPriority.HIGH if is_su else DownloadPriority.NORMAL
+    queue_status = format_queue_status(jm.scheduler.snapshot(priority))
 
     # 发送进度消息
     try:
-        await matcher.send(build_progress_message(photo, remaining, jm))
+        await matcher.send(build_progress_message(photo, remaining, jm, queue_status))
     except ActionFailed:
         await matcher.send("本子信息可能被屏蔽，已开始下载")
     except NetworkError as e:
         logger.warning(f"{e},可能是协议端发送文件时间太长导致的报错")
 
 
+async def enqueue_photo_job(
+    bot: Bot, event: MessageEvent, matcher: Matcher, photo: Photo, jobs: JobsDep
+):
+    """后台任务模式：提交下载任务并结束处理（群聊和私聊都触发）"""
+    if not plugin_config.jmcomic_background_jobs:
+        return
+    await submit_job(bot, event, jobs, JobKind.PHOTO, str(photo.id))
+    await matcher.finish()
+
+
 async def group_download_and_upload(
     bot: Bot,
     event: GroupMessageEvent,
@@ -227,32 +332,18 @@ async def group_download_and_upload(
     photo: Photo,
     dm: DataManagerDep,
     jm: JmServiceDep,
+    uploads: UploadsDep,
 ):
-    """下载文件并上传群文件（仅群聊触发）"""
-    # 下载
-    try:
-        result = await jm.prepare_photo_file(photo)
-    except Exception:
-        logger.warning(f"下载本子失败: photo_id={photo.id}", exc_info=True)
-        await matcher.finish("下载失败")
-    if result is None:
-        await matcher.finish("下载失败")
+    """下载文件并上传群文件（仅群聊触发）
 
-    file_path, ext = result
-
-    # 上传
-    group_config = dm.get_group(event.group_id)
-    try:
-        params = {
-            "group_id": event.group_id,
-            "file": file_path,
-            "name": f"{photo.id}{ext}",
-        }
-        if group_config.folder_id:
-            params["folder_id"] = group_config.folder_id
-        await bot.call_api("upload_group_file", **params)
-    except ActionFailed:
-        await matcher.send("发送文件失败")
+    同一本子的并发请求共享一次下载，文件就绪后各自同时上传（受每个 Bot 的上传并发限制）。
+    """
+    delivery = await event_delivery(bot, event, matcher, dm, jm, uploads)
+    error = await delivery.photo(photo)
+    if error == UPLOAD_FAILED:
+        await matcher.send(error)
+    elif error is not None:
+        await matcher.finish(error)
 
 
 async def private_download_and_upload(
@@ -260,27 +351,14 @@ async def private_download_and_upload(
     event: PrivateMessageEvent,
     matcher: Matcher,
     photo: Photo,
+    dm: DataManagerDep,
     jm: JmServiceDep,
+    uploads: UploadsDep,
 ):
     """下载文件并上传私聊文件（仅私聊触发）"""
-    # 下载
-    result = await jm.prepare_photo_file(photo)
-
-    if result is None:
-        await matcher.finish("下载失败")
-
-    file_path, ext = result
-
-    # 上传
-    try:
-        await bot.call_api(
-            "upload_private_file",
-            user_id=event.user_id,
-            file=file_path,
-            name=f"{photo.id}{ext}",
-        )
-    except ActionFailed:
-        await matcher.finish("发送文件失败")
+    delivery = await event_delivery(bot, event, matcher, dm, jm, uploads)
+    if error := await delivery.photo(photo):
+        await matcher.finish(error)
 
 
 async def send_album_progress_message(
@@ -290,6 +368,7 @@ async def send_album_progress_message(
     selection: AlbumWithSelection,
     dm: DataManagerDep,
     jm: JmServiceDep,
+    jobs: JobsDep,
 ):
     """发送本子集进度消息（不扣额度，群聊和私聊都触发）"""
     album, episodes = selection
@@ -297,16 +376,36 @@ async def send_album_progress_message(
 
     remaining: int | None = None
     if not is_su:
-        remaining = dm.users.get_limit(event.user_id, dm.default_user_limit)
+        remaining = remaining_limit(event, dm, jobs)
+
+    priority = DownloadPriority.HIGH if is_su else DownloadPriority.NORMAL
+    queue_status = format_queue_status(jm.scheduler.snapshot(priority))
 
     try:
-        await matcher.send(build_album_progress_message(album, episodes, remaining, jm))
+        await matcher.send(
+            build_album_progress_message(album, episodes, remaining, jm, queue_status)
+        )
     except ActionFailed:
         await matcher.send("本子集信息可能被屏蔽，已开始下载")
     except NetworkError as e:
         logger.warning(f"{e},可能是协议端发送文件时间太长导致的报错")
 
 
+async def enqueue_album_job(
+    bot: Bot,
+    event: MessageEvent,
+    matcher: Matcher,
+    selection: AlbumWithSelection,
+    jobs: JobsDep,
+):
+    """后台任务模式：提交本子集下载任务并结束处理（群聊和私聊都触发）"""
+    if not plugin_config.jmcomic_background_jobs:
+        return
+    album, episodes = selection
+    await submit_job(bot, event, jobs, JobKind.ALBUM, str(album.id), episodes)
+    await matcher.finish()
+
+
 async def group_album_download_and_upload(
     bot: Bot,
     event: GroupMessageEvent,
@@ -314,32 +413,18 @@ async def group_album_download_and_upload(
     selection: AlbumWithSelection,
     dm: DataManagerDep,
     jm: JmServiceDep,
+    uploads: UploadsDep,
 ):
     """下载本子集并上传群文件（仅群聊触发）"""
     album, episodes = selection
-    output_name = jm.get_album_output_name(album, episodes)
-    try:
-        result = await jm.prepare_album_file(album, episodes)
-    except Exception:
-        logger.warning(f"下载本子集失败: album_id={album.id}", exc_info=True)
-        await matcher.finish("下载失败")
-    if result is None:
-        await matcher.finish("下载失败")
-
-    file_path, ext = result
-
-    group_config = dm.get_group(event.group_id)
-    try:
-        params = {
-            "group_id": event.group_id,
-            "file": file_path,
-            "name": f"{output_name}{ext}",
-        }
-        if group_config.folder_id:
-            params["folder_id"] = group_config.folder_id
-        await bot.call_api("upload_group_file", **params)
-    except ActionFailed:
-        await matcher.send("发送文件失败")
+    delivery = await event_delivery(bot, event, matcher, dm, jm, uploads)
+    error = await delivery.album(
+        album, episodes, stream=plugin_config.jmcomic_album_stream_episodes
+    )
+    if error == UPLOAD_FAILED:
+        await matcher.send(error)
+    elif error is not None:
+        await matcher.finish(error)
 
 
 async def private_album_download_and_upload(
@@ -347,27 +432,17 @@ async def private_album_download_and_upload(
     event: PrivateMessageEvent,
     matcher: Matcher,
     selection: AlbumWithSelection,
+    dm: DataManagerDep,
     jm: JmServiceDep,
+    uploads: UploadsDep,
 ):
     """下载本子集并上传私聊文件（仅私聊触发）"""
     album, episodes = selection
-    output_name = jm.get_album_output_name(album, episodes)
-    result = await jm.prepare_album_file(album, episodes)
-
-    if result is None:
-        await matcher.finish("下载失败")
-
-    file_path, ext = result
-
-    try:
-        await bot.call_api(
-            "upload_private_file",
-            user_id=event.user_id,
-            file=file_path,
-            name=f"{output_name}{ext}",
-        )
-    except ActionFailed:
-        await matcher.finish("发送文件失败")
+    delivery = await event_delivery(bot, event, matcher, dm, jm, uploads)
+    if error := await delivery.album(
+        album, episodes, stream=plugin_config.jmcomic_album_stream_episodes
+    ):
+        await matcher.finish(error)
 
 
 async def deduct_limit(
@@ -375,7 +450,10 @@ async def deduct_limit(
     event: MessageEvent,
     dm: DataManagerDep,
 ):
-    """扣减额度（下载成功后触发，静默）"""
+    """扣减额度（下载成功后触发，静默）
+
+    后台任务模式下处理流程在提交任务后结束，由 JobRunner 在任务完成时扣减。
+    """
     if await SUPERUSER(bot, event):
         return
     dm.users.decrease_limit(event.user_id, 1, dm.default_user_limit)
@@ -398,9 +476,10 @@ jm_download = on_command(
         page_count_check,  # 5. 页数限制检查（群聊和私聊）
         photo_restriction_check,  # 6. 内容限制检查（仅群聊）
         send_progress_message,  # 7. 发送进度消息（不扣额度）
-        group_download_and_upload,  # 8. 下载 + 上传群文件（仅群聊）
-        private_download_and_upload,  # 9. 下载 + 上传私聊文件（仅私聊）
-        deduct_limit,  # 10. 扣减额度（下载成功后静默扣减）
+        enqueue_photo_job,  # 8. 后台任务模式：提交任务后结束（完成后扣减额度）
+        group_download_and_upload,  # 9. 下载 + 上传群文件（仅群聊）
+        private_download_and_upload,  # 10. 下载 + 上传私聊文件（仅私聊）
+        deduct_limit,  # 11. 扣减额度（下载成功后静默扣减）
     ],
 )
 
@@ -416,6 +495,7 @@ jm_album_download = on_command(
         download_limit_check,
         album_restriction_check,
         send_album_progress_message,
+        enqueue_album_job,
         group_album_download_and_upload,
         private_album_download_and_upload,
         deduct_limit,
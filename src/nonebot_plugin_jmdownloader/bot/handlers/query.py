@@ -14,7 +14,6 @@ from nonebot.adapters.onebot.v11 import (
 )
 from nonebot.matcher import Matcher
 
-from ...infra import blur_image_async
 from ...infra.jm_service import AvatarDownloadError
 from .. import JmServiceDep
 from ..dependencies import Photo
@@ -36,9 +35,7 @@ async def query_handler(
     message += jm.format_photo_info(photo, album)
 
     try:
-        avatar_bytes = await jm.download_avatar(photo.id)
-        avatar_bytes = await blur_image_async(avatar_bytes)
-        message += MessageSegment.image(avatar_bytes)
+        message += MessageSegment.image(await jm.get_blurred_cover(photo.id))
     except AvatarDownloadError:
         pass
 
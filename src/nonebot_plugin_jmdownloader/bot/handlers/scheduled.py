@@ -1,18 +1,17 @@
 """定时任务
 
-包含定时执行的任务，如重置用户下载次数和清理缓存。
+包含定时执行的任务，如重置用户下载次数和淘汰缓存。
 """
 
-import shutil
-
 from nonebot import logger, require
 
 require("nonebot_plugin_apscheduler")
-require("nonebot_plugin_localstore")
 from nonebot_plugin_apscheduler import scheduler
-from nonebot_plugin_localstore import get_plugin_cache_dir
 
-from ..dependencies import _data_manager
+from ..dependencies import _data_manager, _jm_service, _jobs, _sessions
+
+# 已结束的后台任务在任务日志中保留的时间（秒）
+FINISHED_JOB_TTL = 7 * 24 * 3600
 
 
 @scheduler.scheduled_job(
@@ -28,14 +27,16 @@ async def reset_user_limits():
         logger.error(f"刷新用户下载次数时出错：{e}")
 
 
-@scheduler.scheduled_job("cron", hour=3, minute=0)
-async def clear_cache_dir():
-    """每天凌晨3点清理缓存文件夹"""
+@scheduler.scheduled_job("interval", minutes=30, id="trim_cache_dir")
+async def trim_cache_dir():
+    """每30分钟按容量和存活时间预算淘汰缓存文件，正在使用的文件不受影响
+
+    同时取消已过期搜索会话遗留的预取任务，清理任务日志中早已结束的后台任务，
+    并删除进程崩溃遗留的打包临时文件和锁文件。
+    """
     try:
-        plugin_cache_dir = get_plugin_cache_dir()
-        if plugin_cache_dir.exists():
-            shutil.rmtree(plugin_cache_dir)
-            plugin_cache_dir.mkdir(parents=True, exist_ok=True)
-            logger.info(f"已成功清理缓存目录：{plugin_cache_dir}")
+        _sessions.expire()
+        _jobs.journal.prune(FINISHED_JOB_TTL)
+        await _jm_service.trim_cache(sweep=True)
     except Exception as e:
         logger.error(f"清理缓存目录失败：{e}")
@@ -3,7 +3,8 @@
 jm搜索 和 jm下一页 命令，群聊和私聊统一处理。
 """
 
-import asyncio
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from io import BytesIO
 
 from nonebot import logger, on_command
 from nonebot.adapters.onebot.v11 import (
@@ -15,56 +16,128 @@ from nonebot.adapters.onebot.v11 import (
 )
 from nonebot.matcher import Matcher
 
-from ...infra import blur_image_async
+from ...core.search_session import SearchPreview, SearchSession
 from .. import DataManagerDep, JmServiceDep, SessionsDep
-from ..dependencies import ArgText, RandomNickname
-from ..nonebot_utils import send_forward_msg
+from ..dependencies import ArgText, RandomNickname, plugin_config
+from ..nonebot_utils import send_forward_batches
 from .common import group_enabled_check, private_enabled_check
 
 # region 辅助函数
 
 
+def build_card_node(
+    bot: Bot,
+    detail: SearchPreview,
+    cover: BytesIO | None,
+    dm: DataManagerDep,
+    jm: JmServiceDep,
+    blocked_message: str,
+) -> MessageSegment:
+    """构建单个搜索结果的转发节点，封面缺失时为纯文字卡片"""
+    if not dm.restriction.restricted_tags.isdisjoint(detail.tags):
+        return MessageSegment.node_custom(
+            int(bot.self_id), "jm搜索结果", blocked_message
+        )
+
+    node_content = Message()
+    node_content += jm.format_search_preview(detail)
+    if cover is not None:
+        node_content += MessageSegment.image(cover)
+    return MessageSegment.node_custom(int(bot.self_id), "jm搜索结果", node_content)
+
+
+async def iter_search_result_messages(
+    bot: Bot,
+    previews: list[SearchPreview],
+    dm: DataManagerDep,
+    jm: JmServiceDep,
+    blocked_message: str,
+) -> AsyncIterator[MessageSegment]:
+    """按原顺序逐个产出搜索结果消息
+
+    优先使用搜索页自带的信息，仅对缺失字段的结果请求详情接口；
+    各结果的详情和封面并行准备，超时的封面降级为纯文字卡片。
+    """
+    async for card in jm.stream_search_cards(previews):
+        if card is not None:
+            yield build_card_node(bot, *card, dm, jm, blocked_message)
+
+
 async def build_search_result_messages(
     bot: Bot,
-    photo_ids: list[str],
+    previews: list[SearchPreview],
     dm: DataManagerDep,
     jm: JmServiceDep,
     blocked_message: str,
 ) -> list[MessageSegment]:
-    """构建搜索结果消息列表"""
-    photos = await asyncio.gather(
-        *(jm.get_photo(photo_id) for photo_id in photo_ids),
-        return_exceptions=True,
-    )
-    avatars = await asyncio.gather(
-        *(jm.download_avatar(photo_id) for photo_id in photo_ids),
-        return_exceptions=True,
+    """构建整页搜索结果消息列表"""
+    return [
+        message
+        async for message in iter_search_result_messages(
+            bot, previews, dm, jm, blocked_message
+        )
+    ]
+
+
+async def send_search_results(
+    bot: Bot,
+    event: MessageEvent,
+    messages: Iterable[MessageSegment] | AsyncIterable[MessageSegment],
+) -> int:
+    """按配置的批次大小和字节预算分批发送搜索结果，返回发送的结果数"""
+    return await send_forward_batches(
+        bot,
+        event,
+        messages,
+        batch_size=plugin_config.jmcomic_search_batch_size,
+        max_bytes=int(plugin_config.jmcomic_search_batch_mb * 1024 * 1024),
     )
 
-    messages = []
 
-    for photo, avatar in zip(photos, avatars, strict=True):
-        if photo is None or isinstance(photo, BaseException):
-            continue
+async def fetch_more_results(jm: JmServiceDep, session: SearchSession) -> None:
+    """需要时获取下一个 API 页并追加到会话"""
+    if not session.needs_fetch_more():
+        return
+    try:
+        next_page = await jm.search(session.query, page=session.api_page + 1)
+        if session.append_results(list(next_page.iter_id())):
+            session.add_previews(jm.search_previews(next_page))
+    except Exception:
+        logger.warning(
+            f"获取搜索下一页失败: query={session.query}, page={session.api_page + 1}",
+            exc_info=True,
+        )
 
-        if not dm.restriction.restricted_tags.isdisjoint(photo.tags):
-            message_node = MessageSegment.node_custom(
-                int(bot.self_id), "jm搜索结果", blocked_message
-            )
-        else:
-            node_content = Message()
-            node_content += jm.format_photo_info(photo)
 
-            if not isinstance(avatar, BaseException):
-                avatar = await blur_image_async(avatar)
-                node_content += MessageSegment.image(avatar)
+async def prepare_page_messages(
+    bot: Bot,
+    session: SearchSession,
+    dm: DataManagerDep,
+    jm: JmServiceDep,
+    blocked_message: str,
+) -> list[MessageSegment]:
+    """准备会话当前页的消息（必要时先获取更多 API 数据）"""
+    await fetch_more_results(jm, session)
+    return await build_search_result_messages(
+        bot, session.get_current_previews(), dm, jm, blocked_message
+    )
 
-            message_node = MessageSegment.node_custom(
-                int(bot.self_id), "jm搜索结果", node_content
-            )
-        messages.append(message_node)
 
-    return messages
+def prefetch_next_page(
+    bot: Bot,
+    user_id: int,
+    session: SearchSession,
+    dm: DataManagerDep,
+    jm: JmServiceDep,
+    sessions: SessionsDep,
+    blocked_message: str,
+) -> None:
+    """在后台预先准备下一页，用户发送 jm下一页 时可直接使用"""
+    sessions.start_prefetch(
+        user_id,
+        session,
+        lambda: prepare_page_messages(bot, session, dm, jm, blocked_message),
+    )
 
 
 # endregion
@@ -100,20 +173,20 @@ async def search_handler(
         user_id=event.user_id,
         query=query,
         results=list(page.iter_id()),
+        previews=jm.search_previews(page),
     )
 
     if not session.results:
         await bot.delete_msg(message_id=searching_msg_id)
         await matcher.finish("未搜索到本子", reply_message=True)
 
-    current_results = session.get_current_page()
     blocked_message = f"{nickname}吃掉了一个不豪吃的本子"
-    messages = await build_search_result_messages(
-        bot, current_results, dm, jm, blocked_message
+    messages = iter_search_result_messages(
+        bot, session.get_current_previews(), dm, jm, blocked_message
     )
 
     try:
-        await send_forward_msg(bot, event, messages)
+        await send_search_results(bot, event, messages)
     except ActionFailed:
         await matcher.finish("搜索结果发送失败", reply_message=True)
 
@@ -121,6 +194,9 @@ async def search_handler(
     session.advance_page()
     if session.has_next_page():
         sessions.set(event.user_id, session)
+        prefetch_next_page(
+            bot, event.user_id, session, dm, jm, sessions, blocked_message
+        )
         await matcher.send("搜索有更多结果，使用'jm下一页'指令查看更多")
     else:
         await matcher.send("已发送所有搜索结果")
@@ -150,25 +226,17 @@ async def next_page_handler(
 
     searching_msg_id = (await matcher.send("正在搜索更多内容..."))["message_id"]
 
-    # 如果需要获取更多 API 数据
-    if session.needs_fetch_more():
-        try:
-            next_page = await jm.search(session.query, page=session.api_page + 1)
-            session.append_results(list(next_page.iter_id()))
-        except Exception:
-            logger.warning(
-                f"获取搜索下一页失败: query={session.query}, page={session.api_page + 1}",
-                exc_info=True,
-            )
-
-    current_results = session.get_current_page()
+    # 优先使用后台预取的结果，没有时现场准备
     blocked_message = f"{nickname}吃掉了一个不豪吃的本子"
-    messages = await build_search_result_messages(
-        bot, current_results, dm, jm, blocked_message
-    )
+    messages = await sessions.take_prefetched(user_id, session)
+    if messages is None:
+        await fetch_more_results(jm, session)
+        messages = iter_search_result_messages(
+            bot, session.get_current_previews(), dm, jm, blocked_message
+        )
 
     try:
-        await send_forward_msg(bot, event, messages)
+        await send_search_results(bot, event, messages)
     except ActionFailed:
         sessions.remove(user_id)
         await bot.delete_msg(message_id=searching_msg_id)
@@ -182,6 +250,7 @@ async def next_page_handler(
         sessions.remove(user_id)
         await matcher.send("已显示所有搜索结果")
     else:
+        prefetch_next_page(bot, user_id, session, dm, jm, sessions, blocked_message)
         await matcher.send("搜索有更多结果，使用'jm下一页'指令查看更多")
 
     await bot.delete_msg(message_id=searching_msg_id)
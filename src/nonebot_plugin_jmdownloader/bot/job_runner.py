@@ -0,0 +1,177 @@
+"""后台下载任务执行
+
+下载和上传脱离命令处理流程，在后台任务中执行，命令处理器提交任务后立即返回。
+任务写入任务日志，Bot 重启后继续执行未完成的任务；
+结束时主动向来源会话发送通知，下载次数在任务完成后扣减。
+"""
+
+import asyncio
+from typing import cast
+
+from nonebot import get_bots, logger
+from nonebot.adapters.onebot.v11 import ActionFailed, Bot, NetworkError
+
+from ..core.download_job import DownloadJob
+from ..core.enums import JobKind, JobState
+from ..infra.data_manager import DataManager
+from ..infra.jm_service import JMService
+from ..infra.job_journal import JobJournal
+from .delivery import FileDelivery, UploadTarget
+from .nonebot_utils import UploadLimiter, send_to
+
+
+class JobRunner:
+    """后台下载任务执行器
+
+    每个任务对应一个 asyncio 任务，下载并发由 JMService 的调度器控制。
+    执行前等待接收命令的 Bot 连接（重启后 Bot 通常晚于任务恢复连接），
+    超过 bot_timeout 仍未连接时任务记为失败，不再占用请求者的下载次数。
+    关闭时取消的任务保持运行中状态，下次启动时重新执行；
+    已开始 max_attempts 次仍未结束的任务（例如每次都导致进程退出）不再重试。
+    """
+
+    def __init__(
+        self,
+        journal: JobJournal,
+        jm: JMService,
+        dm: DataManager,
+        uploads: UploadLimiter,
+        *,
+        stream_album: bool = False,
+        max_attempts: int = 3,
+        bot_timeout: float = 1800,
+    ):
+        """
+        Args:
+            journal: 任务日志
+            jm: 下载服务
+            dm: 数据管理器（扣减下载次数、读取群文件夹）
+            uploads: 上传并发限制
+            stream_album: 本子集是否逐章节上传
+            max_attempts: 任务最多开始执行的次数
+            bot_timeout: 等待 Bot 连接的最长秒数
+        """
+        self.journal = journal
+        self.jm = jm
+        self.dm = dm
+        self.uploads = uploads
+        self.stream_album = stream_album
+        self.max_attempts = max_attempts
+        self.bot_timeout = bot_timeout
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+        self._bot_ready: dict[str, asyncio.Event] = {}
+
+    @property
+    def active(self) -> int:
+        """进行中的任务数"""
+        return len(self._tasks)
+
+    def submit(self, job: DownloadJob) -> DownloadJob:
+        """写入任务日志并在后台开始执行"""
+        self.journal.add(job)
+        self._start(job)
+        return job
+
+    def resume(self) -> int:
+        """恢复任务日志中未结束的任务，返回恢复数量"""
+        jobs = [job for job in self.journal.unfinished() if job.id not in self._tasks]
+        for job in jobs:
+            self._start(job)
+        return len(jobs)
+
+    def pending_charges(self, user_id: int) -> int:
+        """用户未结束且完成后需要扣次数的任务数"""
+        return self.journal.pending_charges(user_id)
+
+    def bot_connected(self, bot: Bot) -> None:
+        """Bot 连接时唤醒等待它的任务"""
+        self._bot_ready.setdefault(bot.self_id, asyncio.Event()).set()
+
+    async def aclose(self) -> None:
+        """取消进行中的任务并关闭任务日志"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.journal.close()
+
+    def _start(self, job: DownloadJob) -> None:
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def _wait_bot(self, bot_id: str) -> Bot:
+        ready = self._bot_ready.setdefault(bot_id, asyncio.Event())
+        while True:
+            bot = get_bots().get(bot_id)
+            if bot is not None:
+                return cast(Bot, bot)
+            ready.clear()
+            await ready.wait()
+
+    async def _run(self, job: DownloadJob) -> None:
+        try:
+            async with asyncio.timeout(self.bot_timeout):
+                bot = await self._wait_bot(job.bot_id)
+        except TimeoutError:
+            # Bot 不在线，无法上传和通知，只能记为失败
+            logger.warning(
+                f"等待 Bot {job.bot_id} 连接超时，后台任务取消: job_id={job.id}"
+            )
+            self.journal.finish(job, JobState.FAILED)
+            return
+        if job.attempts >= self.max_attempts:
+            logger.warning(f"后台任务多次中断，不再重试: job_id={job.id}")
+            self.journal.finish(job, JobState.FAILED)
+            await self._notify(bot, job, f"jm{job.jm_id} 多次下载中断，已取消")
+            return
+
+        self.journal.start(job)
+        try:
+            error = await self._execute(bot, job)
+        except Exception:
+            logger.warning(
+                f"后台任务失败: job_id={job.id}, jm_id={job.jm_id}", exc_info=True
+            )
+            error = "下载失败"
+
+        if error is not None:
+            self.journal.finish(job, JobState.FAILED)
+            await self._notify(bot, job, f"jm{job.jm_id} {error}")
+            return
+
+        self.journal.finish(job, JobState.DONE)
+        if job.charge:
+            self.dm.users.decrease_limit(job.user_id, 1, self.dm.default_user_limit)
+            self.dm.save_users()
+        await self._notify(bot, job, f"jm{job.jm_id} 已发送")
+
+    async def _execute(self, bot: Bot, job: DownloadJob) -> str | None:
+        """下载并上传，成功返回 None，失败返回提示信息"""
+
+        async def notify(message: str) -> None:
+            await self._notify(bot, job, message)
+
+        delivery = FileDelivery(
+            bot,
+            self.jm,
+            self.uploads,
+            UploadTarget.of(self.dm, job.user_id, job.group_id),
+            notify,
+            queue_key=job.queue_key,
+            priority=job.priority,
+        )
+        match job.kind:
+            case JobKind.PHOTO:
+                return await delivery.photo(await self.jm.get_photo(job.jm_id))
+            case JobKind.ALBUM:
+                album = await self.jm.get_album(job.jm_id)
+                return await delivery.album(
+                    album, job.episodes, stream=self.stream_album
+                )
+
+    async def _notify(self, bot: Bot, job: DownloadJob, message: str) -> None:
+        try:
+            await send_to(bot, message, user_id=job.user_id, group_id=job.group_id)
+        except (ActionFailed, NetworkError) as e:
+            logger.warning(f"后台任务通知发送失败: job_id={job.id}, {e}")
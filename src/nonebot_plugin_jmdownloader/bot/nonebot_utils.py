@@ -1,8 +1,12 @@
 """Handler 层通用工具函数"""
 
+import asyncio
+from collections.abc import AsyncIterable, Iterable
+
 from nonebot.adapters.onebot.v11 import (
     Bot,
     GroupMessageEvent,
+    Message,
     MessageEvent,
     MessageSegment,
 )
@@ -20,3 +24,178 @@ async def send_forward_msg(
         await bot.call_api(
             "send_private_forward_msg", user_id=event.user_id, messages=messages
         )
+
+
+async def send_to(
+    bot: Bot, message: str | Message, *, user_id: int, group_id: int | None = None
+):
+    """发送消息到指定群（group_id 不为 None 时，并 @ 用户）或用户私聊"""
+    if group_id is not None:
+        await bot.call_api(
+            "send_group_msg",
+            group_id=group_id,
+            message=MessageSegment.at(user_id) + message,
+        )
+    else:
+        await bot.call_api("send_private_msg", user_id=user_id, message=message)
+
+
+def estimate_node_bytes(node: MessageSegment) -> int:
+    """估算转发节点中图片数据的字节数（base64 编码后的长度）"""
+    content = node.data.get("content")
+    if not isinstance(content, Message):
+        return 0
+    return sum(
+        len(seg.data.get("file", ""))
+        for seg in content
+        if seg.type == "image" and isinstance(seg.data.get("file"), str)
+    )
+
+
+async def send_forward_batches(
+    bot: Bot,
+    event: MessageEvent,
+    nodes: Iterable[MessageSegment] | AsyncIterable[MessageSegment],
+    batch_size: int = 0,
+    max_bytes: int = 0,
+) -> int:
+    """按批次发送合并转发消息，返回发送的节点数
+
+    节点按原顺序装批，凑满 batch_size 个或图片数据达到 max_bytes 即发送，
+    前面的批次无需等待后面的节点准备完成。两者均为 0 时整体一次发送。
+
+    Raises:
+        ActionFailed: 任一批次发送失败时（已发送的批次不会撤回）
+    """
+    batch: list[MessageSegment] = []
+    batch_bytes = 0
+    sent = 0
+
+    async def flush() -> None:
+        nonlocal batch, batch_bytes, sent
+        if batch:
+            await send_forward_msg(bot, event, batch)
+            sent += len(batch)
+            batch, batch_bytes = [], 0
+
+    async def iterate():
+        if isinstance(nodes, AsyncIterable):
+            async for node in nodes:
+                yield node
+        else:
+            for node in nodes:
+                yield node
+
+    async for node in iterate():
+        node_bytes = estimate_node_bytes(node)
+        if max_bytes and batch and batch_bytes + node_bytes > max_bytes:
+            await flush()
+        batch.append(node)
+        batch_bytes += node_bytes
+        if batch_size and len(batch) >= batch_size:
+            await flush()
+    await flush()
+    return sent
+
+
+class UploadLimiter:
+    """按 Bot 限制同时进行的文件上传数
+
+    同一本子被多个群/用户同时请求时只下载一次，文件就绪后所有请求方同时开始上传，
+    由此限制同一个 Bot 账号的并发上传数，避免协议端同时处理过多大文件。
+    """
+
+    def __init__(self, limit: int = 0):
+        """
+        Args:
+            limit: 每个 Bot 的并发上传上限，0 表示不限制
+        """
+        self.limit = limit
+        self._slots: dict[str, asyncio.Semaphore] = {}
+        self.active: int = 0
+        self.waiting: int = 0
+        self.uploaded: int = 0
+        self.failed: int = 0
+
+    def _slot(self, bot_id: str) -> asyncio.Semaphore | None:
+        if self.limit <= 0:
+            return None
+        return self._slots.setdefault(bot_id, asyncio.Semaphore(self.limit))
+
+    async def upload(
+        self,
+        bot: Bot,
+        event: MessageEvent,
+        file: str,
+        name: str,
+        folder_id: str | None = None,
+    ) -> None:
+        """上传文件到事件所在的群文件或私聊
+
+        folder_id: 群文件夹 ID（仅群聊有效）
+
+        Raises:
+            ActionFailed: 上传失败时
+        """
+        group_id = event.group_id if isinstance(event, GroupMessageEvent) else None
+        await self.upload_to(
+            bot,
+            file,
+            name,
+            user_id=event.user_id,
+            group_id=group_id,
+            folder_id=folder_id,
+        )
+
+    async def upload_to(
+        self,
+        bot: Bot,
+        file: str,
+        name: str,
+        *,
+        user_id: int,
+        group_id: int | None = None,
+        folder_id: str | None = None,
+    ) -> None:
+        """上传文件到指定群（group_id 不为 None 时）或用户私聊
+
+        Raises:
+            ActionFailed: 上传失败时
+        """
+        if group_id is not None:
+            api = "upload_group_file"
+            params = {"group_id": group_id, "file": file, "name": name}
+            if folder_id:
+                params["folder_id"] = folder_id
+        else:
+            api = "upload_private_file"
+            params = {"user_id": user_id, "file": file, "name": name}
+
+        slot = self._slot(bot.self_id)
+        if slot is not None:
+            self.waiting += 1
+            try:
+                await slot.acquire()
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        try:
+            await bot.call_api(api, **params)
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.uploaded += 1
+        finally:
+            self.active -= 1
+            if slot is not None:
+                slot.release()
+
+    def stats(self) -> dict[str, int]:
+        """返回监控计数"""
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+        }
@@ -4,7 +4,7 @@ from typing import Self
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 
-from .core.enums import GroupListMode, OutputFormat
+from .core.enums import CoverFormat, GroupListMode, OutputFormat
 
 
 class PluginConfig(BaseModel):
@@ -14,6 +14,17 @@ class PluginConfig(BaseModel):
     jmcomic_log: bool = Field(default=False, description="是否启用JMComic API日志")
     jmcomic_proxies: str = Field(default="system", description="代理配置")
     jmcomic_thread_count: int = Field(default=10, description="下载线程数量")
+    jmcomic_image_download_workers: int = Field(
+        default=20,
+        description="所有下载共享的图片下载线程数，0表示每个下载各自使用下载线程数量",
+    )
+    jmcomic_max_concurrent_downloads: int = Field(
+        default=2, description="同时进行的下载任务数量上限，超出的任务排队等待"
+    )
+    jmcomic_shared_cache_dir: str | None = Field(
+        default=None,
+        description="多个实例共享的缓存目录，设置后同一主机上的实例复用彼此下载的文件",
+    )
     jmcomic_username: str | None = Field(default=None, description="JM登录用户名")
     jmcomic_password: str | None = Field(default=None, description="JM登录密码")
     jmcomic_output_format: OutputFormat = Field(
@@ -26,6 +37,15 @@ class PluginConfig(BaseModel):
     jmcomic_modify_real_md5: bool = Field(
         default=False, description="是否修改PDF的MD5值（仅PDF格式有效）"
     )
+    jmcomic_cache_max_size: int = Field(
+        default=5120, description="输出文件（PDF/ZIP）缓存容量上限（MB），0表示不限制"
+    )
+    jmcomic_image_cache_max_size: int = Field(
+        default=10240, description="已下载原图的图片库容量上限（MB），0表示不限制"
+    )
+    jmcomic_cache_max_age: float = Field(
+        default=72, description="缓存文件自上次使用起的保留时间（小时），0表示不限制"
+    )
 
     # 数据管理
     jmcomic_group_list_mode: GroupListMode = Field(
@@ -47,11 +67,70 @@ class PluginConfig(BaseModel):
     jmcomic_allow_album_download: bool = Field(
         default=False, description="是否允许使用本子集下载功能"
     )
+    jmcomic_background_jobs: bool = Field(
+        default=False,
+        description="下载任务在后台执行并持久化，完成后通知，Bot 重启后继续未完成的任务",
+    )
+    jmcomic_upload_concurrency: int = Field(
+        default=3,
+        description="每个 Bot 同时上传文件的数量上限，0表示不限制",
+    )
+    jmcomic_album_stream_episodes: bool = Field(
+        default=False,
+        description="本子集按章节逐个打包上传（后续章节边下载边上传），关闭时合并为一个文件",
+    )
 
     # 服务层
     jmcomic_results_per_page: int = Field(
         default=20, description="每页显示的搜索结果数量"
     )
+    jmcomic_cover_timeout: float = Field(
+        default=8, description="单个图片域名下载封面的超时时间（秒）"
+    )
+    jmcomic_cover_hedge_delay: float = Field(
+        default=1.5, description="封面下载超过该时间（秒）未返回时并行尝试下一个域名"
+    )
+    jmcomic_cover_cache_memory: int = Field(
+        default=32, description="模糊封面内存缓存容量（MB），0表示不使用"
+    )
+    jmcomic_cover_cache_ttl: float = Field(
+        default=24, description="模糊封面磁盘缓存有效期（小时），0表示不使用"
+    )
+    jmcomic_cover_max_edge: int = Field(
+        default=600, description="模糊封面最长边像素，0表示保持原尺寸"
+    )
+    jmcomic_cover_quality: int = Field(
+        default=75, ge=1, le=95, description="模糊封面编码质量（1-95）"
+    )
+    jmcomic_cover_format: CoverFormat = Field(
+        default=CoverFormat.JPEG, description="模糊封面编码格式：jpeg 或 webp"
+    )
+    jmcomic_metadata_cache_ttl: int = Field(
+        default=10, description="本子详情缓存时间（分钟），0表示不缓存"
+    )
+    jmcomic_metadata_cache_size: int = Field(
+        default=512, description="本子详情缓存条目数上限"
+    )
+    jmcomic_search_cache_ttl: int = Field(
+        default=5, description="搜索结果缓存时间（分钟），所有用户共享，0表示不缓存"
+    )
+    jmcomic_search_concurrency: int = Field(
+        default=8, description="搜索卡片（详情、封面）的全局并发请求数"
+    )
+    jmcomic_search_deadline: float = Field(
+        default=15,
+        description="单页搜索卡片的准备时限（秒），超时的封面不再等待，0表示不限制",
+    )
+    jmcomic_search_batch_size: int = Field(
+        default=5, description="搜索结果每批合并转发的条数，0表示整页一次发送"
+    )
+    jmcomic_search_batch_mb: float = Field(
+        default=4, description="搜索结果每批合并转发的图片数据上限（MB），0表示不限制"
+    )
+    jmcomic_image_workers: int = Field(
+        default=0,
+        description="图片处理进程数，0表示使用线程池",
+    )
     jmcomic_max_page_count: int = Field(
         default=150, description="单次下载最大页数限制，0表示不限制"
     )
@@ -0,0 +1,56 @@
+"""后台下载任务核心实体"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from .enums import DownloadPriority, JobKind, JobState
+
+
+@dataclass
+class DownloadJob:
+    """后台下载任务
+
+    下载和上传脱离命令处理流程执行，任务持久化到任务日志，重启后继续。
+
+    Attributes:
+        kind: 任务类型
+        jm_id: 本子（集）jm 号
+        bot_id: 接收命令的 Bot 账号，完成后由它上传和通知
+        user_id: 请求者
+        group_id: 来源群号，None 表示私聊
+        episodes: 选择的章节索引（从 0 开始），None 表示全部章节（仅本子集）
+        priority: 下载调度优先级
+        charge: 完成后是否扣减请求者的下载次数（超管不扣）
+        id: 任务 ID，入库后由任务日志分配
+        state: 任务状态
+        attempts: 已开始执行的次数（重启恢复时累加）
+        created_at: 创建时间戳
+        finished_at: 结束时间戳，未结束时为 None
+    """
+
+    kind: JobKind
+    jm_id: str
+    bot_id: str
+    user_id: int
+    group_id: int | None = None
+    episodes: list[int] | None = None
+    priority: DownloadPriority = DownloadPriority.NORMAL
+    charge: bool = True
+    id: int = 0
+    state: JobState = JobState.PENDING
+    attempts: int = 0
+    created_at: float = 0.0
+    finished_at: float | None = None
+
+    @property
+    def queue_key(self) -> str:
+        """下载调度的轮询分组：群聊按群，私聊按用户"""
+        if self.group_id is not None:
+            return f"group_{self.group_id}"
+        return f"private_{self.user_id}"
+
+    @property
+    def finished(self) -> bool:
+        """是否已结束（成功或失败）"""
+        return self.state in (JobState.DONE, JobState.FAILED)
@@ -19,3 +19,33 @@ class GroupListMode(StrEnum):
 
     WHITELIST = "whitelist"  # 默认允许，显式禁止的不能用
     BLACKLIST = "blacklist"  # 默认禁止，显式允许的能用
+
+
+class DownloadPriority(StrEnum):
+    """下载任务优先级"""
+
+    HIGH = "high"  # 超管通道，优先调度
+    NORMAL = "normal"
+
+
+class CoverFormat(StrEnum):
+    """封面预览图编码格式"""
+
+    JPEG = "jpeg"
+    WEBP = "webp"
+
+
+class JobKind(StrEnum):
+    """后台下载任务类型"""
+
+    PHOTO = "photo"  # jm下载
+    ALBUM = "album"  # jm下载集
+
+
+class JobState(StrEnum):
+    """后台下载任务状态"""
+
+    PENDING = "pending"  # 已入队，尚未开始
+    RUNNING = "running"  # 下载/上传中（重启时视为中断，重新执行）
+    DONE = "done"
+    FAILED = "failed"
@@ -2,9 +2,39 @@
 
 from __future__ import annotations
 
+from collections.abc import Iterable
 from dataclasses import dataclass, field
 
 
+@dataclass(frozen=True)
+class SearchPreview:
+    """搜索结果卡片所需的本子信息
+
+    来自搜索页数据，缺失的字段需要通过详情接口补全。
+
+    Attributes:
+        id: 本子 ID
+        title: 标题
+        author: 作者
+        tags: 标签列表
+    """
+
+    id: str
+    title: str = ""
+    author: str = ""
+    tags: tuple[str, ...] = ()
+
+    @property
+    def is_complete(self) -> bool:
+        """是否无需请求详情接口即可生成卡片
+
+        标签用于内容限制检查，搜索页未带标签时同样视为缺失。
+        JM 的搜索页不会同时返回作者和标签（API 缺标签，网页缺作者），
+        通常只有已知完整详情（如 jm 号直达的本子）时才为 True。
+        """
+        return bool(self.title and self.author and self.tags)
+
+
 @dataclass
 class SearchSession:
     """用户搜索会话
@@ -17,6 +47,7 @@ class SearchSession:
         display_idx: 当前展示起始索引
         api_page: 当前 API 页码
         page_size: 每页显示数量
+        previews: 搜索页带回的结果信息，按 ID 索引
     """
 
     query: str
@@ -24,6 +55,7 @@ class SearchSession:
     display_idx: int = 0
     api_page: int = 1
     page_size: int = 20
+    previews: dict[str, SearchPreview] = field(default_factory=dict)
 
     # JM API 每页返回的数量（固定值）
     API_PAGE_SIZE: int = 80
@@ -33,6 +65,17 @@ class SearchSession:
         end_idx = self.display_idx + self.page_size
         return self.results[self.display_idx : end_idx]
 
+    def get_current_previews(self) -> list[SearchPreview]:
+        """获取当前页的结果信息，没有搜索页数据的结果只包含 ID"""
+        return [
+            self.previews.get(result_id) or SearchPreview(id=result_id)
+            for result_id in self.get_current_page()
+        ]
+
+    def add_previews(self, previews: Iterable[SearchPreview]) -> None:
+        """保存搜索页带回的结果信息"""
+        self.previews.update((preview.id, preview) for preview in previews)
+
     def has_next_page(self) -> bool:
         """检查是否还有下一页（用户视角）"""
         return self._has_more_results() or self._may_have_next_api_page()
@@ -0,0 +1,408 @@
+"""输出文件缓存管理
+
+记录缓存目录下每个条目的大小、最近访问时间和命中次数，
+按容量和存活时间预算淘汰，正在使用的条目会被固定而不被淘汰。
+多个进程共享缓存目录时，固定通过锁文件对其他进程可见，
+索引的读写和淘汰在缓存目录级的文件锁内进行。
+"""
+
+from __future__ import annotations
+
+import secrets
+import shutil
+import threading
+import time
+from collections import Counter
+from collections.abc import Collection, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from pathlib import Path
+
+import msgspec
+from boltons.fileutils import atomic_save
+
+from .file_lock import FileLock
+
+
+class ArtifactEntry(msgspec.Struct):
+    """缓存条目
+
+    Attributes:
+        size: 占用字节数（目录为其下所有文件之和）
+        last_access: 最近访问时间戳
+        hits: 命中次数
+        mtime: 统计大小时条目的修改时间，未变化时扫描不再重新统计
+    """
+
+    size: int
+    last_access: float
+    hits: int = 0
+    mtime: float = 0
+
+
+def _disk_usage(path: Path) -> int:
+    """计算文件或目录占用的字节数，文件消失时返回 0"""
+    try:
+        if not path.is_dir():
+            return path.stat().st_size
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    except FileNotFoundError:
+        return 0
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+class ArtifactCache:
+    """缓存目录的 LRU 管理器
+
+    以缓存目录下的顶层文件/文件夹为条目，`.` 开头的隐藏条目和 exclude 中的名称不受管理。
+    索引保存在缓存目录下的隐藏文件中，重启后保留访问记录。
+    所有方法线程安全，evict 可在工作线程中执行。
+
+    设置 pin_dir 时（多个进程共享缓存目录），每个实例固定条目期间持有
+    `<条目名>.<实例 ID>.lock` 锁文件。实例 ID 随机生成，容器中进程号相同也不会冲突。
+    保存和淘汰时持有缓存目录级的索引锁，先合并磁盘上其他进程写入的访问记录再写回；
+    访问记录在内存中累积，由后台定时器延迟 FLUSH_DELAY 秒批量写回。
+    固定只创建锁文件，不等待索引锁，可以在事件循环中调用；
+    淘汰先把条目改名移出缓存目录，再检查一次固定，期间被其他进程固定的条目放回原处。
+    调用方固定后再检查条目是否存在，因此不会使用到已被淘汰的条目。
+    """
+
+    INDEX_NAME = ".artifact_index.json"
+    INDEX_LOCK_NAME = ".artifact_index.lock"
+    PIN_SUFFIX = ".lock"
+    # 淘汰时条目先改名为隐藏的待删除条目，释放索引锁后再删除
+    TRASH_SUFFIX = ".evicted"
+    # 共享缓存目录时访问记录写回索引的延迟（秒）
+    FLUSH_DELAY = 5.0
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int = 0,
+        max_age: float = 0,
+        exclude: Collection[str] = (),
+        pin_dir: Path | None = None,
+    ):
+        """
+        Args:
+            root: 缓存目录
+            max_bytes: 总容量上限（字节），0 表示不限制
+            max_age: 距上次访问的最长保留秒数，0 表示不限制
+            exclude: 不受管理的顶层条目名称
+            pin_dir: 跨进程固定锁文件所在目录，None 表示只在进程内固定
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._exclude = frozenset(exclude)
+        self._lock = threading.RLock()
+        self._entries: dict[str, ArtifactEntry] | None = None
+        self._pins: Counter[str] = Counter()
+        # 上次与磁盘索引合并以来本实例新增的命中次数
+        self._new_hits: Counter[str] = Counter()
+        self._pin_dir = pin_dir
+        self._pin_locks: dict[str, FileLock] = {}
+        self._instance = secrets.token_hex(6)
+        self._shared = pin_dir is not None
+        self._flush_timer: threading.Timer | None = None
+        self.evicted: int = 0
+
+    # region 索引
+
+    @property
+    def _index_path(self) -> Path:
+        return self.root / self.INDEX_NAME
+
+    def _read_index(self) -> dict[str, ArtifactEntry]:
+        try:
+            return msgspec.json.decode(
+                self._index_path.read_bytes(), type=dict[str, ArtifactEntry]
+            )
+        except (FileNotFoundError, msgspec.DecodeError):
+            return {}
+
+    def _load(self) -> dict[str, ArtifactEntry]:
+        if self._entries is None:
+            self._entries = self._read_index()
+        return self._entries
+
+    def _store_lock(self) -> AbstractContextManager[None]:
+        """缓存目录级的索引锁，只在共享缓存目录时跨进程加锁
+
+        会阻塞等待，只在工作线程中使用；需在 self._lock 之外获取，避免等待期间阻塞其他线程。
+        """
+        if not self._shared:
+            return nullcontext()
+        return FileLock(self.root / self.INDEX_LOCK_NAME, poll_interval=0.05).hold()
+
+    def _merge(self) -> dict[str, ArtifactEntry]:
+        """合并磁盘上的索引，需持有索引锁
+
+        最近访问时间取两边较新者，命中次数为磁盘记录加上本实例新增的次数；
+        只在本实例记录中、文件已被其他进程删除的条目被移除。
+        """
+        entries = self._load()
+        if not self._shared:
+            return entries
+        stored = self._read_index()
+        for name, theirs in stored.items():
+            ours = entries.get(name)
+            if ours is None:
+                entries[name] = theirs
+                continue
+            ours.last_access = max(ours.last_access, theirs.last_access)
+            ours.hits = theirs.hits + self._new_hits[name]
+        for name in entries.keys() - stored.keys():
+            if not (self.root / name).exists():
+                del entries[name]
+        self._new_hits.clear()
+        return entries
+
+    def _write(self) -> None:
+        with atomic_save(str(self._index_path), text_mode=False) as f:
+            f.write(msgspec.json.encode(self._entries))  # pyright: ignore[reportOptionalMemberAccess]
+
+    def save(self) -> None:
+        """保存索引（共享缓存目录时先合并其他进程的访问记录）
+
+        共享缓存目录时会等待索引锁，不要在事件循环中直接调用。
+        """
+        if self._entries is None or not self.root.exists():
+            return
+        with self._store_lock(), self._lock:
+            self._merge()
+            self._write()
+
+    def _schedule_flush(self) -> None:
+        """共享缓存目录时在后台线程中延迟写回访问记录，合并同一时段内的多次访问"""
+        if not self._shared or self._flush_timer is not None:
+            return
+        timer = threading.Timer(self.FLUSH_DELAY, self._flush)
+        timer.daemon = True
+        self._flush_timer = timer
+        timer.start()
+
+    def _flush(self) -> None:
+        with self._lock:
+            self._flush_timer = None
+        self.save()
+
+    def _managed(self, name: str) -> bool:
+        return not name.startswith(".") and name not in self._exclude
+
+    def scan(self) -> None:
+        """与磁盘同步：收录新条目、刷新有修改的条目大小、移除已不存在的条目
+
+        只对修改时间变化的条目重新统计大小（目录只在增删文件时变化，
+        原地改写文件后由 register 刷新）。
+        """
+        with self._lock:
+            entries = self._load()
+            present: set[str] = set()
+            if self.root.exists():
+                for path in self.root.iterdir():
+                    if not self._managed(path.name):
+                        continue
+                    try:
+                        mtime = path.stat().st_mtime
+                    except FileNotFoundError:
+                        continue
+                    present.add(path.name)
+                    entry = entries.get(path.name)
+                    if entry is None:
+                        entries[path.name] = ArtifactEntry(
+                            size=_disk_usage(path), last_access=mtime, mtime=mtime
+                        )
+                    elif entry.mtime != mtime:
+                        entry.size = _disk_usage(path)
+                        entry.mtime = mtime
+            for name in entries.keys() - present:
+                del entries[name]
+
+    # endregion
+
+    # region 访问记录
+
+    def register(self, name: str) -> None:
+        """记录新生成（或内容有变化）的条目"""
+        with self._lock:
+            self._load()[name] = ArtifactEntry(
+                size=_disk_usage(self.root / name),
+                last_access=time.time(),
+                mtime=_mtime(self.root / name),
+            )
+            self._schedule_flush()
+
+    def touch(self, name: str) -> None:
+        """记录一次命中"""
+        with self._lock:
+            entry = self._load().get(name)
+            if entry is None:
+                self._load()[name] = entry = ArtifactEntry(
+                    size=_disk_usage(self.root / name),
+                    last_access=0,
+                    mtime=_mtime(self.root / name),
+                )
+            entry.last_access = time.time()
+            entry.hits += 1
+            self._new_hits[name] += 1
+            self._schedule_flush()
+
+    @contextmanager
+    def pin(self, *names: str) -> Iterator[None]:
+        """在上下文期间固定条目，防止被淘汰"""
+        self.acquire(*names)
+        try:
+            yield
+        finally:
+            self.release(*names)
+
+    def acquire(self, *names: str) -> None:
+        """固定条目，需与 release 成对调用"""
+        with self._lock:
+            for name in names:
+                if self._pins[name] == 0:
+                    self._lock_pin(name)
+                self._pins[name] += 1
+
+    def release(self, *names: str) -> None:
+        """解除 acquire 的固定"""
+        with self._lock:
+            self._pins.subtract(names)
+            for name in set(names):
+                if self._pins[name] <= 0:
+                    self._unlock_pin(name)
+            self._pins += Counter()  # 去除计数为 0 的条目
+
+    def is_pinned(self, name: str) -> bool:
+        with self._lock:
+            return self._pins[name] > 0 or self._pinned_elsewhere(name)
+
+    def _pin_path(self, name: str) -> Path:
+        assert self._pin_dir is not None
+        return self._pin_dir / f"{name}.{self._instance}{self.PIN_SUFFIX}"
+
+    def _lock_pin(self, name: str) -> None:
+        if self._pin_dir is None:
+            return
+        lock = FileLock(self._pin_path(name))
+        if lock.try_acquire():
+            self._pin_locks[name] = lock
+
+    def _unlock_pin(self, name: str) -> None:
+        lock = self._pin_locks.pop(name, None)
+        if lock is not None:
+            lock.release()
+            lock.path.unlink(missing_ok=True)
+
+    def _pinned_elsewhere(self, name: str) -> bool:
+        """是否有其他进程正在固定该条目（进程退出后遗留的锁文件不算）"""
+        return name in self._foreign_pins(name)
+
+    def _foreign_pins(self, name: str | None = None) -> set[str]:
+        """其他实例正在固定的条目名称，name 不为 None 时只检查该条目"""
+        if self._pin_dir is None or not self._pin_dir.is_dir():
+            return set()
+        pinned: set[str] = set()
+        for path in self._pin_dir.iterdir():
+            entry, _, instance = path.name.removesuffix(self.PIN_SUFFIX).rpartition(".")
+            if instance == self._instance or entry in pinned:
+                continue
+            if name is not None and entry != name:
+                continue
+            probe = FileLock(path)
+            if probe.try_acquire():
+                probe.release()
+            else:
+                pinned.add(entry)
+        return pinned
+
+    # endregion
+
+    # region 淘汰
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size for entry in self._load().values())
+
+    def evict(self, now: float | None = None) -> list[str]:
+        """按存活时间和容量预算淘汰条目，返回被删除的条目名称
+
+        先删除超过 max_age 未访问的条目，再按最近访问时间从旧到新删除，
+        直到总容量不超过 max_bytes。固定中的条目（含其他进程固定的）始终保留。
+        """
+        now = time.time() if now is None else now
+        removed: list[str] = []
+        trash: list[Path] = []
+        if not self.root.exists():
+            return removed
+        with self._store_lock(), self._lock:
+            self.scan()
+            entries = self._merge()
+            pinned = self._foreign_pins()
+            candidates = sorted(
+                (name for name in entries if not (self._pins[name] or name in pinned)),
+                key=lambda name: entries[name].last_access,
+            )
+            total = sum(entry.size for entry in entries.values())
+            moved: dict[str, Path] = {}
+            for name in candidates:
+                entry = entries[name]
+                expired = self.max_age > 0 and now - entry.last_access > self.max_age
+                oversize = self.max_bytes > 0 and total > self.max_bytes
+                if not (expired or oversize):
+                    continue
+                target = self.root / f".{name}.{self._instance}{self.TRASH_SUFFIX}"
+                try:
+                    (self.root / name).rename(target)
+                except FileNotFoundError:
+                    pass
+                else:
+                    moved[name] = target
+                total -= entry.size
+                removed.append(name)
+            # 固定不等待索引锁，改名期间被其他进程固定的条目放回原处
+            for name in self._foreign_pins() & moved.keys():
+                try:
+                    moved.pop(name).rename(self.root / name)
+                except OSError:
+                    # 对方已重新生成同名条目（Windows 上无法覆盖），旧条目直接删除
+                    continue
+                removed.remove(name)
+            for name in removed:
+                del entries[name]
+            trash.extend(moved.values())
+            self.evicted += len(removed)
+            self._write()
+            # 进程在删除途中退出时遗留的待删除条目一并清理（持有索引锁时不会有淘汰进行中）
+            trash.extend(self.root.glob(f".*{self.TRASH_SUFFIX}"))
+        for path in set(trash):
+            _remove(path)
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        """返回监控数据"""
+        with self._lock:
+            entries = self._load()
+            return {
+                "entries": len(entries),
+                "total_bytes": sum(entry.size for entry in entries.values()),
+                "pinned": len(self._pins),
+                "hits": sum(entry.hits for entry in entries.values()),
+                "evicted": self.evicted,
+            }
+
+    # endregion
@@ -0,0 +1,114 @@
+"""封面缩略图缓存
+
+两级缓存处理完成（模糊后）的封面：按字节预算的内存 LRU + 带 TTL 的磁盘目录。
+命中时跳过封面下载和模糊处理。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+from cachetools import LRUCache
+
+
+class CoverCache:
+    """封面缩略图两级缓存
+
+    内存层按字节数计容量，磁盘层以 `{photo_id}.img` 保存在 cache_dir 下，
+    文件修改时间超过 ttl 视为过期。
+    """
+
+    SUFFIX = ".img"
+
+    def __init__(self, cache_dir: Path, memory_bytes: int, ttl: float):
+        """
+        Args:
+            cache_dir: 磁盘缓存目录
+            memory_bytes: 内存层容量（字节），0 表示不使用内存层
+            ttl: 磁盘缓存有效期（秒），0 表示不使用磁盘层
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._memory: LRUCache[str, bytes] | None = (
+            LRUCache(maxsize=memory_bytes, getsizeof=len) if memory_bytes > 0 else None
+        )
+        self.memory_hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+
+    def _path(self, photo_id: str) -> Path:
+        return self.cache_dir / f"{photo_id}{self.SUFFIX}"
+
+    def _remember(self, photo_id: str, data: bytes) -> None:
+        if self._memory is not None and len(data) <= self._memory.maxsize:
+            self._memory[photo_id] = data
+
+    async def get(self, photo_id: int | str) -> bytes | None:
+        """读取缓存，未命中返回 None"""
+        photo_id = str(photo_id)
+        if self._memory is not None and (data := self._memory.get(photo_id)):
+            self.memory_hits += 1
+            return data
+
+        if self.ttl > 0:
+            data = await asyncio.to_thread(self._read_disk, photo_id)
+            if data is not None:
+                self.disk_hits += 1
+                self._remember(photo_id, data)
+                return data
+
+        self.misses += 1
+        return None
+
+    async def put(self, photo_id: int | str, data: bytes) -> None:
+        """写入缓存"""
+        photo_id = str(photo_id)
+        self._remember(photo_id, data)
+        if self.ttl > 0:
+            await asyncio.to_thread(self._write_disk, photo_id, data)
+
+    def _read_disk(self, photo_id: str) -> bytes | None:
+        path = self._path(photo_id)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, photo_id: str, data: bytes) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(photo_id)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def evict_expired(self) -> int:
+        """删除磁盘上的过期文件，返回删除数量"""
+        if not self.cache_dir.exists():
+            return 0
+        now = time.time()
+        removed = 0
+        for path in self.cache_dir.glob(f"*{self.SUFFIX}"):
+            try:
+                if now - path.stat().st_mtime > self.ttl:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    def stats(self) -> dict[str, float | int]:
+        """返回命中统计"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_bytes": self._memory.currsize if self._memory is not None else 0,
+        }
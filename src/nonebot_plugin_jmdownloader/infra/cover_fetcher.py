@@ -0,0 +1,182 @@
+"""封面下载
+
+进程内共享的 HTTP 连接池，按各图片域名的健康度和延迟排序，
+慢请求超过阈值后对下一个域名发起对冲请求，取最先成功的结果。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import httpx
+
+if TYPE_CHECKING:
+    from loguru import Logger
+
+try:
+    import h2  # noqa: F401  # pyright: ignore[reportMissingImports]
+except ImportError:
+    _HTTP2_AVAILABLE = False
+else:
+    _HTTP2_AVAILABLE = True
+
+# 封面内容小于该字节数视为无效（域名返回了占位图或错误页）
+MIN_COVER_BYTES = 1024
+
+
+@dataclass
+class DomainHealth:
+    """单个域名的滚动健康度
+
+    Attributes:
+        latency: 成功请求耗时的滑动平均（秒），尚无数据时为 None
+        success_rate: 请求成功率的滑动平均
+    """
+
+    latency: float | None = None
+    success_rate: float = 1.0
+
+    ALPHA = 0.3
+
+    def record_success(self, elapsed: float) -> None:
+        self.latency = (
+            elapsed
+            if self.latency is None
+            else self.latency + self.ALPHA * (elapsed - self.latency)
+        )
+        self.success_rate += self.ALPHA * (1 - self.success_rate)
+
+    def record_failure(self) -> None:
+        self.success_rate -= self.ALPHA * self.success_rate
+
+    def record_timeout(self, elapsed: float) -> None:
+        """请求超过对冲阈值后被取消：按已等待时间（耗时下限）计入延迟并记为失败"""
+        self.latency = elapsed if self.latency is None else max(self.latency, elapsed)
+        self.record_failure()
+
+    def score(self, default_latency: float) -> float:
+        """预期耗时评分，越小越优先"""
+        latency = default_latency if self.latency is None else self.latency
+        return latency / max(self.success_rate, 0.05)
+
+
+class CoverFetcher:
+    """封面下载器
+
+    - 共享一个开启 keep-alive 的 httpx.AsyncClient（安装 h2 时启用 HTTP/2）
+    - 按域名健康度排序，优先尝试最快的可用域名
+    - 单个域名超时较短，超过 hedge_delay 仍未返回时并行请求下一个域名
+    """
+
+    def __init__(
+        self,
+        domains: Callable[[], Sequence[str]],
+        logger: Logger,
+        timeout: float = 8.0,
+        hedge_delay: float = 1.5,
+        client: httpx.AsyncClient | None = None,
+    ):
+        """
+        Args:
+            domains: 返回候选图片域名列表的函数
+            logger: 日志记录器
+            timeout: 单个域名的请求超时（秒）
+            hedge_delay: 发起对冲请求前的等待时间（秒）
+            client: 自定义 HTTP 客户端，默认按需创建共享客户端
+        """
+        self._domains = domains
+        self._logger = logger
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self._client = client
+        self._health: dict[str, DomainHealth] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=_HTTP2_AVAILABLE,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """关闭共享连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def health(self, domain: str) -> DomainHealth:
+        return self._health.setdefault(domain, DomainHealth())
+
+    def ranked_domains(self) -> list[str]:
+        """按健康度评分排序的域名列表，评分相同时保持原顺序"""
+        domains = list(self._domains())
+        return sorted(
+            domains, key=lambda domain: self.health(domain).score(self.hedge_delay)
+        )
+
+    async def fetch(self, photo_id: int | str) -> bytes | None:
+        """下载封面，所有域名均失败时返回 None"""
+        candidates = iter(self.ranked_domains())
+        pending: set[asyncio.Task[bytes | None]] = set()
+
+        def launch() -> None:
+            domain = next(candidates, None)
+            if domain is not None:
+                pending.add(asyncio.create_task(self._fetch_from(domain, photo_id)))
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_delay,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # 当前请求过慢，对冲下一个域名
+                    launch()
+                    continue
+                for task in done:
+                    pending.discard(task)
+                    if (content := task.result()) is not None:
+                        return content
+                    # 失败时立即补上下一个域名
+                    launch()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _fetch_from(self, domain: str, photo_id: int | str) -> bytes | None:
+        url = f"https://{domain}/media/albums/{photo_id}.jpg"
+        health = self.health(domain)
+        started = time.monotonic()
+        try:
+            response = await self._get_client().get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except asyncio.CancelledError:
+            # 对冲请求胜出或整体被取消。等待已超过对冲阈值的请求记为超时，
+            # 否则一直挂起的域名不会降分，每次下载都要先白等 hedge_delay；
+            # 启动不久就被取消的请求（失败后补上的域名）不计入
+            elapsed = time.monotonic() - started
+            if elapsed >= self.hedge_delay:
+                health.record_timeout(elapsed)
+            raise
+        except (httpx.HTTPStatusError, httpx.RequestError) as e:
+            health.record_failure()
+            self._logger.debug(f"下载{photo_id}封面失败: domain={domain}, error={e}")
+            return None
+
+        if len(response.content) < MIN_COVER_BYTES:
+            health.record_failure()
+            self._logger.debug(f"下载{photo_id}封面失败: domain={domain},内容过小")
+            return None
+
+        health.record_success(time.monotonic() - started)
+        return response.content
@@ -0,0 +1,159 @@
+"""全局下载调度器
+
+限制同时进行的下载任务数量，按优先级通道和群组轮询分配执行名额。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from ..core.enums import DownloadPriority
+
+# 通道调度顺序：高优先级通道的任务总是先于普通通道
+_LANE_ORDER = (DownloadPriority.HIGH, DownloadPriority.NORMAL)
+
+
+@dataclass(frozen=True)
+class QueueSnapshot:
+    """调度器状态快照
+
+    Attributes:
+        running: 正在执行的任务数
+        waiting: 排在前面的等待任务数
+        estimated_wait: 预计等待秒数，无历史数据时为 None
+    """
+
+    running: int
+    waiting: int
+    estimated_wait: float | None
+
+
+class DownloadScheduler:
+    """全局下载调度器
+
+    - 同时执行的任务数不超过 max_concurrent
+    - 高优先级通道（超管）先于普通通道调度
+    - 同一通道内按群组轮询，单个群组排再多任务也不会饿死其他群组
+    """
+
+    # 平均耗时的指数滑动系数
+    _EMA_ALPHA = 0.3
+
+    def __init__(self, max_concurrent: int = 2):
+        self.max_concurrent = max(1, max_concurrent)
+        self._running = 0
+        self._lanes: dict[
+            DownloadPriority, OrderedDict[str, deque[asyncio.Future[None]]]
+        ] = {priority: OrderedDict() for priority in _LANE_ORDER}
+        self._avg_duration: float | None = None
+        self._avg_wait: float | None = None
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def waiting(self, priority: DownloadPriority | None = None) -> int:
+        """等待中的任务数，指定 priority 时只统计会排在该通道任务前面的部分"""
+        lanes = _LANE_ORDER
+        if priority is not None:
+            lanes = lanes[: _LANE_ORDER.index(priority) + 1]
+        return sum(
+            not fut.done()
+            for lane in lanes
+            for queue in self._lanes[lane].values()
+            for fut in queue
+        )
+
+    def snapshot(
+        self, priority: DownloadPriority = DownloadPriority.NORMAL
+    ) -> QueueSnapshot:
+        """返回新任务以 priority 提交时的排队状况"""
+        waiting = self.waiting(priority)
+        estimated: float | None = 0.0
+        if self._running >= self.max_concurrent:
+            if self._avg_duration is None:
+                estimated = None
+            else:
+                rounds = math.ceil((waiting + 1) / self.max_concurrent)
+                estimated = rounds * self._avg_duration
+        return QueueSnapshot(self._running, waiting, estimated)
+
+    def stats(self) -> dict[str, float | int | None]:
+        """返回监控数据"""
+        return {
+            "running": self._running,
+            "waiting": self.waiting(),
+            "avg_wait": self._avg_wait,
+            "avg_duration": self._avg_duration,
+        }
+
+    @asynccontextmanager
+    async def slot(
+        self, group: str, priority: DownloadPriority = DownloadPriority.NORMAL
+    ) -> AsyncIterator[None]:
+        """获取一个执行名额，退出上下文时释放
+
+        Args:
+            group: 轮询分组（群号或私聊用户）
+            priority: 任务优先级
+        """
+        queued_at = time.monotonic()
+        await self._acquire(group, priority)
+        started_at = time.monotonic()
+        self._avg_wait = self._ema(self._avg_wait, started_at - queued_at)
+        try:
+            yield
+        finally:
+            self._avg_duration = self._ema(
+                self._avg_duration, time.monotonic() - started_at
+            )
+            self._release()
+
+    async def _acquire(self, group: str, priority: DownloadPriority) -> None:
+        if self._running < self.max_concurrent and not self.waiting():
+            self._running += 1
+            return
+
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._lanes[priority].setdefault(group, deque()).append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # 名额已转交给本任务但任务被取消，需要把名额继续传下去
+            if fut.done() and not fut.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        waiter = self._pop_next()
+        if waiter is None:
+            self._running -= 1
+        else:
+            # 名额直接转交，running 不变
+            waiter.set_result(None)
+
+    def _pop_next(self) -> asyncio.Future[None] | None:
+        for priority in _LANE_ORDER:
+            lane = self._lanes[priority]
+            while lane:
+                group, queue = next(iter(lane.items()))
+                fut = queue.popleft()
+                if queue:
+                    lane.move_to_end(group)
+                else:
+                    del lane[group]
+                if not fut.done():
+                    return fut
+        return None
+
+    @classmethod
+    def _ema(cls, current: float | None, sample: float) -> float:
+        if current is None:
+            return sample
+        return current + cls._EMA_ALPHA * (sample - current)
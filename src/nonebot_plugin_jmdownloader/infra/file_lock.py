@@ -0,0 +1,157 @@
+"""跨进程文件锁
+
+基于锁文件的排他锁，POSIX 使用 flock，Windows 使用 msvcrt.locking。
+进程退出时操作系统自动释放，不会因崩溃遗留死锁；遗留的锁文件由 remove_unused_locks 清理。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def _is_current(fd: int, path: Path) -> bool:
+    """fd 是否仍是 path 当前指向的文件"""
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+def remove_unused_locks(directory: Path) -> list[Path]:
+    """删除目录下（含子目录）当前无人持有的锁文件，返回被删除的路径
+
+    删除时持有该锁，正在等待的 FileLock 获得锁后会发现文件已被删除并重新创建。
+    """
+    if not directory.is_dir():
+        return []
+    removed: list[Path] = []
+    for path in directory.rglob("*.lock"):
+        lock = FileLock(path)
+        if not lock.try_acquire():
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            # Windows 上其他进程打开的文件无法删除
+            pass
+        else:
+            removed.append(path)
+        finally:
+            lock.release()
+    return removed
+
+
+class FileLock:
+    """锁文件上的排他锁
+
+    同一实例不可重入；同一进程内的不同实例之间也互斥。
+    等待时以 poll_interval 轮询，异步等待可随时取消。
+    """
+
+    def __init__(self, path: Path, poll_interval: float = 0.2):
+        """
+        Args:
+            path: 锁文件路径，不存在时自动创建
+            poll_interval: 锁被占用时的重试间隔（秒）
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self._fd: int | None = None
+        self._guard = threading.Lock()
+
+    @property
+    def locked(self) -> bool:
+        """当前实例是否持有锁"""
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """尝试获取锁，已被占用时立即返回 False"""
+        with self._guard:
+            if self._fd is not None:
+                raise RuntimeError(f"锁已被当前实例持有: {self.path}")
+            while True:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if not _try_lock(fd):
+                    os.close(fd)
+                    return False
+                if _is_current(fd, self.path):
+                    self._fd = fd
+                    return True
+                # 加锁前锁文件已被清理删除，锁在已删除的文件上，重新打开
+                _unlock(fd)
+                os.close(fd)
+
+    def release(self) -> None:
+        """释放锁，未持有时不做任何事"""
+        with self._guard:
+            if self._fd is None:
+                return
+            fd, self._fd = self._fd, None
+            try:
+                _unlock(fd)
+            finally:
+                os.close(fd)
+
+    @contextmanager
+    def hold(self, timeout: float | None = None) -> Iterator[None]:
+        """阻塞等待并在上下文期间持有锁
+
+        Raises:
+            TimeoutError: 超过 timeout 秒仍未获得锁
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"等待文件锁超时: {self.path}")
+            time.sleep(self.poll_interval)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def hold_async(self) -> AsyncIterator[None]:
+        """异步等待并在上下文期间持有锁"""
+        # 非阻塞尝试很快，直接在事件循环中执行，等待期间可随时取消；
+        # 锁可能被其他进程持有，无法用 asyncio.Event 通知，只能轮询
+        while not self.try_acquire():  # noqa: ASYNC110
+            await asyncio.sleep(self.poll_interval)
+        try:
+            yield
+        finally:
+            self.release()
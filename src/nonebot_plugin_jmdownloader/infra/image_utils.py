@@ -1,38 +1,227 @@
-"""图片处理工具"""
+"""图片处理工具
+
+CPU 密集的图片处理可交给独立进程池执行，避免占用默认线程池并绕开 GIL；
+未启用进程池或进程池不可用时回退到线程池。
+"""
 
 import asyncio
+import copyreg
+import importlib.util
+import io
+import multiprocessing
+import os
+import site
+import sys
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 from io import BytesIO
+from pathlib import Path
+from typing import TypeVar
+
+from ..core.enums import CoverFormat
+
+
+@dataclass(frozen=True)
+class PreviewOptions:
+    """封面预览图参数
+
+    Attributes:
+        max_edge: 输出图片最长边像素，0 表示保持原尺寸
+        blur_radius: 相对原图尺寸的高斯模糊半径，缩小后按比例换算
+        quality: 编码质量（1-95）
+        format: 编码格式，WebP 不可用时回退为 JPEG
+    """
+
+    max_edge: int = 600
+    blur_radius: float = 7
+    quality: int = 75
+    format: CoverFormat = CoverFormat.JPEG
+
+
+DEFAULT_PREVIEW_OPTIONS = PreviewOptions()
+
+T = TypeVar("T")
+
+# region 进程池
+
+# 子进程任务模块所在目录及其顶层模块名
+_WORKER_DIR = Path(__file__).with_name("workers")
+_WORKER_MODULE = "jmdownloader_image_worker"
+
+
+def _load_worker():
+    """以顶层模块名加载子进程任务模块
+
+    进程池按 模块名.函数名 序列化任务函数，父进程和子进程必须用同一个顶层模块名，
+    子进程通过 initializer 把 _WORKER_DIR 加入 sys.path 后按名导入。
+    """
+    module = sys.modules.get(_WORKER_MODULE)
+    if module is not None:
+        return module
+    spec = importlib.util.spec_from_file_location(
+        _WORKER_MODULE, _WORKER_DIR / f"{_WORKER_MODULE}.py"
+    )
+    if spec is None or spec.loader is None:
+        raise ImportError(f"无法加载图片处理模块: {_WORKER_DIR}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[_WORKER_MODULE] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+_worker = _load_worker()
+
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _pool_context():
+    """子进程启动方式：不导入主模块的 forkserver，平台不支持时返回 None
 
-from PIL import Image, ImageFilter
+    不使用 fork：事件循环、线程池和网络连接运行后 fork 多线程进程，
+    子进程可能继承被其他线程持有的锁而死锁。
+    标准 forkserver/spawn 会在子进程中重新执行主模块（bot.py 在顶层调用
+    nonebot.init 和 load_plugins，每个子进程都会重新初始化 NoneBot 并加载全部插件），
+    因此启动子进程时去掉主模块信息，子进程只导入任务函数所在的模块。
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return None
+    from multiprocessing import context, forkserver, popen_forkserver, spawn, util
+    from multiprocessing.reduction import dump
+
+    class WorkerPopen(popen_forkserver.Popen):
+        def _launch(self, process_obj):
+            # 与 popen_forkserver.Popen._launch 相同，只去掉准备数据中的主模块
+            prep_data = spawn.get_preparation_data(process_obj._name)
+            prep_data.pop("init_main_from_name", None)
+            prep_data.pop("init_main_from_path", None)
+            buf = io.BytesIO()
+            context.set_spawning_popen(self)
+            try:
+                dump(prep_data, buf)
+                dump(process_obj, buf)
+            finally:
+                context.set_spawning_popen(None)
+            self.sentinel, w = forkserver.connect_to_new_process(self._fds)
+            _parent_w = os.dup(w)
+            self.finalizer = util.Finalize(
+                self, util.close_fds, (_parent_w, self.sentinel)
+            )
+            with open(w, "wb", closefd=True) as f:
+                f.write(buf.getbuffer())
+            self.pid = forkserver.read_signed(self.sentinel)
+
+    class WorkerProcess(context.ForkServerProcess):
+        @staticmethod
+        def _Popen(process_obj):
+            return WorkerPopen(process_obj)
+
+        def __reduce_ex__(self, protocol):
+            # 子进程中还原为标准 ForkServerProcess，不导入本模块（会导入插件包）
+            _, _, *rest = super().__reduce_ex__(protocol)
+            args = (context.ForkServerProcess, object, None)
+            return (copyreg._reconstructor, args, *rest)
+
+    class WorkerContext(context.ForkServerContext):
+        Process = WorkerProcess
+
+    ctx = WorkerContext()
+    # forkserver 服务进程同样不预先导入主模块
+    ctx.set_forkserver_preload([])
+    return ctx
 
 
-def _blur_image(image_bytes: BytesIO) -> BytesIO:
-    """对图片进行模糊处理
+def start_image_workers(workers: int) -> bool:
+    """启动图片处理进程池，并提交空任务提前拉起子进程
+
+    子进程只导入 workers 目录下的任务模块，不导入主模块和插件包。
+    不支持 forkserver 的平台（Windows）不启用进程池，使用线程池。
+    拉起子进程可能需要数秒，在线程中调用可避免阻塞事件循环。
 
     Args:
-        image_bytes: 图片的 BytesIO
+        workers: 进程数，0 表示不启用
 
     Returns:
-        模糊处理后的图片 BytesIO
+        是否启用了进程池
     """
-    image = Image.open(image_bytes)
-    blurred_image = image.filter(ImageFilter.GaussianBlur(radius=7))
+    global _process_pool
+    shutdown_image_workers()
+    mp_context = _pool_context()
+    if workers <= 0 or mp_context is None:
+        return False
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=site.addsitedir,
+        initargs=(str(_WORKER_DIR),),
+    )
+    for _ in range(workers):
+        pool.submit(_worker.warmup)
+    _process_pool = pool
+    return True
+
+
+def shutdown_image_workers() -> None:
+    """关闭图片处理进程池"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
 
-    output = BytesIO()
-    blurred_image.save(output, format="JPEG")
 
-    output.seek(0)
+async def run_image_job(func: Callable[..., T], *args) -> T:
+    """在图片处理进程池中执行 func，未启用或进程池损坏时回退到线程池
 
-    return output
+    func 须能在子进程中按名导入（任务模块中的函数或标准库函数），
+    参数只使用内置类型，建议以 bytes 传入传出以减少序列化开销。
+    """
+    global _process_pool
+    pool = _process_pool
+    if pool is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            if _process_pool is pool:
+                _process_pool = None
+    return await asyncio.to_thread(func, *args)
+
+
+# endregion
+
+
+async def render_preview_async(
+    data: bytes, options: PreviewOptions = DEFAULT_PREVIEW_OPTIONS
+) -> bytes:
+    """异步生成模糊预览图（在图片处理进程池中执行）
+
+    Args:
+        data: 原图字节
+        options: 预览图参数
+
+    Returns:
+        模糊处理后的图片字节
+    """
+    return await run_image_job(
+        _worker.render_preview,
+        data,
+        options.max_edge,
+        options.blur_radius,
+        options.quality,
+        options.format.value,
+    )
 
 
-async def blur_image_async(image_bytes: BytesIO) -> BytesIO:
+async def blur_image_async(
+    image_bytes: BytesIO, options: PreviewOptions = DEFAULT_PREVIEW_OPTIONS
+) -> BytesIO:
     """异步对图片进行模糊处理
 
     Args:
         image_bytes: 图片的 BytesIO
+        options: 预览图参数
 
     Returns:
         模糊处理后的图片 BytesIO
     """
-    return await asyncio.to_thread(_blur_image, image_bytes)
+    return BytesIO(await render_preview_async(image_bytes.getvalue(), options))
@@ -7,12 +7,17 @@ from __future__ import annotations
 
 import asyncio
 import hashlib
+import secrets
+import threading
+from collections import Counter
+from collections.abc import AsyncIterator, Awaitable, Callable, Coroutine, Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, cast
+from typing import TYPE_CHECKING, Any, TypeVar, cast
 
-import httpx
+from cachetools import TTLCache
 from jmcomic import (
     JmAlbumDetail,
     JmcomicClient,
@@ -20,15 +25,39 @@ from jmcomic import (
     JmModuleConfig,
     JmOption,
     JmPhotoDetail,
+    JmSearchPage,
+    JmSyncRuntime,
+    JsonResolveFailException,
+    MissingAlbumPhotoException,
+    RequestRetryAllFailException,
     create_option_by_str,
+    jm_task_context,
 )
 
-from ..core.enums import OutputFormat
-from .pdf_utils import prepare_pdf_with_unique_md5
+from ..core.enums import CoverFormat, DownloadPriority, OutputFormat
+from ..core.search_session import SearchPreview
+from .artifact_cache import ArtifactCache
+from .cover_cache import CoverCache
+from .cover_fetcher import CoverFetcher
+from .download_scheduler import DownloadScheduler
+from .file_lock import FileLock, remove_unused_locks
+from .image_utils import PreviewOptions, render_preview_async
+from .packer import PackError, is_complete_output, pack_images
+from .page_manifest import PageCheckpointPlugin, ResumeStats, prepare_resume
+from .pdf_utils import write_unique_pdf
+from .singleflight import SingleFlight
 
 if TYPE_CHECKING:
     from loguru import Logger
 
+T = TypeVar("T")
+
+# 视为客户端失效（登录态过期、域名不可用）而需要重建客户端的异常
+_CLIENT_FAILURES = (RequestRetryAllFailException, JsonResolveFailException)
+
+# 不存在的 id 的缓存时间上限（秒），避免新上架的本子长时间查不到
+MISSING_CACHE_TTL = 300
+
 
 class AvatarDownloadError(Exception):
     description = "下载本子封面失败"
@@ -81,76 +110,77 @@ class JMOptionContext:
     """用于构造 jmcomic option 的配置。"""
 
     cache_dir: str
+    shared_cache_dir: str | None = None
     output_format: OutputFormat = OutputFormat.PDF
     zip_password: str | None = None
     log: bool = False
     proxies: str = "system"
     thread_count: int = 10
+    image_download_workers: int = 0
     username: str | None = None
     password: str | None = None
     modify_md5: bool = False
+    max_concurrent_downloads: int = 2
+    cache_max_bytes: int = 0
+    cache_max_age: float = 0
+    cover_timeout: float = 8.0
+    cover_hedge_delay: float = 1.5
+    cover_cache_memory_bytes: int = 0
+    cover_cache_ttl: float = 0
+    cover_max_edge: int = 600
+    cover_quality: int = 75
+    cover_format: CoverFormat = CoverFormat.JPEG
+    metadata_cache_size: int = 512
+    metadata_cache_ttl: float = 0
+    search_cache_size: int = 256
+    search_cache_ttl: float = 0
+    search_concurrency: int = 8
+    search_deadline: float = 0
+    image_store_max_bytes: int = 0
 
+    @property
+    def store_dir(self) -> str:
+        """图片库和输出文件所在目录：设置了共享缓存目录时为共享目录"""
+        return self.shared_cache_dir or self.cache_dir
 
-def _build_plugin_block(config: JMOptionContext, mode: str, quote) -> str:
-    """根据输出格式和模式构建插件配置块。
 
-    mode="photo": after_photo 触发，用于单章节下载
-    mode="album": after_album 触发，用于本子集下载
-    """
-    hook = "after_photo" if mode == "photo" else "after_album"
-    filename_rule = "Pid" if mode == "photo" else "{Aoutput_name}"
+# 图片库子目录：按章节保存已下载的原图，打包输出时从这里读取
+IMAGE_DIR = "images"
+# 章节图片全部下载成功后在章节目录下写入的标记文件
+EPISODE_COMPLETE_MARKER = ".complete"
+# 输出文件构建锁所在的隐藏子目录，跨进程互斥同一输出文件的构建
+LOCK_DIR = ".locks"
 
-    match config.output_format:
-        case OutputFormat.PDF:
-            return f"""  {hook}:
-    - plugin: img2pdf
-      kwargs:
-        pdf_dir: {quote(config.cache_dir)}
-        filename_rule: {quote(filename_rule)}
-"""
-        case OutputFormat.ZIP:
-            level = "photo" if mode == "photo" else "album"
-            encrypt_block = ""
-            if config.zip_password:
-                encrypt_block = f"""
-        encrypt:
-          password: {quote(config.zip_password)}"""
-            return f"""  {hook}:
-    - plugin: zip
-      kwargs:
-        zip_dir: {quote(config.cache_dir)}
-        filename_rule: {quote(filename_rule)}
-        level: {level}
-        suffix: zip
-        delete_original_file: true{encrypt_block}
-"""
-        case _:
-            raise ValueError(f"不支持的输出格式: {config.output_format!r}")
 
-
-def create_jm_option(config: JMOptionContext, mode: str = "photo") -> JmOption:
+def create_jm_option(config: JMOptionContext) -> JmOption:
     """根据配置构造一个新的 JmOption 实例。
 
-    mode="photo": 单章节下载（after_photo 插件）
-    mode="album": 本子集下载（after_album 插件）
+    图片下载到缓存目录下的图片库（`images/<章节ID>/`），每张图片完成后记录到章节清单，
+    不配置打包插件，打包由 JMService 从图片库完成。
+
+    Raises:
+        ValueError: 不支持的输出格式
     """
+    if config.output_format not in list(OutputFormat):
+        raise ValueError(f"不支持的输出格式: {config.output_format!r}")
 
     def quote(value: str) -> str:
         """安全地引用 YAML 字符串值"""
         escaped = value.replace("'", "''")
         return f"'{escaped}'"
 
-    login_block = ""
+    plugin_block = f"""
+  after_image:
+    - plugin: {PageCheckpointPlugin.plugin_key}"""
     if config.username and config.password:
-        login_block = f"""  after_init:
+        plugin_block += f"""
+  after_init:
     - plugin: login
       kwargs:
         username: {quote(config.username)}
-        password: {quote(config.password)}
-"""
-
-    plugin_block = _build_plugin_block(config, mode, quote)
+        password: {quote(config.password)}"""
 
+    image_dir = str(Path(config.store_dir) / IMAGE_DIR)
     yaml_config = f"""\
 log: {config.log}
 
@@ -162,17 +192,18 @@ client:
       proxies: {quote(config.proxies)}
 
 download:
+  cache: true
   image:
     suffix: .jpg
   threading:
     image: {config.thread_count}
 
 dir_rule:
-  base_dir: {quote(config.cache_dir)}
+  base_dir: {quote(image_dir)}
   rule: Bd_Pid
 
-plugins:
-{login_block}{plugin_block}"""
+plugins: {plugin_block}
+"""
 
     return create_option_by_str(yaml_config, mode="yml")
 
@@ -183,11 +214,105 @@ plugins:
 class JMService:
     """封装 JM 客户端操作，提供统一的异步接口。"""
 
+    # 缓存目录下存放模糊封面的子目录
+    COVER_DIR = "covers"
+    # 缓存目录下存放单次上传 MD5 副本的子目录，副本上传后即删除
+    UPLOAD_DIR = "uploads"
+
     def __init__(self, config: JMOptionContext, logger: Logger):
         self._config = config
-        self._photo_option = create_jm_option(config, mode="photo")
-        self._album_option = create_jm_option(config, mode="album")
+        self._option = create_jm_option(config)
         self._logger = logger
+        self._client: JmcomicClient | None = None
+        self._client_lock = threading.Lock()
+        self.client_rebuilds: int = 0
+        # 本子/本子集详情缓存，键为 ("photo"/"album", id)
+        ttl = config.metadata_cache_ttl
+        self._details: TTLCache[tuple[str, str], Any] | None = None
+        # 不存在的 id 只缓存异常的消息和上下文，每次命中时抛出新的异常，
+        # 避免同一个异常实例反复抛出时 traceback 不断累积
+        self._missing: TTLCache[tuple[str, str], tuple[str, dict]] | None = None
+        if ttl > 0:
+            self._details = TTLCache(config.metadata_cache_size, ttl)
+            self._missing = TTLCache(
+                config.metadata_cache_size, min(ttl, MISSING_CACHE_TTL)
+            )
+        self._detail_inflight: SingleFlight[tuple[str, str], Any] = SingleFlight()
+        self.metadata_hits: int = 0
+        self.metadata_misses: int = 0
+        # 所有用户共享的搜索结果缓存，键为 (规范化关键词, API 页码)
+        self._searches: TTLCache[tuple[str, int], JmSearchPage] | None = (
+            TTLCache(config.search_cache_size, config.search_cache_ttl)
+            if config.search_cache_ttl > 0
+            else None
+        )
+        self._search_inflight: SingleFlight[tuple[str, int], JmSearchPage] = (
+            SingleFlight()
+        )
+        self.search_hits: int = 0
+        # 搜索结果卡片直接使用搜索页信息 / 需要请求详情的次数
+        self.preview_hits: int = 0
+        self.preview_fetches: int = 0
+        # 所有搜索页共享的卡片请求并发上限
+        self._card_slots = asyncio.Semaphore(max(1, config.search_concurrency))
+        self.degraded_cards: int = 0
+        # 进行中的输出文件构建：("photo", id, 格式) / ("album", 输出文件名, 格式)
+        self._inflight: SingleFlight[tuple[str, str, OutputFormat], bool] = (
+            SingleFlight()
+        )
+        self.artifact_hits: int = 0
+        # 进行中的章节图片下载，按章节 ID 合并
+        self._episode_inflight: SingleFlight[str, bool] = SingleFlight()
+        self.episode_hits: int = 0
+        # 断点续传复用的图片数量和字节数
+        self.resumed_pages: int = 0
+        self.resumed_bytes: int = 0
+        self.scheduler = DownloadScheduler(config.max_concurrent_downloads)
+        # 所有下载共享的图片线程池，未配置时每个下载各自创建 thread_count 个线程
+        self._image_runtime: JmSyncRuntime | None = (
+            JmSyncRuntime(image_workers=config.image_download_workers)
+            if config.image_download_workers > 0
+            else None
+        )
+        store_dir = Path(config.store_dir)
+        # 共享缓存目录时，固定状态通过锁文件对其他实例可见
+        pin_dir = store_dir / LOCK_DIR / "pins" if config.shared_cache_dir else None
+        self.artifacts = ArtifactCache(
+            store_dir,
+            max_bytes=config.cache_max_bytes,
+            max_age=config.cache_max_age,
+            exclude=(self.COVER_DIR, IMAGE_DIR, self.UPLOAD_DIR),
+            pin_dir=pin_dir and pin_dir / "artifacts",
+        )
+        self.images = ArtifactCache(
+            store_dir / IMAGE_DIR,
+            max_bytes=config.image_store_max_bytes,
+            max_age=config.cache_max_age,
+            pin_dir=pin_dir and pin_dir / IMAGE_DIR,
+        )
+        # prepare_* 已固定、尚未交给 hold_file 释放的输出文件：路径 -> 次数
+        self._leases: Counter[str] = Counter()
+        # 使用中的上传副本：路径 -> (写入字节数, 占用字节数)
+        self._upload_copies: dict[str, tuple[int, int]] = {}
+        self.upload_copies: int = 0
+        self.upload_bytes_written: int = 0
+        self.covers = CoverCache(
+            store_dir / self.COVER_DIR,
+            memory_bytes=config.cover_cache_memory_bytes,
+            ttl=config.cover_cache_ttl,
+        )
+        self._cover_inflight: SingleFlight[str, bytes] = SingleFlight()
+        self._preview_options = PreviewOptions(
+            max_edge=config.cover_max_edge,
+            quality=config.cover_quality,
+            format=config.cover_format,
+        )
+        self._cover_fetcher = CoverFetcher(
+            lambda: JmModuleConfig.DOMAIN_IMAGE_LIST,
+            logger,
+            timeout=config.cover_timeout,
+            hedge_delay=config.cover_hedge_delay,
+        )
 
     async def warmup(self):
         """异步预热 JM 客户端（可选）。"""
@@ -202,11 +327,42 @@ class JMService:
             return True
 
     def _get_client(self) -> JmcomicClient:
-        return self._photo_option.build_jm_client()
+        """获取共享的 JM 客户端，首次调用时创建。"""
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._option.build_jm_client()
+            return self._client
+
+    def _rebuild_client(self, stale: JmcomicClient) -> JmcomicClient:
+        """替换失效的客户端，多个线程同时失败时只重建一次。"""
+        with self._client_lock:
+            if self._client is stale:
+                client = self._option.new_jm_client()
+                if self._config.username and self._config.password:
+                    client.login(self._config.username, self._config.password)
+                self._client = client
+                self.client_rebuilds += 1
+                self._logger.warning(
+                    f"JM客户端请求失败，已重建客户端（第{self.client_rebuilds}次）"
+                )
+            return cast(JmcomicClient, self._client)
+
+    def _call_client(self, func: Callable[[JmcomicClient], T]) -> T:
+        """使用共享客户端执行请求，鉴权或域名失败时重建客户端并重试一次。"""
+        client = self._get_client()
+        try:
+            return func(client)
+        except _CLIENT_FAILURES:
+            return func(self._rebuild_client(client))
 
     @property
     def output_dir(self) -> Path:
-        return Path(self._photo_option.dir_rule.base_dir)
+        return Path(self._config.store_dir)
+
+    @property
+    def image_dir(self) -> Path:
+        """图片库目录，每个章节一个子目录"""
+        return self.output_dir / IMAGE_DIR
 
     def get_album_output_name(
         self, album: JmAlbumDetail, episodes: list[int] | None = None
@@ -214,112 +370,728 @@ class JMService:
         """返回本子集输出文件名（不含扩展名）。"""
         return build_album_output_name(album.id, episodes)
 
+    # region 详情缓存
+
+    async def _get_detail(
+        self, key: tuple[str, str], fetch: Callable[[JmcomicClient], T]
+    ) -> T:
+        """读取详情缓存，未命中时请求 JM，同一 id 的并发请求只发出一次。"""
+        if self._details is not None and self._missing is not None:
+            if (detail := self._details.get(key)) is not None:
+                self.metadata_hits += 1
+                return detail
+            if (missing := self._missing.get(key)) is not None:
+                self.metadata_hits += 1
+                msg, context = missing
+                raise MissingAlbumPhotoException(msg, dict(context))
+
+        self.metadata_misses += 1
+        return await self._detail_inflight.run(
+            key, lambda: self._load_detail(key, fetch)
+        )
+
+    async def _load_detail(
+        self, key: tuple[str, str], fetch: Callable[[JmcomicClient], T]
+    ) -> T:
+        try:
+            detail = await asyncio.to_thread(self._call_client, fetch)
+        except MissingAlbumPhotoException as e:
+            if self._missing is not None:
+                self._missing[key] = (e.msg, e.context)
+            raise
+        if self._details is not None:
+            self._details[key] = detail
+        return detail
+
+    def invalidate_metadata(self, detail_id: str) -> None:
+        """丢弃某个 id 的本子和本子集详情缓存。"""
+        for cache in (self._details, self._missing):
+            if cache is not None:
+                cache.pop(("photo", detail_id), None)
+                cache.pop(("album", detail_id), None)
+
+    @property
+    def metadata_stats(self) -> dict[str, int]:
+        """详情缓存的监控计数
+
+        hits: 命中缓存（含不存在的 id）的次数
+        misses: 请求 JM 的次数（含合并到进行中请求的部分）
+        joins: 合并到进行中请求的次数
+        entries: 当前缓存条目数
+        """
+        return {
+            "hits": self.metadata_hits,
+            "misses": self.metadata_misses,
+            "joins": self._detail_inflight.joins,
+            "entries": len(self._details or ()) + len(self._missing or ()),
+        }
+
     async def get_photo(self, photo_id: str) -> JmPhotoDetail:
-        """异步获取本子信息。
+        """异步获取本子信息（带缓存）。
 
         Raises:
             MissingAlbumPhotoException: 当 photo 不存在时
         """
-        return await asyncio.to_thread(self._get_client().get_photo_detail, photo_id)
+        return await self._get_detail(
+            ("photo", str(photo_id)), lambda client: client.get_photo_detail(photo_id)
+        )
 
-    async def get_album(self, album_id: str):
-        """异步获取本子集信息。
+    async def get_album(self, album_id: str) -> JmAlbumDetail:
+        """异步获取本子集信息（带缓存）。
 
         Raises:
             MissingAlbumPhotoException: 当 album 不存在时
         """
-        return await asyncio.to_thread(self._get_client().get_album_detail, album_id)
+        return await self._get_detail(
+            ("album", str(album_id)), lambda client: client.get_album_detail(album_id)
+        )
+
+    # endregion
 
     async def get_album_from_photo(self, photo: JmPhotoDetail) -> JmAlbumDetail:
         """从 Photo 获取所属 Album。"""
         return await self.get_album(photo.album_id)
 
-    async def download_photo(self, photo: JmPhotoDetail) -> None:
-        """异步下载本子。"""
+    async def _fetch_images(
+        self,
+        photo: JmPhotoDetail | str,
+        queue_key: str,
+        priority: DownloadPriority,
+    ) -> bool:
+        """下载章节图片到图片库，经由全局调度器排队执行。
 
-        def _sync() -> None:
-            downloader = JmDownloader(self._photo_option)
-            with downloader as dler:
-                dler.download_by_photo_detail(photo)
+        下载前按章节清单校验已有图片，只下载缺失或未完成的图片。
+        photo 为章节 ID 时在获得调度名额后再获取详情，
+        本子集的大量章节不会同时请求详情接口。
 
-        await asyncio.to_thread(_sync)
+        Returns:
+            是否所有图片都下载成功
+        """
+        photo_id = photo if isinstance(photo, str) else str(photo.id)
+        episode_dir = self.image_dir / photo_id
+
+        def _sync(detail: JmPhotoDetail) -> tuple[bool, ResumeStats]:
+            resume = prepare_resume(episode_dir)
+            downloader = JmDownloader(self._option)
+            with jm_task_context(runtime=self._image_runtime), downloader as dler:
+                dler.download_by_photo_detail(detail)
+            return not dler.has_download_failures, resume
+
+        async with self.scheduler.slot(queue_key, priority):
+            detail = await self.get_photo(photo) if isinstance(photo, str) else photo
+            with self.images.pin(photo_id):
+                try:
+                    complete, resume = await asyncio.to_thread(_sync, detail)
+                except Exception:
+                    # 下载失败说明缓存的详情可能已过时
+                    self.invalidate_metadata(photo_id)
+                    raise
+        if resume.pages:
+            self.resumed_pages += resume.pages
+            self.resumed_bytes += resume.bytes
+            self._logger.info(
+                f"章节{photo_id}断点续传: 复用{resume.pages}张图片"
+                f"({resume.bytes / 1024 / 1024:.1f}MB)，丢弃{resume.discarded}张未完成图片"
+            )
+        await asyncio.to_thread(self._finish_episode, photo_id, complete)
+        return complete
+
+    def _finish_episode(self, photo_id: str, complete: bool) -> None:
+        episode_dir = self.image_dir / photo_id
+        if complete and episode_dir.is_dir():
+            (episode_dir / EPISODE_COMPLETE_MARKER).touch()
+        self.images.register(photo_id)
+
+    def episode_lock(self, photo_id: str) -> FileLock:
+        """章节图片的下载锁，跨进程有效。"""
+        return FileLock(self.output_dir / LOCK_DIR / "episodes" / f"{photo_id}.lock")
+
+    def is_episode_cached(self, photo_id: str) -> bool:
+        """章节图片是否已完整保存在图片库中"""
+        return (self.image_dir / photo_id / EPISODE_COMPLETE_MARKER).exists()
+
+    async def ensure_episode(
+        self,
+        photo: JmPhotoDetail | str,
+        *,
+        queue_key: str = "",
+        priority: DownloadPriority = DownloadPriority.NORMAL,
+    ) -> bool:
+        """确保章节图片在图片库中，已完整缓存时不发起任何请求。
+
+        同一章节的并发请求（单章节下载、不同的本子集选择）只下载一次；
+        共享缓存目录的其他实例正在下载时等待其完成后复用。
+
+        photo: 章节详情，或章节 ID（需要下载时再获取详情）
+
+        Returns:
+            章节图片是否完整；不完整时不写入完成标记，下次请求时续传缺失的图片
+        """
+        photo_id = photo if isinstance(photo, str) else str(photo.id)
+        if self.is_episode_cached(photo_id):
+            self.episode_hits += 1
+            self.images.touch(photo_id)
+            return True
 
-    async def download_album(
-        self, album: JmAlbumDetail, episodes: list[int] | None = None
+        async def download() -> bool:
+            async with self.episode_lock(photo_id).hold_async():
+                if self.is_episode_cached(photo_id):
+                    self.episode_hits += 1
+                    self.images.touch(photo_id)
+                    return True
+                complete = await self._fetch_images(photo, queue_key, priority)
+            if not complete:
+                self._logger.warning(f"章节{photo_id}部分图片下载失败，下次请求时重试")
+            return complete
+
+        return await self._episode_inflight.run(photo_id, download)
+
+    async def pack_output(
+        self, image_dirs: list[str], filename: str, *, nested: bool = False
     ) -> None:
-        """异步下载本子集。
+        """从图片库打包输出文件，只涉及本地 I/O。
 
+        Raises:
+            PackError: 图片库中没有对应章节的图片时
+        """
+        with self.images.pin(*image_dirs):
+            await asyncio.to_thread(
+                pack_images,
+                self._config.output_format,
+                [self.image_dir / name for name in image_dirs],
+                self.output_dir / filename,
+                self._config.zip_password,
+                nested,
+            )
+
+    async def download_photo(
+        self,
+        photo: JmPhotoDetail | str,
+        *,
+        queue_key: str = "",
+        priority: DownloadPriority = DownloadPriority.NORMAL,
+    ) -> bool:
+        """异步下载本子并打包输出文件，下载经由全局调度器排队执行。
+
+        photo: 章节详情，或章节 ID（需要下载时再获取详情）
+        queue_key: 调度轮询分组（群号或私聊用户）
+        priority: 调度优先级
+
+        Returns:
+            是否生成了输出文件；章节图片不完整时不打包，避免缓存残缺的文件
+        """
+        photo_id = photo if isinstance(photo, str) else str(photo.id)
+        if not await self.ensure_episode(photo, queue_key=queue_key, priority=priority):
+            return False
+        await self.pack_output(
+            [photo_id], f"{photo_id}{self._config.output_format.ext}"
+        )
+        return True
+
+    async def download_album(
+        self,
+        album: JmAlbumDetail,
+        episodes: list[int] | None = None,
+        *,
+        queue_key: str = "",
+        priority: DownloadPriority = DownloadPriority.NORMAL,
+    ) -> bool:
+        """异步准备本子集输出文件：并行确保各章节图片在图片库中，再合并打包。
+
+        已缓存的章节直接复用，只下载缺失的章节。各章节分别经由调度器排队，
+        获得调度名额后才请求章节详情，详情请求与下载受同一并发上限约束；
+        图片请求共享全局图片线程池；任一章节失败时取消其余章节。
         episodes: 从0开始的章节索引列表，None 表示全部。
+
+        Returns:
+            是否生成了输出文件；任一章节图片不完整时不打包（完整的章节仍保留在图片库）
         """
-        cast(Any, album).output_name = self.get_album_output_name(album, episodes)
+        output_name = self.get_album_output_name(album, episodes)
+        episode_list = album.episode_list
         if episodes is not None:
-            album.episode_list = [album.episode_list[i] for i in episodes]
+            episode_list = [episode_list[i] for i in episodes]
+
+        image_dirs = [str(episode[0]) for episode in episode_list]
+        with self.images.pin(*image_dirs):
+            tasks = [
+                asyncio.create_task(
+                    self.ensure_episode(
+                        photo_id, queue_key=queue_key, priority=priority
+                    )
+                )
+                for photo_id in image_dirs
+            ]
+            try:
+                complete = all(await asyncio.gather(*tasks))
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+                    elif not task.cancelled():
+                        task.exception()  # 取走异常，避免未处理异常告警
+        if not complete:
+            return False
+        await self.pack_output(
+            image_dirs,
+            f"{output_name}{self._config.output_format.ext}",
+            nested=True,
+        )
+        return True
+
+    @property
+    def download_stats(self) -> dict[str, int]:
+        """下载合并的监控计数
 
-        def _sync() -> None:
-            downloader = JmDownloader(self._album_option)
-            with downloader as dler:
-                dler.download_by_album_detail(album)
+        artifact_hits: 输出文件已存在直接复用的次数
+        leaders: 实际执行下载的次数
+        joins: 加入进行中下载的次数
+        """
+        return {"artifact_hits": self.artifact_hits, **self._inflight.stats()}
 
-        await asyncio.to_thread(_sync)
+    async def is_artifact_ready(self, file_path: Path) -> bool:
+        """输出文件是否已完整生成（存在且通过格式完整性检查）。"""
+        return await asyncio.to_thread(
+            is_complete_output, self._config.output_format, file_path
+        )
 
-    async def prepare_photo_file(self, photo: JmPhotoDetail) -> tuple[str, str] | None:
-        """下载并准备输出文件，返回 (文件路径, 扩展名) 或 None。"""
-        fmt = self._config.output_format
-        ext = fmt.ext
-        file_path = self.output_dir / f"{photo.id}{ext}"
-
-        if not file_path.exists():
-            await self.download_photo(photo)
-            if not file_path.exists():
-                self._logger.error(
-                    f"下载后输出文件不存在: {file_path}，可能是 {fmt} 插件执行失败"
-                )
-                return None
+    def artifact_lock(self, filename: str) -> FileLock:
+        """输出文件的构建锁，跨进程有效。"""
+        return FileLock(self.output_dir / LOCK_DIR / f"{filename}.lock")
+
+    async def _build_artifact(
+        self, filename: str, download: Callable[[], Awaitable[bool]]
+    ) -> bool:
+        """持有构建锁执行下载并确认输出文件完整，随后按缓存预算淘汰旧文件。
+
+        获得锁后若输出文件已由其他进程生成则直接复用。
+        图片下载不完整时构建失败，不生成、不登记输出文件，下次请求时续传重试。
+        """
+        file_path = self.output_dir / filename
+        with self.artifacts.pin(filename):
+            async with self.artifact_lock(filename).hold_async():
+                if await self.is_artifact_ready(file_path):
+                    self.artifact_hits += 1
+                    self.artifacts.touch(filename)
+                    return True
+                try:
+                    if not await download():
+                        self._logger.error(
+                            f"图片下载不完整，未生成输出文件: {filename}"
+                        )
+                        return False
+                except PackError as e:
+                    self._logger.error(f"打包输出文件失败: {e}")
+                    return False
+                if not await self.is_artifact_ready(file_path):
+                    self._logger.error(f"下载后输出文件不存在或不完整: {file_path}")
+                    return False
+                self.artifacts.register(filename)
+            await self.trim_cache()
+        return True
+
+    async def trim_cache(self, *, sweep: bool = False) -> list[str]:
+        """按容量和存活时间预算淘汰缓存，返回被删除的条目名称。
+
+        sweep: 同时清理进程崩溃遗留的打包临时文件和锁文件（供定时整理使用）
+        """
+        await asyncio.to_thread(self.covers.evict_expired)
+        removed = await asyncio.to_thread(self.artifacts.evict)
+        removed += [
+            f"{IMAGE_DIR}/{name}" for name in await asyncio.to_thread(self.images.evict)
+        ]
+        removed += [
+            f"{self.UPLOAD_DIR}/{name}"
+            for name in await asyncio.to_thread(self._remove_stale_uploads)
+        ]
+        if sweep:
+            removed += await asyncio.to_thread(self._remove_stale_builds)
+        if removed:
+            self._logger.info(f"已淘汰 {len(removed)} 个缓存条目: {removed}")
+        return removed
+
+    def _remove_stale_builds(self) -> list[str]:
+        """删除进程崩溃遗留的打包临时文件和无人持有的锁文件
+
+        临时文件只在持有对应输出文件的构建锁时写入，能获得构建锁说明写入者已退出。
+        按构建锁而不是进程号判断，共享缓存目录的其他容器中的进程同样适用。
+        """
+        removed: list[str] = []
+        for path in self.output_dir.glob(".*.tmp"):
+            # 临时文件名：.<输出文件名>.<进程号>.tmp
+            filename = path.name[1:].removesuffix(".tmp").rpartition(".")[0]
+            lock = self.artifact_lock(filename)
+            if not lock.try_acquire():
+                continue
+            try:
+                path.unlink(missing_ok=True)
+            finally:
+                lock.release()
+            removed.append(path.name)
+        lock_dir = self.output_dir / LOCK_DIR
+        removed += [
+            path.relative_to(self.output_dir).as_posix()
+            for path in remove_unused_locks(lock_dir)
+        ]
+        return removed
+
+    @contextmanager
+    def hold_file(self, file_path: str) -> Iterator[None]:
+        """在上传等使用期间固定输出文件，防止被缓存淘汰。
+
+        prepare_* 返回时已固定的文件在结束后解除固定；
+        单次上传的 MD5 副本不受缓存管理，使用结束后直接删除。
+        """
+        if file_path in self._upload_copies:
+            try:
+                yield
+            finally:
+                self._release_upload_copy(file_path)
+        elif self._leases[file_path] > 0:
+            try:
+                yield
+            finally:
+                self._release_lease(file_path)
+        else:
+            with self.artifacts.pin(Path(file_path).name):
+                yield
+
+    def _release_lease(self, file_path: str) -> None:
+        self._leases[file_path] -= 1
+        if self._leases[file_path] <= 0:
+            del self._leases[file_path]
+        self.artifacts.release(Path(file_path).name)
+
+    # region 上传副本
 
-        if fmt == OutputFormat.PDF and self._config.modify_md5:
-            modified_path = await prepare_pdf_with_unique_md5(
-                str(file_path), str(self.output_dir), str(photo.id)
+    @property
+    def upload_dir(self) -> Path:
+        # 上传副本只属于当前实例，始终放在实例自己的缓存目录
+        return Path(self._config.cache_dir) / self.UPLOAD_DIR
+
+    async def _create_upload_copy(self, file_path: Path, name: str) -> str | None:
+        """为单次上传生成 MD5 唯一的 PDF 副本，失败返回 None。"""
+        dest = self.upload_dir / f"{name}_{secrets.token_hex(4)}.pdf"
+        key = str(dest)
+        # 写入前先登记，避免写入期间被 trim_cache 当作遗留文件删除
+        self._upload_copies[key] = (0, 0)
+        try:
+            written, held = await asyncio.to_thread(
+                self._write_upload_copy, file_path, dest
             )
-            if modified_path is None:
-                return None
-            return (modified_path, ext)
+        except OSError as e:
+            del self._upload_copies[key]
+            self._logger.error(f"生成上传副本失败: {e}")
+            return None
+        self._upload_copies[key] = (written, held)
+        self.upload_copies += 1
+        self.upload_bytes_written += written
+        return key
+
+    def _write_upload_copy(self, src: Path, dest: Path) -> tuple[int, int]:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        written = write_unique_pdf(str(src), str(dest))
+        return written, dest.stat().st_size
+
+    def discard_file(self, file_path: str) -> None:
+        """放弃不再上传的文件：解除固定，是上传副本时立即删除。"""
+        if file_path in self._upload_copies:
+            self._release_upload_copy(file_path)
+        elif self._leases[file_path] > 0:
+            self._release_lease(file_path)
+
+    def _release_upload_copy(self, file_path: str) -> None:
+        written, held = self._upload_copies.pop(file_path)
+        Path(file_path).unlink(missing_ok=True)
+        self._logger.debug(
+            f"已删除上传副本 {Path(file_path).name}: 写入{written}字节，占用{held}字节"
+        )
+
+    def _remove_stale_uploads(self) -> list[str]:
+        """删除未在使用中的上传副本（如上传期间进程退出遗留的文件）"""
+        if not self.upload_dir.exists():
+            return []
+        removed: list[str] = []
+        for path in self.upload_dir.iterdir():
+            if str(path) not in self._upload_copies:
+                path.unlink(missing_ok=True)
+                removed.append(path.name)
+        return removed
+
+    @property
+    def upload_stats(self) -> dict[str, int]:
+        """上传副本的监控数据
+
+        copies: 累计生成的副本数
+        bytes_written: 累计写入磁盘的字节数
+        held: 当前使用中的副本数
+        held_bytes: 当前使用中的副本占用的字节数
+        """
+        return {
+            "copies": self.upload_copies,
+            "bytes_written": self.upload_bytes_written,
+            "held": len(self._upload_copies),
+            "held_bytes": sum(held for _, held in self._upload_copies.values()),
+        }
+
+    # endregion
+
+    async def prepare_photo_file(
+        self,
+        photo: JmPhotoDetail,
+        *,
+        queue_key: str = "",
+        priority: DownloadPriority = DownloadPriority.NORMAL,
+    ) -> tuple[str, str] | None:
+        """下载并准备输出文件，返回 (文件路径, 扩展名) 或 None。
 
-        return (str(file_path), ext)
+        返回的文件已固定，需在 hold_file 中使用（或以 discard_file 放弃），结束后解除固定；
+        开启 modify_md5 时返回单次上传的副本，使用结束后自动删除。
+        queue_key / priority: 需要下载时传给调度器的分组和优先级
+        """
+        fmt = self._config.output_format
+        return await self._prepare_artifact(
+            ("photo", str(photo.id), fmt),
+            self.output_dir / f"{photo.id}{fmt.ext}",
+            str(photo.id),
+            lambda: self.download_photo(photo, queue_key=queue_key, priority=priority),
+        )
 
     async def prepare_album_file(
-        self, album: JmAlbumDetail, episodes: list[int] | None = None
+        self,
+        album: JmAlbumDetail,
+        episodes: list[int] | None = None,
+        *,
+        queue_key: str = "",
+        priority: DownloadPriority = DownloadPriority.NORMAL,
     ) -> tuple[str, str] | None:
         """下载并准备本子集输出文件，返回 (文件路径, 扩展名) 或 None。
 
+        返回的文件与 prepare_photo_file 一样已固定。
         episodes: 从0开始的章节索引列表，None 表示全部。
+        queue_key / priority: 需要下载时传给调度器的分组和优先级
         """
         fmt = self._config.output_format
-        ext = fmt.ext
         output_name = self.get_album_output_name(album, episodes)
-        file_path = self.output_dir / f"{output_name}{ext}"
+        return await self._prepare_artifact(
+            ("album", output_name, fmt),
+            self.output_dir / f"{output_name}{fmt.ext}",
+            output_name,
+            lambda: self.download_album(
+                album, episodes, queue_key=queue_key, priority=priority
+            ),
+        )
 
-        if not file_path.exists():
-            await self.download_album(album, episodes)
-            if not file_path.exists():
-                self._logger.error(
-                    f"下载后输出文件不存在: {file_path}，可能是 {fmt} 插件执行失败"
-                )
+    async def _prepare_artifact(
+        self,
+        key: tuple[str, str, OutputFormat],
+        file_path: Path,
+        copy_name: str,
+        download: Callable[[], Awaitable[bool]],
+    ) -> tuple[str, str] | None:
+        """确保输出文件存在并固定后返回，从检查到交给调用方期间不会被淘汰。
+
+        key: 进行中构建的合并键
+        copy_name: 上传副本的文件名前缀
+        """
+        ext = self._config.output_format.ext
+        self.artifacts.acquire(file_path.name)
+        leased = False
+        try:
+            if await self.is_artifact_ready(file_path):
+                self.artifact_hits += 1
+                self.artifacts.touch(file_path.name)
+            elif not await self._inflight.run(
+                key, lambda: self._build_artifact(file_path.name, download)
+            ):
                 return None
 
-        if fmt == OutputFormat.PDF and self._config.modify_md5:
-            modified_path = await prepare_pdf_with_unique_md5(
-                str(file_path), str(self.output_dir), output_name
+            if (
+                self._config.output_format == OutputFormat.PDF
+                and self._config.modify_md5
+            ):
+                # 副本不受缓存管理，生成后原文件即可解除固定
+                modified_path = await self._create_upload_copy(file_path, copy_name)
+                if modified_path is None:
+                    return None
+                return (modified_path, ext)
+
+            self._leases[str(file_path)] += 1
+            leased = True
+            return (str(file_path), ext)
+        finally:
+            if not leased:
+                self.artifacts.release(file_path.name)
+
+    async def prepare_episode_file(
+        self,
+        photo_id: str,
+        *,
+        queue_key: str = "",
+        priority: DownloadPriority = DownloadPriority.NORMAL,
+    ) -> tuple[str, str] | None:
+        """按章节 ID 准备单章节输出文件，与单章节下载共用缓存。
+
+        只在需要下载时（获得调度名额后）才请求章节详情。
+        """
+        fmt = self._config.output_format
+        return await self._prepare_artifact(
+            ("photo", photo_id, fmt),
+            self.output_dir / f"{photo_id}{fmt.ext}",
+            photo_id,
+            lambda: self.download_photo(
+                photo_id, queue_key=queue_key, priority=priority
+            ),
+        )
+
+    async def stream_album_files(
+        self,
+        album: JmAlbumDetail,
+        episodes: list[int] | None = None,
+        *,
+        queue_key: str = "",
+        priority: DownloadPriority = DownloadPriority.NORMAL,
+    ) -> AsyncIterator[tuple[int, tuple[str, str] | None]]:
+        """逐章节准备本子集输出文件，按章节顺序产出 (章节索引, 准备结果)。
+
+        所有章节同时提交给调度器，前面的章节就绪即可产出，
+        调用方上传时后面的章节仍在下载。章节失败时结果为 None。
+        episodes: 从0开始的章节索引列表，None 表示全部。
+        """
+        indices = range(len(album.episode_list)) if episodes is None else episodes
+        tasks = [
+            (
+                index,
+                asyncio.create_task(
+                    self.prepare_episode_file(
+                        str(album.episode_list[index][0]),
+                        queue_key=queue_key,
+                        priority=priority,
+                    )
+                ),
             )
-            if modified_path is None:
-                return None
-            return (modified_path, ext)
+            for index in indices
+        ]
+        yielded = 0
+        try:
+            for index, task in tasks:
+                try:
+                    result = await task
+                except Exception as e:
+                    self._logger.warning(
+                        f"本子集{album.id}第{index + 1}话准备失败: {e}"
+                    )
+                    result = None
+                yielded += 1
+                yield index, result
+        finally:
+            for _, task in tasks[yielded:]:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    # 调用方提前结束时，未交付章节的上传副本不会再被使用
+                    if (result := task.result()) is not None:
+                        self.discard_file(result[0])
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """规范化搜索关键词作为缓存键：合并空白并忽略大小写。"""
+        return " ".join(query.split()).casefold()
 
-        return (str(file_path), ext)
+    async def search(self, query: str, page: int = 1) -> JmSearchPage:
+        """异步搜索本子（带共享缓存），相同关键词和页码的并发搜索只请求一次。
 
-    async def search(self, query: str, page: int = 1):
-        """异步搜索本子。"""
-        return await asyncio.to_thread(
-            self._get_client().search_site, search_query=query, page=page
+        规范化后的关键词只用作缓存键，请求 JM 时使用用户输入的原始关键词。
+        """
+        key = (self.normalize_query(query), page)
+        if (
+            self._searches is not None
+            and (cached := self._searches.get(key)) is not None
+        ):
+            self.search_hits += 1
+            return cached
+        return await self._search_inflight.run(
+            key, lambda: self._load_search(key, query)
+        )
+
+    async def _load_search(self, key: tuple[str, int], query: str) -> JmSearchPage:
+        page = key[1]
+        result = await asyncio.to_thread(
+            self._call_client,
+            lambda client: client.search_site(search_query=query, page=page),
+        )
+        if self._searches is not None:
+            self._searches[key] = result
+        return result
+
+    @property
+    def search_stats(self) -> dict[str, int]:
+        """搜索缓存的监控计数
+
+        hits: 命中缓存的次数
+        leaders: 实际请求 JM 的次数
+        joins: 合并到进行中搜索的次数
+        entries: 当前缓存条目数
+        preview_hits: 搜索页信息完整、无需请求详情的结果数
+        preview_fetches: 需要请求详情补全的结果数
+        """
+        return {
+            "hits": self.search_hits,
+            "leaders": self._search_inflight.leaders,
+            "joins": self._search_inflight.joins,
+            "entries": len(self._searches or ()),
+            "preview_hits": self.preview_hits,
+            "preview_fetches": self.preview_fetches,
+        }
+
+    @staticmethod
+    def search_previews(page: JmSearchPage) -> list[SearchPreview]:
+        """提取搜索页自带的结果信息。
+
+        API 客户端的搜索结果只有标题和作者，没有标签；网页客户端只有标题和标签，
+        没有作者。因此普通搜索结果都不完整，仍需请求详情。
+        只有搜索 jm 号直接跳转到本子时，页面附带完整的本子详情，可直接使用。
+        """
+        if page.is_single_album:
+            album = page.single_album
+            return [
+                SearchPreview(
+                    id=str(album.album_id),
+                    title=album.name,
+                    author=album.author,
+                    tags=tuple(album.tags or ()),
+                )
+            ]
+        previews = []
+        for album_id, info in page.content:
+            author = info.get("author") or ""
+            if isinstance(author, list):
+                author = " ".join(author)
+            previews.append(
+                SearchPreview(
+                    id=str(album_id),
+                    title=info.get("name") or "",
+                    author=author,
+                    tags=tuple(info.get("tags") or ()),
+                )
+            )
+        return previews
+
+    async def complete_preview(self, preview: SearchPreview) -> SearchPreview:
+        """补全搜索页缺失的字段，信息完整时不发起请求。
+
+        Raises:
+            MissingAlbumPhotoException: 当 photo 不存在时
+        """
+        if preview.is_complete:
+            self.preview_hits += 1
+            return preview
+        self.preview_fetches += 1
+        photo = await self.get_photo(preview.id)
+        return SearchPreview(
+            id=str(photo.id),
+            title=photo.title,
+            author=photo.author,
+            tags=tuple(photo.tags or ()),
         )
 
     async def download_avatar(self, photo_id: int | str) -> BytesIO:
@@ -328,24 +1100,121 @@ class JMService:
         Raises:
             AvatarDownloadError: 所有域名均失败时
         """
-        async with httpx.AsyncClient() as http_client:
-            for domain in JmModuleConfig.DOMAIN_IMAGE_LIST:
-                url = f"https://{domain}/media/albums/{photo_id}.jpg"
-                try:
-                    response = await http_client.get(url, timeout=40)
-                    response.raise_for_status()
-                    if len(response.content) >= 1024:
-                        return BytesIO(response.content)
-                    self._logger.debug(
-                        f"下载{photo_id}封面失败: domain={domain},内容过小"
-                    )
-                except (httpx.HTTPStatusError, httpx.RequestError) as e:
-                    self._logger.debug(
-                        f"下载{photo_id}封面失败: domain={domain}, error={e}"
-                    )
+        content = await self._cover_fetcher.fetch(photo_id)
+        if content is None:
+            self._logger.warning(f"下载{photo_id}封面失败")
+            raise AvatarDownloadError(photo_id)
+        return BytesIO(content)
+
+    async def get_blurred_cover(self, photo_id: int | str) -> BytesIO:
+        """获取模糊处理后的封面，命中缓存时跳过下载和模糊处理。
+
+        Raises:
+            AvatarDownloadError: 所有域名均失败时
+        """
+        photo_id = str(photo_id)
+        data = await self.covers.get(photo_id)
+        if data is None:
+            data = await self._cover_inflight.run(
+                photo_id, lambda: self._render_cover(photo_id)
+            )
+        return BytesIO(data)
 
-        self._logger.warning(f"下载{photo_id}封面失败")
-        raise AvatarDownloadError(photo_id)
+    async def _render_cover(self, photo_id: str) -> bytes:
+        avatar = await self.download_avatar(photo_id)
+        data = await render_preview_async(avatar.getvalue(), self._preview_options)
+        await self.covers.put(photo_id, data)
+        return data
+
+    async def _limited(self, work: Coroutine[Any, Any, T]) -> T:
+        try:
+            async with self._card_slots:
+                return await work
+        finally:
+            # 等待名额时被取消，work 从未开始执行，关闭以免未等待告警
+            work.close()
+
+    async def stream_search_cards(
+        self, previews: list[SearchPreview]
+    ) -> AsyncIterator[tuple[SearchPreview, BytesIO | None] | None]:
+        """并行准备一页搜索卡片，按原顺序逐个产出 (补全后的信息, 模糊封面)。
+
+        每个结果的详情补全和封面下载/模糊独立进行，受全局并发上限约束；
+        搜索页信息已完整的结果无需请求详情，不占用并发名额。
+        超过 search_deadline 仍未完成的封面降级为纯文字卡片；
+        详情超时的结果在搜索页带有标签时退回搜索页信息，只产出纯文字卡片（不附封面）；
+        搜索页没有标签时无法做内容限制检查，与详情失败（如本子不存在）的结果一样产出 None。
+        """
+        details = [
+            asyncio.create_task(
+                self.complete_preview(preview)
+                if preview.is_complete
+                else self._limited(self.complete_preview(preview))
+            )
+            for preview in previews
+        ]
+        covers = [
+            asyncio.create_task(self._limited(self.get_blurred_cover(preview.id)))
+            for preview in previews
+        ]
+        loop = asyncio.get_running_loop()
+        deadline = self._config.search_deadline
+        expires_at = loop.time() + deadline if deadline > 0 else None
+
+        def result(task: asyncio.Task[T]) -> T | None:
+            if not task.done() or task.cancelled() or task.exception():
+                return None
+            return task.result()
+
+        expired = False
+        try:
+            for preview, detail_task, cover_task in zip(
+                previews, details, covers, strict=True
+            ):
+                if not expired:
+                    timeout = None
+                    if expires_at is not None:
+                        timeout = max(0.0, expires_at - loop.time())
+                    await asyncio.wait([detail_task, cover_task], timeout=timeout)
+                if not expired and not (detail_task.done() and cover_task.done()):
+                    # 已到时限，剩余未完成的任务全部降级
+                    expired = True
+                    late = [t for t in (*details, *covers) if not t.done()]
+                    for task in late:
+                        task.cancel()
+                    self.degraded_cards += len(late)
+                    self._logger.warning(f"搜索卡片超时，{len(late)} 项已降级")
+                if not detail_task.done() or detail_task.cancelled():
+                    # 详情超时（已请求取消，尚未结束）；
+                    # 没有标签的结果无法检查限制标签，不能展示
+                    yield (preview, None) if preview.tags else None
+                    continue
+                detail = result(detail_task)
+                yield None if detail is None else (detail, result(cover_task))
+        finally:
+            for task in (*details, *covers):
+                if task.done():
+                    result(task)  # 取走异常，避免未处理异常告警
+                else:
+                    task.cancel()
+
+    async def prepare_search_cards(
+        self, previews: list[SearchPreview]
+    ) -> list[tuple[SearchPreview, BytesIO | None]]:
+        """准备一页搜索卡片，略过详情不可用的结果。"""
+        return [
+            card
+            async for card in self.stream_search_cards(previews)
+            if card is not None
+        ]
+
+    async def aclose(self) -> None:
+        """释放网络连接、图片线程池等资源，写回缓存访问记录。"""
+        await self._cover_fetcher.aclose()
+        await asyncio.to_thread(self.artifacts.save)
+        await asyncio.to_thread(self.images.save)
+        if self._image_runtime is not None:
+            await asyncio.to_thread(self._image_runtime.close)
 
     @staticmethod
     def format_photo_info(
@@ -367,6 +1236,16 @@ class JMService:
 
         return "\n".join(lines)
 
+    @staticmethod
+    def format_search_preview(preview: SearchPreview) -> str:
+        """格式化搜索结果信息（ID、标题、作者、标签）。"""
+        lines = [
+            f"jm{preview.id} | {preview.title}",
+            f"🎨 作者: {preview.author}",
+            "🔖 标签: " + " ".join(f"#{tag}" for tag in preview.tags),
+        ]
+        return "\n".join(lines)
+
     @staticmethod
     def format_album_info(album: JmAlbumDetail) -> str:
         """格式化本子集信息（ID、标题、作者、标签、章节数）。"""
@@ -0,0 +1,159 @@
+"""后台下载任务日志
+
+用本地 SQLite 数据库持久化后台下载任务，Bot 重启后据此恢复未完成的任务。
+所有操作都是单行读写，直接在事件循环中同步执行。
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from ..core.download_job import DownloadJob
+from ..core.enums import DownloadPriority, JobKind, JobState
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    jm_id TEXT NOT NULL,
+    episodes TEXT,
+    bot_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    group_id INTEGER,
+    priority TEXT NOT NULL,
+    charge INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+# 未结束的任务状态
+_UNFINISHED = (JobState.PENDING.value, JobState.RUNNING.value)
+
+
+def _to_job(row: sqlite3.Row) -> DownloadJob:
+    return DownloadJob(
+        id=row["id"],
+        kind=JobKind(row["kind"]),
+        jm_id=row["jm_id"],
+        episodes=None if row["episodes"] is None else json.loads(row["episodes"]),
+        bot_id=row["bot_id"],
+        user_id=row["user_id"],
+        group_id=row["group_id"],
+        priority=DownloadPriority(row["priority"]),
+        charge=bool(row["charge"]),
+        state=JobState(row["state"]),
+        attempts=row["attempts"],
+        created_at=row["created_at"],
+        finished_at=row["finished_at"],
+    )
+
+
+class JobJournal:
+    """后台下载任务日志
+
+    任务入队时写入，开始执行和结束时更新状态；
+    已结束的任务保留一段时间供排查，由 prune 定期清理。
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: 数据库文件路径，不存在时自动创建
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, job: DownloadJob) -> DownloadJob:
+        """写入新任务，回填 id 和创建时间"""
+        job.state = JobState.PENDING
+        job.created_at = time.time()
+        cursor = self._conn.execute(
+            "INSERT INTO jobs (kind, jm_id, episodes, bot_id, user_id, group_id,"
+            " priority, charge, state, attempts, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job.kind.value,
+                job.jm_id,
+                None if job.episodes is None else json.dumps(job.episodes),
+                job.bot_id,
+                job.user_id,
+                job.group_id,
+                job.priority.value,
+                int(job.charge),
+                job.state.value,
+                job.attempts,
+                job.created_at,
+            ),
+        )
+        job.id = cursor.lastrowid or 0
+        return job
+
+    def get(self, job_id: int) -> DownloadJob | None:
+        """按 id 读取任务"""
+        row = self._conn.execute(
+            "SELECT * FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return None if row is None else _to_job(row)
+
+    def start(self, job: DownloadJob) -> None:
+        """标记任务开始执行，执行次数加一"""
+        job.state = JobState.RUNNING
+        job.attempts += 1
+        self._conn.execute(
+            "UPDATE jobs SET state = ?, attempts = ? WHERE id = ?",
+            (job.state.value, job.attempts, job.id),
+        )
+
+    def finish(self, job: DownloadJob, state: JobState) -> None:
+        """标记任务结束
+
+        Raises:
+            ValueError: state 不是结束状态时
+        """
+        if state not in (JobState.DONE, JobState.FAILED):
+            raise ValueError(f"不是结束状态: {state!r}")
+        job.state = state
+        job.finished_at = time.time()
+        self._conn.execute(
+            "UPDATE jobs SET state = ?, finished_at = ? WHERE id = ?",
+            (job.state.value, job.finished_at, job.id),
+        )
+
+    def unfinished(self) -> list[DownloadJob]:
+        """按入队顺序列出未结束的任务（含上次运行中被中断的任务）"""
+        rows = self._conn.execute(
+            "SELECT * FROM jobs WHERE state IN (?, ?) ORDER BY id", _UNFINISHED
+        ).fetchall()
+        return [_to_job(row) for row in rows]
+
+    def pending_charges(self, user_id: int) -> int:
+        """用户未结束且完成后需要扣次数的任务数"""
+        (count,) = self._conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND charge = 1"
+            " AND state IN (?, ?)",
+            (user_id, *_UNFINISHED),
+        ).fetchone()
+        return count
+
+    def prune(self, max_age: float) -> int:
+        """删除结束超过 max_age 秒的任务，返回删除数量"""
+        cursor = self._conn.execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (time.time() - max_age,),
+        )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self._conn.close()
@@ -0,0 +1,128 @@
+"""输出文件打包
+
+把图片库中已下载的章节图片打包为 PDF 或 ZIP（可加密），
+替代 jmcomic 的 img2pdf/zip 插件，打包不会删除原图，同一章节可重复用于不同输出。
+输出先写入同目录下的临时文件，完成后原子重命名，不会出现写了一半的输出文件。
+"""
+
+from __future__ import annotations
+
+import os
+import zipfile
+from collections.abc import Sequence
+from pathlib import Path
+
+import img2pdf
+import pyzipper
+
+from ..core.enums import OutputFormat
+
+# 视为章节图片的文件后缀
+IMAGE_SUFFIXES = frozenset({".jpg", ".jpeg", ".png", ".webp", ".gif"})
+# 校验 PDF 时读取文件末尾的字节数
+_PDF_TAIL_BYTES = 1024
+
+
+class PackError(Exception):
+    description = "打包输出文件失败"
+
+
+def list_images(image_dir: Path) -> list[Path]:
+    """按文件名顺序列出章节目录下的图片，忽略隐藏文件和临时文件"""
+    if not image_dir.is_dir():
+        return []
+    return sorted(
+        path
+        for path in image_dir.iterdir()
+        if path.suffix.lower() in IMAGE_SUFFIXES
+        and not path.name.startswith(".")
+        and path.is_file()
+    )
+
+
+def pack_pdf(image_dirs: Sequence[Path], output: Path) -> None:
+    """把多个章节目录的图片按顺序合并为一个 PDF"""
+    images = [str(path) for image_dir in image_dirs for path in list_images(image_dir)]
+    if not images:
+        raise PackError(f"没有可打包的图片: {[str(d) for d in image_dirs]}")
+    with output.open("wb") as f:
+        img2pdf.convert(images, outputstream=f)
+
+
+def pack_zip(
+    image_dirs: Sequence[Path],
+    output: Path,
+    password: str | None = None,
+    nested: bool = False,
+) -> None:
+    """把章节目录的图片打包为 ZIP
+
+    Args:
+        image_dirs: 章节图片目录
+        output: 输出文件路径
+        password: 设置时使用 AES 加密
+        nested: 为 True 时每个章节放在以章节目录名命名的子文件夹中（本子集）
+    """
+    entries = [
+        (path, f"{image_dir.name}/{path.name}" if nested else path.name)
+        for image_dir in image_dirs
+        for path in list_images(image_dir)
+    ]
+    if not entries:
+        raise PackError(f"没有可打包的图片: {[str(d) for d in image_dirs]}")
+
+    if password:
+        archive = pyzipper.AESZipFile(output, "w", pyzipper.ZIP_DEFLATED)
+        archive.setencryption(pyzipper.WZ_AES, nbits=128)
+        archive.setpassword(password.encode())
+    else:
+        archive = zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED)
+    with archive:
+        for path, arcname in entries:
+            archive.write(path, arcname)
+
+
+def pack_images(
+    fmt: OutputFormat,
+    image_dirs: Sequence[Path],
+    output: Path,
+    password: str | None = None,
+    nested: bool = False,
+) -> None:
+    """按输出格式打包章节图片
+
+    先写入临时文件（`.` 开头，不受缓存管理），完成后原子替换为 output。
+
+    Raises:
+        PackError: 没有可打包的图片时
+        ValueError: 不支持的输出格式
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_output = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+    try:
+        match fmt:
+            case OutputFormat.PDF:
+                pack_pdf(image_dirs, tmp_output)
+            case OutputFormat.ZIP:
+                pack_zip(image_dirs, tmp_output, password, nested)
+            case _:
+                raise ValueError(f"不支持的输出格式: {fmt!r}")
+        os.replace(tmp_output, output)
+    finally:
+        tmp_output.unlink(missing_ok=True)
+
+
+def is_complete_output(fmt: OutputFormat, path: Path) -> bool:
+    """快速检查输出文件是否完整：PDF 末尾有 %%EOF，ZIP 有中央目录"""
+    try:
+        match fmt:
+            case OutputFormat.PDF:
+                with path.open("rb") as f:
+                    f.seek(0, os.SEEK_END)
+                    f.seek(max(0, f.tell() - _PDF_TAIL_BYTES))
+                    return b"%%EOF" in f.read()
+            case OutputFormat.ZIP:
+                return zipfile.is_zipfile(path)
+    except OSError:
+        return False
+    return False
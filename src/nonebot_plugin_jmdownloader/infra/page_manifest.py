@@ -0,0 +1,103 @@
+"""章节图片断点记录
+
+每张图片写入完成后，在章节目录的清单文件中追加一行 `文件名<TAB>字节数`。
+重新下载（失败重试或重启后）前按清单校验目录：
+清单中记录且大小一致的图片视为已完成，其余图片（写入中断的残缺文件）删除后重新下载。
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from boltons.fileutils import atomic_save
+from jmcomic import JmModuleConfig, JmOptionPlugin
+
+from .packer import list_images
+
+# 章节目录下的清单文件名
+MANIFEST_NAME = ".pages"
+
+_lock = threading.Lock()
+
+
+@dataclass
+class ResumeStats:
+    """断点续传统计
+
+    Attributes:
+        pages: 可复用的已完成图片数量
+        bytes: 可复用的图片字节数
+        discarded: 删除的未完成图片数量
+    """
+
+    pages: int = 0
+    bytes: int = 0
+    discarded: int = 0
+
+
+def load_manifest(episode_dir: Path) -> dict[str, int]:
+    """读取清单，返回 文件名 -> 字节数，清单不存在时为空"""
+    try:
+        text = (episode_dir / MANIFEST_NAME).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return {}
+    pages: dict[str, int] = {}
+    for line in text.splitlines():
+        name, _, size = line.partition("\t")
+        if size.isdigit():
+            pages[name] = int(size)
+    return pages
+
+
+def record_page(path: Path) -> None:
+    """图片写入完成后追加到所在章节目录的清单"""
+    size = path.stat().st_size
+    with _lock, (path.parent / MANIFEST_NAME).open("a", encoding="utf-8") as f:
+        f.write(f"{path.name}\t{size}\n")
+
+
+def prepare_resume(episode_dir: Path) -> ResumeStats:
+    """按清单校验章节目录，删除未完成的图片并压缩清单
+
+    Returns:
+        可复用的图片统计
+    """
+    stats = ResumeStats()
+    if not episode_dir.is_dir():
+        return stats
+
+    recorded = load_manifest(episode_dir)
+    verified: dict[str, int] = {}
+    for path in list_images(episode_dir):
+        size = path.stat().st_size
+        if recorded.get(path.name) == size:
+            verified[path.name] = size
+            stats.pages += 1
+            stats.bytes += size
+        else:
+            path.unlink(missing_ok=True)
+            stats.discarded += 1
+
+    with (
+        _lock,
+        atomic_save(str(episode_dir / MANIFEST_NAME), text_mode=True) as f,
+    ):
+        f.writelines(f"{name}\t{size}\n" for name, size in verified.items())  # pyright: ignore[reportOptionalMemberAccess]
+    return stats
+
+
+class PageCheckpointPlugin(JmOptionPlugin):
+    """jmcomic 插件：每张图片下载完成后记录到清单（已存在而跳过的图片不重复记录）"""
+
+    plugin_key = "jmdownloader_page_checkpoint"
+
+    def invoke(self, image: Any = None, **_kwargs: Any) -> None:
+        if image is None or (image.exists and image.cache):
+            return
+        record_page(Path(image.save_path))
+
+
+JmModuleConfig.register_plugin(PageCheckpointPlugin)
@@ -1,82 +1,102 @@
 """PDF 处理工具"""
 
-import random
-import struct
+import contextlib
+import os
+import re
+import secrets
+import shutil
 
+# 读取文件末尾查找 startxref 的字节数
+_TAIL_BYTES = 1024
+_STARTXREF = re.compile(rb"startxref\s+(\d+)\s+%%EOF\s*$")
 
-def modify_pdf_md5(original_pdf_path: str, output_path: str) -> bool:
-    """修改 PDF 文件的 MD5 值，但保持文件内容可用
 
-    通过在文件末尾添加随机字节来改变 MD5。
+def _clone_file(src: str, dst: str) -> bool:
+    """复制文件，优先使用不经过用户态内存的方式
 
-    Args:
-        original_pdf_path: 原始 PDF 文件路径
-        output_path: 输出的 PDF 文件路径
+    依次尝试 reflink（写时复制，几乎零开销）、copy_file_range，
+    都不支持时由 shutil.copyfile 处理（Linux 下使用 sendfile，否则分块复制）。
 
     Returns:
-        是否成功修改
+        是否通过 reflink 共享了原文件的数据块（未实际写入数据）
     """
-    try:
-        # 读取原始 PDF
-        with open(original_pdf_path, "rb") as f:
-            content = f.read()
-
-        # 生成随机字节
-        random_bytes = struct.pack("d", random.random())
-
-        # 添加随机注释到 PDF 末尾
-        # PDF 规范允许在文件末尾添加注释，以 %%EOF 结尾
-        # 我们在 %%EOF 之前添加随机内容作为注释
-        if content.endswith(b"%%EOF"):
-            # 如果 PDF 以 %%EOF 结尾，在它前面添加注释
-            modified_content = (
-                content[:-5] + b"\n% Random: " + random_bytes + b"\n%%EOF"
-            )
-        else:
-            # 如果没有，直接在末尾添加注释和 EOF 标记
-            modified_content = content + b"\n% Random: " + random_bytes + b"\n%%EOF"
-
-        # 写入修改后的内容
-        with open(output_path, "wb") as f:
-            f.write(modified_content)
-
-        return True
-    except Exception:
-        return False
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            import fcntl
+
+            fcntl.ioctl(fdst.fileno(), 0x40049409, fsrc.fileno())  # FICLONE
+            return True
+        except (ImportError, OSError):
+            pass
+
+        if hasattr(os, "copy_file_range"):
+            remaining = os.fstat(fsrc.fileno()).st_size
+            try:
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                else:
+                    return False
+            except OSError:
+                pass
+
+    # 重新以写模式打开目标文件，会覆盖上面复制了一半的内容
+    shutil.copyfile(src, dst)
+    return False
+
+
+def _md5_trailer(pdf_path: str) -> bytes:
+    """生成追加到 PDF 末尾的随机尾部
+
+    原文件以 `startxref <偏移> %%EOF` 结尾时，按增量更新格式重复该引用，
+    阅读器仍按原交叉引用表解析；否则只追加注释和 EOF 标记。
+    """
+    size = os.path.getsize(pdf_path)
+    with open(pdf_path, "rb") as f:
+        f.seek(max(0, size - _TAIL_BYTES))
+        tail = f.read()
 
+    comment = b"\n% Random: " + secrets.token_hex(8).encode() + b"\n"
+    if match := _STARTXREF.search(tail):
+        return comment + b"startxref\n" + match.group(1) + b"\n%%EOF\n"
+    return comment + b"%%EOF\n"
 
-async def modify_pdf_md5_async(original_pdf_path: str, output_path: str) -> bool:
-    """异步版本的 modify_pdf_md5"""
-    import asyncio
 
-    return await asyncio.to_thread(modify_pdf_md5, original_pdf_path, output_path)
+def write_unique_pdf(original_pdf_path: str, output_path: str) -> int:
+    """复制 PDF 并追加随机尾部，使输出文件的 MD5 与原文件不同
 
+    内存占用与文件大小无关，失败时不留下输出文件。
 
-async def prepare_pdf_with_unique_md5(
-    src_path: str,
-    cache_dir: str,
-    photo_id: str,
-) -> str | None:
-    """复制 PDF 并修改 MD5，生成唯一文件名
+    Returns:
+        实际写入磁盘的字节数（reflink 复制时只有尾部）
+    """
+    try:
+        trailer = _md5_trailer(original_pdf_path)
+        shared = _clone_file(original_pdf_path, output_path)
+        with open(output_path, "ab") as f:
+            f.write(trailer)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(output_path)
+        raise
+    copied = 0 if shared else os.path.getsize(original_pdf_path)
+    return copied + len(trailer)
+
+
+def modify_pdf_md5(original_pdf_path: str, output_path: str) -> bool:
+    """修改 PDF 文件的 MD5 值，但保持文件内容可用
 
     Args:
-        src_path: 源 PDF 文件路径
-        cache_dir: 缓存目录
-        photo_id: 用于生成文件名的 ID
+        original_pdf_path: 原始 PDF 文件路径
+        output_path: 输出的 PDF 文件路径
 
     Returns:
-        新文件路径，失败返回 None
+        是否成功修改
     """
-    import hashlib
-    import random
-    import time
-    from pathlib import Path
-
-    random_suffix = hashlib.md5(
-        str(time.time() + random.random()).encode()
-    ).hexdigest()[:8]
-    dest_path = Path(cache_dir) / f"{photo_id}_{random_suffix}.pdf"
-
-    if await modify_pdf_md5_async(src_path, str(dest_path)):
-        return str(dest_path)
-    return None
+    try:
+        write_unique_pdf(original_pdf_path, output_path)
+    except Exception:
+        return False
+    return True
@@ -2,9 +2,37 @@
 
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
 from cachetools import TTLCache
 
-from ..core.search_session import SearchSession
+from ..core.search_session import SearchPreview, SearchSession
+
+
+@dataclass
+class _Prefetch:
+    """进行中（或已完成）的下一页预取
+
+    Attributes:
+        session: 发起预取的会话
+        display_idx: 预取的页面起始索引
+        task: 预取任务，结果为该页已准备好的数据
+        timer: 会话过期时取消预取的定时器
+    """
+
+    session: SearchSession
+    display_idx: int
+    task: asyncio.Task[Any]
+    timer: asyncio.TimerHandle | None = None
+
+
+def _consume_result(task: asyncio.Task[Any]) -> None:
+    """取走未被使用的预取结果中的异常，避免未处理异常告警"""
+    if not task.cancelled():
+        task.exception()
 
 
 class SessionCache:
@@ -12,32 +40,145 @@ class SessionCache:
 
     基于 TTLCache，预设 maxsize 无限制，默认 TTL 30 分钟。
     超过 TTL 后，条目会在下次访问时自动过期清理。
+
+    每个会话最多挂一个下一页预取任务，会话被移除、替换或过期时任务随之取消；
+    过期由定时器在 TTL 到期时触发，不依赖下一次访问。
     """
 
     def __init__(self, default_page_size: int = 20, ttl: float = 1800):
         self._cache: TTLCache[str, SearchSession] = TTLCache(
             maxsize=float("inf"), ttl=ttl
         )
+        self._prefetches: dict[str, _Prefetch] = {}
+        # 会话的过期时间（TTLCache 计时器的时间）
+        self._expires_at: dict[str, float] = {}
         self.default_page_size = default_page_size
 
     def create(
-        self, user_id: str | int, query: str, results: list[str]
+        self,
+        user_id: str | int,
+        query: str,
+        results: list[str],
+        previews: Iterable[SearchPreview] = (),
     ) -> SearchSession:
         """创建并保存新的搜索会话"""
         session = SearchSession(
             query=query, results=results, page_size=self.default_page_size
         )
+        session.add_previews(previews)
         self.set(user_id, session)
         return session
 
     def get(self, user_id: str | int) -> SearchSession | None:
         """获取用户的搜索会话"""
+        self.expire()
         return self._cache.get(str(user_id))
 
     def set(self, user_id: str | int, session: SearchSession) -> None:
         """保存用户的搜索会话"""
-        self._cache[str(user_id)] = session
+        key = str(user_id)
+        prefetch = self._prefetches.get(key)
+        if prefetch is not None and prefetch.session is not session:
+            self._cancel_prefetch(key)
+        self._cache[key] = session
+        self._expires_at[key] = self._cache.timer() + self._cache.ttl
+        if key in self._prefetches:
+            # 会话续期，预取的取消时间随之推迟
+            self._schedule_expiry(key)
+        self.expire()
 
     def remove(self, user_id: str | int) -> None:
         """移除用户的搜索会话"""
-        self._cache.pop(str(user_id), None)
+        key = str(user_id)
+        self._cache.pop(key, None)
+        self._expires_at.pop(key, None)
+        self._cancel_prefetch(key)
+
+    def expire(self) -> int:
+        """取消已过期会话的预取任务，返回取消数量"""
+        expired = [key for key in self._prefetches if key not in self._cache]
+        for key in expired:
+            self._cancel_prefetch(key)
+        for key in [key for key in self._expires_at if key not in self._cache]:
+            del self._expires_at[key]
+        return len(expired)
+
+    # region 预取
+
+    def start_prefetch(
+        self,
+        user_id: str | int,
+        session: SearchSession,
+        func: Callable[[], Awaitable[Any]],
+    ) -> None:
+        """在后台为会话的当前页（即用户下一次请求的页面）准备数据
+
+        同一用户已有的预取任务会被取消。
+        """
+        key = str(user_id)
+        self._cancel_prefetch(key)
+
+        async def run() -> Any:
+            return await func()
+
+        task = asyncio.create_task(run())
+        task.add_done_callback(_consume_result)
+        self._prefetches[key] = _Prefetch(session, session.display_idx, task)
+        self._schedule_expiry(key)
+
+    async def take_prefetched(
+        self, user_id: str | int, session: SearchSession
+    ) -> Any | None:
+        """取出会话当前页的预取结果
+
+        预取仍在进行时等待其完成；没有匹配的预取或预取失败时返回 None。
+        """
+        prefetch = self._prefetches.pop(str(user_id), None)
+        if prefetch is None:
+            return None
+        if prefetch.timer is not None:
+            prefetch.timer.cancel()
+        if prefetch.session is not session or prefetch.display_idx != (
+            session.display_idx
+        ):
+            prefetch.task.cancel()
+            return None
+        try:
+            return await prefetch.task
+        except asyncio.CancelledError:
+            if not prefetch.task.cancelled():
+                # 等待方自身被取消
+                prefetch.task.cancel()
+                raise
+            return None
+        except Exception:
+            return None
+
+    def _cancel_prefetch(self, key: str) -> None:
+        prefetch = self._prefetches.pop(key, None)
+        if prefetch is not None:
+            prefetch.task.cancel()
+            if prefetch.timer is not None:
+                prefetch.timer.cancel()
+
+    def _schedule_expiry(self, key: str) -> None:
+        """在会话过期时取消其预取任务"""
+        prefetch = self._prefetches[key]
+        if prefetch.timer is not None:
+            prefetch.timer.cancel()
+        delay = self._expires_at.get(key, 0) - self._cache.timer()
+        prefetch.timer = asyncio.get_running_loop().call_later(
+            max(0.0, delay), self._on_expiry, key
+        )
+
+    def _on_expiry(self, key: str) -> None:
+        if key not in self._prefetches:
+            return
+        if key in self._cache:
+            # 事件循环可能略早于 TTLCache 的计时触发，会话也可能已续期
+            self._schedule_expiry(key)
+        else:
+            self._cancel_prefetch(key)
+            self._expires_at.pop(key, None)
+
+    # endregion
@@ -0,0 +1,64 @@
+"""并发请求合并
+
+同一个 key 同时只执行一次任务，后到的调用方等待首个任务的结果。
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from functools import partial
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class SingleFlight(Generic[K, V]):
+    """按 key 合并进行中的异步任务
+
+    首个调用方启动任务，任务期间到达的相同 key 调用方直接等待同一结果。
+    任务以独立 Task 运行，发起者被取消不会影响其他等待者。
+
+    Attributes:
+        leaders: 实际启动任务的次数
+        joins: 加入已有任务的次数
+    """
+
+    def __init__(self):
+        self._inflight: dict[K, asyncio.Future[V]] = {}
+        self.leaders: int = 0
+        self.joins: int = 0
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: K, func: Callable[[], Awaitable[V]]) -> V:
+        """执行或加入 key 对应的任务，返回任务结果
+
+        任务抛出的异常会传递给所有等待者。
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.joins += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._forget, key))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: K, task: asyncio.Future[V]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict[str, int]:
+        """返回监控计数"""
+        return {
+            "leaders": self.leaders,
+            "joins": self.joins,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,55 @@
+"""图片处理子进程的任务函数
+
+子进程以 forkserver/spawn 方式创建，不继承父进程已加载的模块。
+本模块在子进程中作为顶层模块导入，不经过插件包的 __init__（其依赖已初始化的 NoneBot），
+因此只能依赖标准库和 Pillow，参数和返回值也只使用内置类型。
+"""
+
+from io import BytesIO
+
+from PIL import Image, ImageFilter, features
+
+
+def warmup() -> None:
+    """空任务，用于启动时提前拉起子进程"""
+
+
+def render_preview(
+    data: bytes, max_edge: int, blur_radius: float, quality: int, fmt: str
+) -> bytes:
+    """生成模糊预览图
+
+    先缩小再模糊：JPEG 使用 draft 模式直接按 1/2、1/4、1/8 解码，
+    再缩放到 max_edge，模糊半径按缩放比例换算，观感与原图模糊一致，
+    而解码、模糊和编码的像素量都大幅减少。
+
+    Args:
+        data: 原图字节
+        max_edge: 输出图片最长边像素，0 表示保持原尺寸
+        blur_radius: 相对原图尺寸的高斯模糊半径
+        quality: 编码质量（1-95）
+        fmt: 编码格式（jpeg / webp），WebP 不可用时回退为 JPEG
+
+    Returns:
+        模糊处理后的图片字节
+    """
+    image = Image.open(BytesIO(data))
+    original_edge = max(image.size)
+
+    if max_edge and original_edge > max_edge:
+        image.draft("RGB", (max_edge, max_edge))
+        image = image.convert("RGB")
+        image.thumbnail((max_edge, max_edge))
+    else:
+        image = image.convert("RGB")
+
+    scale = max(image.size) / original_edge
+    radius = max(blur_radius * scale, 1)
+    blurred_image = image.filter(ImageFilter.GaussianBlur(radius=radius))
+
+    if fmt == "webp" and not features.check("webp"):
+        fmt = "jpeg"
+
+    output = BytesIO()
+    blurred_image.save(output, format=fmt.upper(), quality=quality)
+    return output.getvalue()
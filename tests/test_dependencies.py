@@ -83,15 +83,18 @@ def test_get_jm_service_returns_shared_service_without_warmup(
 
 @pytest.mark.asyncio
 async def test_jm_service_uses_internal_option_for_download(
-    monkeypatch: pytest.MonkeyPatch,
+    tmp_path, monkeypatch: pytest.MonkeyPatch
 ):
     from nonebot_plugin_jmdownloader.infra import jm_service as jm_service_module
 
+    monkeypatch.chdir(tmp_path)
+
     option = DummyOption()
     logger = DummyLogger()
 
     class FakeDownloader:
         created_options: ClassVar[list[object]] = []
+        has_download_failures = False
 
         def __init__(self, received_option):
             self.option = received_option
@@ -117,6 +120,11 @@ async def test_jm_service_uses_internal_option_for_download(
     service = jm_service_module.JMService(config, logger=cast(Any, logger))
     photo = type("Photo", (), {"id": "123"})()
 
+    async def skip_pack(*_args, **_kwargs):
+        return None
+
+    monkeypatch.setattr(service, "pack_output", skip_pack)
+
     assert option.build_jm_client() is option.client
-    assert await service.download_photo(cast(Any, photo)) is None
+    assert await service.download_photo(cast(Any, photo)) is True
     assert FakeDownloader.created_options == [option]
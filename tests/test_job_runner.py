@@ -0,0 +1,258 @@
+import asyncio
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, cast
+
+import pytest
+
+
+class FakeBot:
+    """记录上传和消息发送。"""
+
+    def __init__(self, self_id: str = "1"):
+        self.self_id = self_id
+        self.calls: list[tuple[str, dict]] = []
+
+    async def call_api(self, api: str, **data):
+        self.calls.append((api, data))
+
+    def apis(self) -> list[str]:
+        return [api for api, _ in self.calls]
+
+
+class FakeService:
+    """模拟 JMService 的下载和文件固定。"""
+
+    def __init__(self, result: tuple[str, str] | None = ("/cache/1.pdf", ".pdf")):
+        self.result = result
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.downloads: list[dict] = []
+
+    async def get_photo(self, photo_id: str):
+        return SimpleNamespace(id=photo_id)
+
+    async def prepare_photo_file(self, photo, **kwargs):
+        self.downloads.append(kwargs)
+        await self.gate.wait()
+        return self.result
+
+    async def get_album(self, album_id: str):
+        return SimpleNamespace(id=album_id)
+
+    def get_album_output_name(self, album, episodes=None):
+        return f"{album.id}-{episodes}"
+
+    async def stream_album_files(self, album, episodes=None, **kwargs):
+        self.downloads.append(kwargs)
+        for index in episodes:
+            yield index, (None if index == 0 else self.result)
+
+    @contextmanager
+    def hold_file(self, file_path: str):
+        yield
+
+
+class FakeDataManager:
+    def __init__(self):
+        from nonebot_plugin_jmdownloader.core.data_models import UserData
+
+        self.users = UserData()
+        self.default_user_limit = 5
+        self.saves = 0
+
+    def save_users(self):
+        self.saves += 1
+
+    def get_group(self, group_id: int):
+        return SimpleNamespace(folder_id="folder")
+
+
+@pytest.fixture
+def runner_factory(tmp_path, monkeypatch):
+    from nonebot_plugin_jmdownloader.bot import job_runner
+    from nonebot_plugin_jmdownloader.bot.nonebot_utils import UploadLimiter
+    from nonebot_plugin_jmdownloader.infra.job_journal import JobJournal
+
+    bots: dict[str, FakeBot] = {}
+    monkeypatch.setattr(job_runner, "get_bots", lambda: bots)
+
+    def make(jm: FakeService, **kwargs):
+        runner = job_runner.JobRunner(
+            JobJournal(tmp_path / "jobs.db"),
+            cast(Any, jm),
+            cast(Any, FakeDataManager()),
+            UploadLimiter(),
+            **kwargs,
+        )
+        return runner, bots
+
+    return make
+
+
+def make_job(**kwargs):
+    from nonebot_plugin_jmdownloader.core.download_job import DownloadJob
+    from nonebot_plugin_jmdownloader.core.enums import JobKind
+
+    fields = {"kind": JobKind.PHOTO, "jm_id": "1", "bot_id": "1", "user_id": 10}
+    fields.update(kwargs)
+    return DownloadJob(**fields)
+
+
+async def drain(runner):
+    await asyncio.gather(*runner._tasks.values())
+
+
+@pytest.mark.asyncio
+async def test_job_uploads_notifies_and_charges_on_completion(runner_factory):
+    from nonebot_plugin_jmdownloader.core.enums import JobState
+
+    jm = FakeService()
+    jm.gate.clear()
+    runner, bots = runner_factory(jm)
+    bot = bots["1"] = FakeBot()
+
+    job = runner.submit(make_job(group_id=20))
+    await asyncio.sleep(0)
+
+    # 下载期间已计入预扣，尚未真正扣减
+    assert runner.pending_charges(10) == 1
+    assert runner.dm.users.get_limit(10, 5) == 5
+
+    jm.gate.set()
+    await drain(runner)
+
+    assert jm.downloads == [{"queue_key": "group_20", "priority": job.priority}]
+    assert bot.calls[0] == (
+        "upload_group_file",
+        {
+            "group_id": 20,
+            "file": "/cache/1.pdf",
+            "name": "1.pdf",
+            "folder_id": "folder",
+        },
+    )
+    assert bot.apis()[1:] == ["send_group_msg"]
+    assert runner.journal.get(job.id).state == JobState.DONE
+    assert runner.pending_charges(10) == 0
+    assert runner.dm.users.get_limit(10, 5) == 4
+    await runner.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_not_charged(runner_factory):
+    from nonebot_plugin_jmdownloader.core.enums import JobState
+
+    runner, bots = runner_factory(FakeService(result=None))
+    bot = bots["1"] = FakeBot()
+
+    job = runner.submit(make_job())
+    await drain(runner)
+
+    assert bot.calls == [
+        ("send_private_msg", {"user_id": 10, "message": "jm1 下载失败"})
+    ]
+    assert runner.journal.get(job.id).state == JobState.FAILED
+    assert runner.dm.users.get_limit(10, 5) == 5
+    await runner.aclose()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_job_resumes_after_bot_connects(runner_factory):
+    from nonebot_plugin_jmdownloader.core.enums import JobState
+
+    jm = FakeService()
+    jm.gate.clear()
+    runner, bots = runner_factory(jm)
+    bots["1"] = FakeBot()
+    job = runner.submit(make_job())
+    await asyncio.sleep(0)
+
+    # 关闭时任务保持运行中，视为被中断
+    await runner.aclose()
+    assert job.state == JobState.RUNNING
+
+    # 重启：Bot 尚未连接时任务等待
+    bots.clear()
+    jm.gate.set()
+    restarted, _ = runner_factory(jm)
+    assert restarted.resume() == 1
+    await asyncio.sleep(0)
+    assert len(jm.downloads) == 1
+
+    bot = bots["1"] = FakeBot()
+    restarted.bot_connected(cast(Any, bot))
+    await drain(restarted)
+
+    resumed = restarted.journal.get(job.id)
+    assert resumed.state == JobState.DONE
+    assert resumed.attempts == 2
+    assert bot.apis() == ["upload_private_file", "send_private_msg"]
+    await restarted.aclose()
+
+
+@pytest.mark.asyncio
+async def test_job_exceeding_attempts_is_dropped(runner_factory):
+    from nonebot_plugin_jmdownloader.core.enums import JobState
+
+    jm = FakeService()
+    runner, bots = runner_factory(jm)
+    bot = bots["1"] = FakeBot()
+    job = runner.journal.add(make_job())
+    for _ in range(runner.max_attempts):
+        runner.journal.start(job)
+
+    assert runner.resume() == 1
+    await drain(runner)
+
+    assert jm.downloads == []
+    assert runner.journal.get(job.id).state == JobState.FAILED
+    assert bot.apis() == ["send_private_msg"]
+    await runner.aclose()
+
+
+@pytest.mark.asyncio
+async def test_job_fails_when_bot_never_connects(runner_factory):
+    from nonebot_plugin_jmdownloader.core.enums import JobState
+
+    jm = FakeService()
+    runner, _ = runner_factory(jm, bot_timeout=0.01)
+
+    job = runner.submit(make_job())
+    await asyncio.sleep(0)
+    assert runner.pending_charges(10) == 1
+
+    await drain(runner)
+
+    assert jm.downloads == []
+    assert runner.journal.get(job.id).state == JobState.FAILED
+    assert runner.pending_charges(10) == 0
+    assert runner.dm.users.get_limit(10, 5) == 5
+    await runner.aclose()
+
+
+@pytest.mark.asyncio
+async def test_streamed_album_reports_failed_episodes(runner_factory):
+    from nonebot_plugin_jmdownloader.core.enums import JobKind, JobState
+
+    runner, bots = runner_factory(FakeService(), stream_album=True)
+    bot = bots["1"] = FakeBot()
+
+    job = runner.submit(make_job(kind=JobKind.ALBUM, group_id=20, episodes=[0, 1]))
+    await drain(runner)
+
+    api, data = bot.calls[0]
+    assert api == "send_group_msg"
+    assert str(data["message"]).endswith("第1话下载失败")
+    assert bot.calls[1] == (
+        "upload_group_file",
+        {
+            "group_id": 20,
+            "file": "/cache/1.pdf",
+            "name": "1-[1].pdf",
+            "folder_id": "folder",
+        },
+    )
+    assert str(bot.calls[2][1]["message"]).endswith("jm1 已发送")
+    assert runner.journal.get(job.id).state == JobState.DONE
+    await runner.aclose()
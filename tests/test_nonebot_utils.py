@@ -0,0 +1,173 @@
+import asyncio
+from typing import Any, cast
+
+import pytest
+from nonebot.adapters.onebot.v11 import Message, MessageSegment
+
+
+class FakeBot:
+    """记录每次发送的合并转发消息。"""
+
+    def __init__(self):
+        self.batches: list[list[MessageSegment]] = []
+
+    async def call_api(self, api: str, **data):
+        self.batches.append(data["messages"])
+
+
+def make_node(text: str, image: bytes | None = None) -> MessageSegment:
+    content = Message(text)
+    if image is not None:
+        content += MessageSegment.image(image)
+    return MessageSegment.node_custom(1, "jm搜索结果", content)
+
+
+@pytest.fixture
+def utils_module():
+    from nonebot_plugin_jmdownloader.bot import nonebot_utils
+
+    return nonebot_utils
+
+
+@pytest.mark.asyncio
+async def test_send_forward_batches_streams_in_order(utils_module):
+    bot = FakeBot()
+    event = cast(Any, type("Event", (), {"user_id": 1})())
+
+    async def nodes():
+        for i in range(5):
+            yield make_node(str(i))
+
+    sent = await utils_module.send_forward_batches(
+        cast(Any, bot), event, nodes(), batch_size=2
+    )
+
+    assert sent == 5
+    assert [[str(n.data["content"]) for n in batch] for batch in bot.batches] == [
+        ["0", "1"],
+        ["2", "3"],
+        ["4"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_forward_batches_respects_byte_budget(utils_module):
+    bot = FakeBot()
+    event = cast(Any, type("Event", (), {"user_id": 1})())
+    nodes = [make_node(str(i), b"x" * 300) for i in range(3)]
+    budget = utils_module.estimate_node_bytes(nodes[0]) * 2
+
+    await utils_module.send_forward_batches(
+        cast(Any, bot), event, nodes, max_bytes=budget
+    )
+
+    assert [len(batch) for batch in bot.batches] == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_send_forward_batches_defaults_to_single_message(utils_module):
+    bot = FakeBot()
+    event = cast(Any, type("Event", (), {"user_id": 1})())
+
+    await utils_module.send_forward_batches(
+        cast(Any, bot), event, [make_node(str(i)) for i in range(4)]
+    )
+
+    assert [len(batch) for batch in bot.batches] == [4]
+
+
+class UploadBot:
+    """记录上传调用，并可阻塞或失败。"""
+
+    def __init__(self, self_id: str = "1", fail: bool = False):
+        self.self_id = self_id
+        self.fail = fail
+        self.calls: list[tuple[str, dict]] = []
+        self.running = 0
+        self.peak = 0
+        self.gate = asyncio.Event()
+
+    async def call_api(self, api: str, **data):
+        from nonebot.adapters.onebot.v11 import ActionFailed
+
+        self.calls.append((api, data))
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await self.gate.wait()
+            if self.fail:
+                raise ActionFailed(retcode=100)
+        finally:
+            self.running -= 1
+
+
+def make_group_event(group_id: int = 10, user_id: int = 1):
+    from nonebot.adapters.onebot.v11 import GroupMessageEvent
+
+    return GroupMessageEvent.model_construct(group_id=group_id, user_id=user_id)
+
+
+def make_private_event(user_id: int = 1):
+    from nonebot.adapters.onebot.v11 import PrivateMessageEvent
+
+    return PrivateMessageEvent.model_construct(user_id=user_id)
+
+
+@pytest.mark.asyncio
+async def test_upload_limiter_selects_api_by_event(utils_module):
+    limiter = utils_module.UploadLimiter()
+    bot = UploadBot()
+    bot.gate.set()
+
+    await limiter.upload(cast(Any, bot), make_group_event(), "/a.pdf", "1.pdf", "f")
+    await limiter.upload(cast(Any, bot), make_private_event(2), "/a.pdf", "1.pdf", "f")
+
+    assert bot.calls == [
+        (
+            "upload_group_file",
+            {"group_id": 10, "file": "/a.pdf", "name": "1.pdf", "folder_id": "f"},
+        ),
+        ("upload_private_file", {"user_id": 2, "file": "/a.pdf", "name": "1.pdf"}),
+    ]
+    assert limiter.stats()["uploaded"] == 2
+
+
+@pytest.mark.asyncio
+async def test_upload_limiter_bounds_concurrency_per_bot(utils_module):
+    limiter = utils_module.UploadLimiter(limit=2)
+    bot_a, bot_b = UploadBot("a"), UploadBot("b")
+
+    tasks = [
+        asyncio.create_task(
+            limiter.upload(cast(Any, bot), make_group_event(i), "/a.pdf", "1.pdf")
+        )
+        for i in range(4)
+        for bot in (bot_a, bot_b)
+    ]
+    await asyncio.sleep(0.01)
+
+    # 每个 Bot 各自最多 2 个同时上传，其余排队
+    assert (bot_a.running, bot_b.running) == (2, 2)
+    assert limiter.stats()["waiting"] == 4
+
+    bot_a.gate.set()
+    bot_b.gate.set()
+    await asyncio.gather(*tasks)
+
+    assert (bot_a.peak, bot_b.peak) == (2, 2)
+    assert limiter.stats() == {"active": 0, "waiting": 0, "uploaded": 8, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_upload_limiter_failure_releases_slot(utils_module):
+    from nonebot.adapters.onebot.v11 import ActionFailed
+
+    limiter = utils_module.UploadLimiter(limit=1)
+    bot = UploadBot(fail=True)
+    bot.gate.set()
+
+    for _ in range(2):
+        with pytest.raises(ActionFailed):
+            await limiter.upload(cast(Any, bot), make_private_event(), "/a", "a")
+
+    assert limiter.stats() == {"active": 0, "waiting": 0, "uploaded": 0, "failed": 2}
@@ -40,6 +40,9 @@ import_module_directly("nonebot_plugin_jmdownloader.core.enums", "core/enums.py"
 import_module_directly(
     "nonebot_plugin_jmdownloader.core.data_models", "core/data_models.py"
 )
+import_module_directly(
+    "nonebot_plugin_jmdownloader.core.download_job", "core/download_job.py"
+)
 # infra 模块依赖 core 模块，所以需要在 core 之后导入
 import_module_directly(
     "nonebot_plugin_jmdownloader.infra.pdf_utils", "infra/pdf_utils.py"
@@ -47,6 +50,35 @@ import_module_directly(
 import_module_directly(
     "nonebot_plugin_jmdownloader.infra.search_session", "infra/search_session.py"
 )
+import_module_directly(
+    "nonebot_plugin_jmdownloader.infra.job_journal", "infra/job_journal.py"
+)
+import_module_directly(
+    "nonebot_plugin_jmdownloader.infra.singleflight", "infra/singleflight.py"
+)
+import_module_directly(
+    "nonebot_plugin_jmdownloader.infra.file_lock", "infra/file_lock.py"
+)
+import_module_directly(
+    "nonebot_plugin_jmdownloader.infra.artifact_cache", "infra/artifact_cache.py"
+)
+import_module_directly(
+    "nonebot_plugin_jmdownloader.infra.cover_cache", "infra/cover_cache.py"
+)
+import_module_directly(
+    "nonebot_plugin_jmdownloader.infra.cover_fetcher", "infra/cover_fetcher.py"
+)
+import_module_directly(
+    "nonebot_plugin_jmdownloader.infra.image_utils", "infra/image_utils.py"
+)
+import_module_directly(
+    "nonebot_plugin_jmdownloader.infra.download_scheduler",
+    "infra/download_scheduler.py",
+)
+import_module_directly("nonebot_plugin_jmdownloader.infra.packer", "infra/packer.py")
+import_module_directly(
+    "nonebot_plugin_jmdownloader.infra.page_manifest", "infra/page_manifest.py"
+)
 import_module_directly(
     "nonebot_plugin_jmdownloader.infra.jm_service", "infra/jm_service.py"
 )
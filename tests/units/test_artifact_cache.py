@@ -0,0 +1,287 @@
+"""
+ArtifactCache 单元测试
+
+测试缓存索引、命中记录、固定和淘汰策略。
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from nonebot_plugin_jmdownloader.infra.artifact_cache import ArtifactCache
+from nonebot_plugin_jmdownloader.infra.file_lock import FileLock
+
+
+def _pin_in_child(root: Path, pin_dir: Path, ready, done) -> None:
+    cache = ArtifactCache(root, pin_dir=pin_dir)
+    with cache.pin("1.pdf"):
+        ready.set()
+        done.wait(5)
+
+
+def _write(path: Path, size: int, age: float = 0) -> None:
+    path.write_bytes(b"x" * size)
+    if age:
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+
+
+class TestArtifactCacheIndex:
+    """索引与访问记录测试"""
+
+    def test_scan_picks_up_files_and_dirs(self, tmp_path: Path):
+        """测试扫描收录顶层文件和文件夹，忽略隐藏文件"""
+        _write(tmp_path / "1.pdf", 10)
+        (tmp_path / "1").mkdir()
+        _write(tmp_path / "1" / "00001.jpg", 5)
+        _write(tmp_path / ".hidden", 100)
+
+        cache = ArtifactCache(tmp_path)
+        cache.scan()
+
+        assert cache.stats()["entries"] == 2
+        assert cache.total_bytes == 15
+
+    def test_scan_skips_unchanged_entries(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试重复扫描只重新统计修改过的条目"""
+        import sys
+
+        module = sys.modules[ArtifactCache.__module__]
+        measured: list[str] = []
+        disk_usage = module._disk_usage
+
+        def counting_disk_usage(path: Path) -> int:
+            measured.append(path.name)
+            return disk_usage(path)
+
+        monkeypatch.setattr(module, "_disk_usage", counting_disk_usage)
+        _write(tmp_path / "1.pdf", 10, age=100)
+        _write(tmp_path / "2.pdf", 10, age=100)
+        cache = ArtifactCache(tmp_path)
+        cache.scan()
+        measured.clear()
+
+        cache.scan()
+        assert measured == []
+
+        _write(tmp_path / "2.pdf", 20)
+        cache.scan()
+        assert measured == ["2.pdf"]
+        assert cache.total_bytes == 30
+
+    def test_touch_counts_hits(self, tmp_path: Path):
+        """测试命中计数"""
+        _write(tmp_path / "1.pdf", 10)
+        cache = ArtifactCache(tmp_path)
+
+        cache.touch("1.pdf")
+        cache.touch("1.pdf")
+
+        assert cache.stats()["hits"] == 2
+
+    def test_index_persists(self, tmp_path: Path):
+        """测试索引保存后重新加载"""
+        _write(tmp_path / "1.pdf", 10)
+        cache = ArtifactCache(tmp_path)
+        cache.touch("1.pdf")
+        cache.save()
+
+        reloaded = ArtifactCache(tmp_path)
+        assert reloaded.stats()["hits"] == 1
+
+
+class TestArtifactCacheEvict:
+    """淘汰策略测试"""
+
+    def test_evicts_expired_entries(self, tmp_path: Path):
+        """测试超过存活时间的条目被淘汰"""
+        _write(tmp_path / "old.pdf", 10, age=7200)
+        _write(tmp_path / "new.pdf", 10)
+        cache = ArtifactCache(tmp_path, max_age=3600)
+
+        assert cache.evict() == ["old.pdf"]
+        assert not (tmp_path / "old.pdf").exists()
+        assert (tmp_path / "new.pdf").exists()
+
+    def test_evicts_least_recently_used_over_budget(self, tmp_path: Path):
+        """测试超出容量时按最近访问时间淘汰，最近命中的条目保留"""
+        _write(tmp_path / "a.pdf", 10, age=300)
+        _write(tmp_path / "b.pdf", 10, age=200)
+        _write(tmp_path / "c.pdf", 10, age=100)
+        cache = ArtifactCache(tmp_path, max_bytes=20)
+        cache.scan()
+        cache.touch("a.pdf")
+
+        assert cache.evict() == ["b.pdf"]
+        assert cache.total_bytes == 20
+
+    def test_pinned_entries_survive(self, tmp_path: Path):
+        """测试固定的条目不会被淘汰"""
+        (tmp_path / "1").mkdir()
+        _write(tmp_path / "1" / "00001.jpg", 10, age=7200)
+        os.utime(tmp_path / "1", (time.time() - 7200, time.time() - 7200))
+        cache = ArtifactCache(tmp_path, max_age=3600)
+
+        with cache.pin("1"):
+            assert cache.evict() == []
+            assert cache.is_pinned("1")
+
+        assert not cache.is_pinned("1")
+        assert cache.evict() == ["1"]
+        assert not (tmp_path / "1").exists()
+
+    def test_no_budget_keeps_everything(self, tmp_path: Path):
+        """测试未设置预算时不淘汰"""
+        _write(tmp_path / "1.pdf", 10, age=10**6)
+        cache = ArtifactCache(tmp_path)
+
+        assert cache.evict() == []
+
+
+class TestArtifactCacheSharedPins:
+    """跨进程固定测试"""
+
+    def test_own_pin_files_are_removed(self, tmp_path: Path):
+        """测试固定期间存在锁文件，结束后删除"""
+        pin_dir = tmp_path / ".locks"
+        cache = ArtifactCache(tmp_path, pin_dir=pin_dir)
+
+        with cache.pin("1.pdf", "1.pdf"):
+            (pin_file,) = pin_dir.iterdir()
+            assert pin_file.name.startswith("1.pdf.")
+            assert pin_file.name != f"1.pdf.{os.getpid()}.lock"
+
+        assert list(pin_dir.iterdir()) == []
+
+    def test_instances_in_same_process_see_each_other(self, tmp_path: Path):
+        """测试锁文件按实例区分，进程号相同（如容器中的 PID 1）时仍互相可见"""
+        pin_dir = tmp_path / ".locks"
+        _write(tmp_path / "1.pdf", 10, age=7200)
+        cache = ArtifactCache(tmp_path, max_age=3600, pin_dir=pin_dir)
+        other = ArtifactCache(tmp_path, pin_dir=pin_dir)
+
+        with other.pin("1.pdf"):
+            assert cache.is_pinned("1.pdf")
+            assert cache.evict() == []
+
+        assert cache.evict() == ["1.pdf"]
+
+    @pytest.mark.skipif(
+        "fork" not in multiprocessing.get_all_start_methods(),
+        reason="需要 fork 启动方式",
+    )
+    def test_entries_pinned_by_other_process_survive(self, tmp_path: Path):
+        """测试其他进程固定的条目不会被淘汰，该进程退出后可正常淘汰"""
+        pin_dir = tmp_path / ".locks"
+        _write(tmp_path / "1.pdf", 10, age=7200)
+        cache = ArtifactCache(tmp_path, max_age=3600, pin_dir=pin_dir)
+        ctx = multiprocessing.get_context("fork")
+        ready, done = ctx.Event(), ctx.Event()
+        child = ctx.Process(target=_pin_in_child, args=(tmp_path, pin_dir, ready, done))
+        child.start()
+        try:
+            assert ready.wait(5)
+            assert cache.is_pinned("1.pdf")
+            assert cache.evict() == []
+        finally:
+            done.set()
+            child.join(5)
+
+        assert not cache.is_pinned("1.pdf")
+        assert cache.evict() == ["1.pdf"]
+
+    def test_stale_pin_file_is_ignored(self, tmp_path: Path):
+        """测试已退出进程遗留的锁文件不影响淘汰"""
+        pin_dir = tmp_path / ".locks"
+        pin_dir.mkdir()
+        (pin_dir / "1.pdf.99999.lock").touch()
+        _write(tmp_path / "1.pdf", 10, age=7200)
+        cache = ArtifactCache(tmp_path, max_age=3600, pin_dir=pin_dir)
+
+        assert cache.evict() == ["1.pdf"]
+
+
+class TestArtifactCacheSharedIndex:
+    """多进程共享索引测试"""
+
+    def test_save_merges_other_instances_records(self, tmp_path: Path):
+        """测试各实例保存索引时合并彼此的访问记录，而不是互相覆盖"""
+        pin_dir = tmp_path / ".locks"
+        _write(tmp_path / "a.pdf", 10)
+        _write(tmp_path / "b.pdf", 10)
+        first = ArtifactCache(tmp_path, pin_dir=pin_dir)
+        second = ArtifactCache(tmp_path, pin_dir=pin_dir)
+
+        first.touch("a.pdf")
+        second.touch("a.pdf")
+        second.touch("b.pdf")
+        first.save()
+        second.save()
+
+        reloaded = ArtifactCache(tmp_path)
+        assert reloaded.stats()["hits"] == 3
+
+    def test_evict_respects_other_instances_hits(self, tmp_path: Path):
+        """测试淘汰时使用其他实例最近的访问记录，不删除对方的热点条目"""
+        pin_dir = tmp_path / ".locks"
+        _write(tmp_path / "hot.pdf", 10, age=300)
+        _write(tmp_path / "cold.pdf", 10, age=200)
+        evictor = ArtifactCache(tmp_path, max_bytes=10, pin_dir=pin_dir)
+        evictor.scan()
+        other = ArtifactCache(tmp_path, pin_dir=pin_dir)
+        other.FLUSH_DELAY = 0.01
+        other.touch("hot.pdf")
+        time.sleep(0.2)
+
+        assert evictor.evict() == ["cold.pdf"]
+        assert (tmp_path / "hot.pdf").exists()
+        assert [p.name for p in tmp_path.glob(".*.evicted")] == []
+
+    def test_touch_does_not_write_index_immediately(self, tmp_path: Path):
+        """测试访问记录延迟批量写回，而不是每次访问都重写索引"""
+        _write(tmp_path / "a.pdf", 10)
+        cache = ArtifactCache(tmp_path, pin_dir=tmp_path / ".locks")
+        cache.scan()
+
+        cache.touch("a.pdf")
+        cache.touch("a.pdf")
+
+        assert not (tmp_path / ArtifactCache.INDEX_NAME).exists()
+        cache.save()
+        assert ArtifactCache(tmp_path).stats()["hits"] == 2
+
+    def test_acquire_does_not_wait_for_index_lock(self, tmp_path: Path):
+        """测试固定条目不等待其他进程持有的索引锁"""
+        cache = ArtifactCache(tmp_path, pin_dir=tmp_path / ".locks")
+        holder = FileLock(tmp_path / ArtifactCache.INDEX_LOCK_NAME)
+        assert holder.try_acquire()
+        try:
+            worker = threading.Thread(target=cache.acquire, args=("1.pdf",))
+            worker.start()
+            worker.join(1)
+            assert not worker.is_alive()
+        finally:
+            holder.release()
+        cache.release("1.pdf")
+
+    def test_evict_restores_entries_pinned_during_eviction(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试改名期间被其他进程固定的条目放回原处，不被删除"""
+        _write(tmp_path / "1.pdf", 10, age=100)
+        cache = ArtifactCache(tmp_path, max_bytes=5, pin_dir=tmp_path / ".locks")
+        scans = iter([set(), {"1.pdf"}])
+        monkeypatch.setattr(cache, "_foreign_pins", lambda name=None: next(scans))
+
+        assert cache.evict() == []
+        assert (tmp_path / "1.pdf").read_bytes() == b"x" * 10
+        assert cache.total_bytes == 10
+        assert [p.name for p in tmp_path.glob(".*.evicted")] == []
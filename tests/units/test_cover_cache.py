@@ -0,0 +1,56 @@
+"""
+CoverCache 单元测试
+
+测试内存层、磁盘层、TTL 过期和命中统计。
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+from nonebot_plugin_jmdownloader.infra.cover_cache import CoverCache
+
+
+class TestCoverCache:
+    """CoverCache 两级缓存测试"""
+
+    async def test_memory_hit(self, tmp_path: Path):
+        """测试写入后命中内存层"""
+        cache = CoverCache(tmp_path, memory_bytes=1024, ttl=60)
+        await cache.put("1", b"cover")
+
+        assert await cache.get("1") == b"cover"
+        assert cache.stats()["memory_hits"] == 1
+
+    async def test_disk_hit_after_restart(self, tmp_path: Path):
+        """测试内存层丢失后从磁盘层读取并回填内存"""
+        await CoverCache(tmp_path, memory_bytes=1024, ttl=60).put(1, b"cover")
+        cache = CoverCache(tmp_path, memory_bytes=1024, ttl=60)
+
+        assert await cache.get(1) == b"cover"
+        assert await cache.get(1) == b"cover"
+        assert cache.disk_hits == 1
+        assert cache.memory_hits == 1
+
+    async def test_expired_disk_entry_misses(self, tmp_path: Path):
+        """测试磁盘层过期后未命中并可被清理"""
+        await CoverCache(tmp_path, memory_bytes=0, ttl=60).put("1", b"cover")
+        old = time.time() - 120
+        os.utime(tmp_path / "1.img", (old, old))
+        cache = CoverCache(tmp_path, memory_bytes=0, ttl=60)
+
+        assert await cache.get("1") is None
+        assert cache.stats()["hit_ratio"] == 0.0
+        assert cache.evict_expired() == 1
+
+    async def test_memory_budget_evicts_lru(self, tmp_path: Path):
+        """测试内存层按字节预算淘汰"""
+        cache = CoverCache(tmp_path, memory_bytes=10, ttl=0)
+        await cache.put("1", b"x" * 6)
+        await cache.put("2", b"y" * 6)
+
+        assert await cache.get("1") is None
+        assert await cache.get("2") == b"y" * 6
+        assert cache.stats()["memory_bytes"] == 6
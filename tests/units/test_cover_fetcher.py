@@ -0,0 +1,112 @@
+"""
+CoverFetcher 单元测试
+
+测试域名健康度排序、失败切换和对冲请求。
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, cast
+
+import httpx
+
+from nonebot_plugin_jmdownloader.infra.cover_fetcher import CoverFetcher, DomainHealth
+
+COVER = b"x" * 2048
+
+
+class DummyLogger:
+    def debug(self, message: str):
+        pass
+
+
+def _fetcher(handler, domains: list[str], **kwargs) -> CoverFetcher:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return CoverFetcher(
+        lambda: domains, cast(Any, DummyLogger()), client=client, **kwargs
+    )
+
+
+class TestDomainHealth:
+    """DomainHealth 评分测试"""
+
+    def test_failures_lower_priority(self):
+        """测试失败会提高评分（降低优先级）"""
+        healthy, flaky = DomainHealth(), DomainHealth()
+        healthy.record_success(0.5)
+        flaky.record_success(0.5)
+        flaky.record_failure()
+
+        assert flaky.score(1.0) > healthy.score(1.0)
+
+    def test_timeout_lowers_priority(self):
+        """测试超时按等待时间计入延迟并降低成功率"""
+        health = DomainHealth()
+        health.record_success(0.1)
+        health.record_timeout(1.5)
+
+        assert health.latency == 1.5
+        assert health.success_rate < 1
+
+    def test_unknown_latency_uses_default(self):
+        """测试无数据时使用默认延迟"""
+        assert DomainHealth().score(2.0) == 2.0
+
+
+class TestCoverFetcher:
+    """CoverFetcher 下载测试"""
+
+    async def test_falls_back_to_next_domain(self):
+        """测试失败域名被跳过，并在之后排到末尾"""
+        requested: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requested.append(request.url.host)
+            if request.url.host == "dead":
+                return httpx.Response(502)
+            return httpx.Response(200, content=COVER)
+
+        fetcher = _fetcher(handler, ["dead", "alive"])
+
+        assert await fetcher.fetch(1) == COVER
+        assert requested == ["dead", "alive"]
+        assert fetcher.ranked_domains() == ["alive", "dead"]
+
+    async def test_small_content_counts_as_failure(self):
+        """测试过小的内容视为失败"""
+        fetcher = _fetcher(lambda _: httpx.Response(200, content=b"tiny"), ["a"])
+
+        assert await fetcher.fetch(1) is None
+        assert fetcher.health("a").success_rate < 1
+
+    async def test_hedges_slow_domain(self):
+        """测试慢域名超过阈值后对冲到下一个域名"""
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host == "slow":
+                await asyncio.sleep(5)
+            return httpx.Response(200, content=request.url.host.encode() * 1024)
+
+        fetcher = _fetcher(handler, ["slow", "fast"], hedge_delay=0.01)
+
+        content = await asyncio.wait_for(fetcher.fetch(1), timeout=1)
+
+        assert content is not None
+        assert content.startswith(b"fast")
+
+    async def test_hanging_domain_loses_rank(self):
+        """测试对冲后被取消的挂起域名降分，下次不再排在最前"""
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host == "hang":
+                await asyncio.sleep(5)
+            return httpx.Response(200, content=COVER)
+
+        fetcher = _fetcher(handler, ["hang", "ok"], hedge_delay=0.01)
+
+        assert await asyncio.wait_for(fetcher.fetch(1), timeout=1) == COVER
+        await asyncio.sleep(0)
+
+        assert fetcher.health("hang").success_rate < 1
+        assert fetcher.ranked_domains() == ["ok", "hang"]
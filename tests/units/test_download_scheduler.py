@@ -0,0 +1,129 @@
+"""
+DownloadScheduler 单元测试
+
+测试并发上限、优先级通道、群组轮询和排队状态。
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from nonebot_plugin_jmdownloader.core.enums import DownloadPriority
+from nonebot_plugin_jmdownloader.infra.download_scheduler import DownloadScheduler
+
+
+async def _hold(scheduler: DownloadScheduler, release: asyncio.Event) -> None:
+    async with scheduler.slot("holder"):
+        await release.wait()
+
+
+async def _record(
+    scheduler: DownloadScheduler,
+    order: list[str],
+    name: str,
+    group: str,
+    priority: DownloadPriority = DownloadPriority.NORMAL,
+) -> None:
+    async with scheduler.slot(group, priority):
+        order.append(name)
+
+
+class TestDownloadScheduler:
+    """DownloadScheduler 调度测试"""
+
+    async def test_limits_concurrency(self):
+        """测试同时执行的任务数不超过上限"""
+        scheduler = DownloadScheduler(max_concurrent=2)
+        active = peak = 0
+
+        async def job():
+            nonlocal active, peak
+            async with scheduler.slot("g"):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(job() for _ in range(5)))
+
+        assert peak == 2
+        assert scheduler.running == 0
+        assert scheduler.waiting() == 0
+
+    async def test_high_priority_runs_first(self):
+        """测试高优先级通道先于普通通道"""
+        scheduler = DownloadScheduler(max_concurrent=1)
+        release = asyncio.Event()
+        order: list[str] = []
+
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(_record(scheduler, order, "normal", "g1")),
+            asyncio.create_task(
+                _record(scheduler, order, "high", "g2", DownloadPriority.HIGH)
+            ),
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *tasks)
+
+        assert order == ["high", "normal"]
+
+    async def test_round_robin_between_groups(self):
+        """测试同一通道内按群组轮询"""
+        scheduler = DownloadScheduler(max_concurrent=1)
+        release = asyncio.Event()
+        order: list[str] = []
+
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(_record(scheduler, order, name, group))
+            for name, group in [("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b")]
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *tasks)
+
+        assert order == ["a1", "b1", "a2", "a3"]
+
+    async def test_cancelled_waiter_is_skipped(self):
+        """测试排队中被取消的任务不会占用名额"""
+        scheduler = DownloadScheduler(max_concurrent=1)
+        release = asyncio.Event()
+        order: list[str] = []
+
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(_record(scheduler, order, "x", "g"))
+        waiting = asyncio.create_task(_record(scheduler, order, "y", "g"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        await asyncio.gather(holder, waiting)
+
+        assert order == ["y"]
+        assert scheduler.running == 0
+
+    async def test_snapshot_reports_queue(self):
+        """测试排队快照"""
+        scheduler = DownloadScheduler(max_concurrent=1)
+        assert scheduler.snapshot().estimated_wait == 0
+
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(_record(scheduler, [], "w", "g"))
+        await asyncio.sleep(0)
+
+        snapshot = scheduler.snapshot()
+        assert snapshot.running == 1
+        assert snapshot.waiting == 1
+        # 尚无历史耗时，无法估计
+        assert snapshot.estimated_wait is None
+        assert scheduler.snapshot(DownloadPriority.HIGH).waiting == 0
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert scheduler.stats()["avg_duration"] is not None
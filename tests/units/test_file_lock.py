@@ -0,0 +1,117 @@
+"""
+FileLock 单元测试
+
+测试锁文件的互斥、超时和异步等待。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+
+import pytest
+
+from nonebot_plugin_jmdownloader.infra.file_lock import FileLock, remove_unused_locks
+
+
+def _try_lock_in_child(path, result) -> None:
+    result.put(FileLock(path).try_acquire())
+
+
+class TestFileLock:
+    """文件锁测试"""
+
+    def test_instances_exclude_each_other(self, tmp_path):
+        """测试同一锁文件的不同实例互斥，释放后可再次获取"""
+        path = tmp_path / ".locks" / "1.pdf.lock"
+        first, second = FileLock(path), FileLock(path)
+
+        assert first.try_acquire()
+        assert not second.try_acquire()
+        first.release()
+        assert second.try_acquire()
+        assert second.locked
+        second.release()
+        assert not second.locked
+
+    @pytest.mark.skipif(
+        "fork" not in multiprocessing.get_all_start_methods(),
+        reason="需要 fork 启动方式",
+    )
+    def test_excludes_other_processes(self, tmp_path):
+        """测试其他进程无法获取已被持有的锁"""
+        path = tmp_path / "1.pdf.lock"
+        ctx = multiprocessing.get_context("fork")
+        result = ctx.Queue()
+
+        with FileLock(path).hold():
+            child = ctx.Process(target=_try_lock_in_child, args=(path, result))
+            child.start()
+            child.join(5)
+        assert result.get(timeout=5) is False
+
+    def test_hold_timeout(self, tmp_path):
+        """测试等待超时抛出 TimeoutError"""
+        path = tmp_path / "1.pdf.lock"
+        holder = FileLock(path)
+        assert holder.try_acquire()
+
+        with (
+            pytest.raises(TimeoutError),
+            FileLock(path, poll_interval=0.01).hold(timeout=0.05),
+        ):
+            pass
+        holder.release()
+
+    async def test_hold_async_waits_for_release(self, tmp_path):
+        """测试异步等待在锁释放后获得锁"""
+        path = tmp_path / "1.pdf.lock"
+        holder = FileLock(path)
+        assert holder.try_acquire()
+        acquired = asyncio.Event()
+
+        async def waiter() -> None:
+            async with FileLock(path, poll_interval=0.01).hold_async():
+                acquired.set()
+
+        task = asyncio.create_task(waiter())
+        await asyncio.sleep(0.05)
+        assert not acquired.is_set()
+        holder.release()
+        await asyncio.wait_for(task, 1)
+        assert acquired.is_set()
+
+    def test_remove_unused_locks_keeps_held(self, tmp_path):
+        """测试只删除无人持有的锁文件"""
+        held, unused = tmp_path / "a.lock", tmp_path / "sub" / "b.lock"
+        unused.parent.mkdir()
+        unused.touch()
+
+        with FileLock(held).hold():
+            assert remove_unused_locks(tmp_path) == [unused]
+        assert held.exists()
+
+    def test_reacquires_after_lock_file_removed(self, tmp_path, monkeypatch):
+        """测试打开后、加锁前锁文件被清理删除时，锁落在重新创建的文件上"""
+        import sys
+
+        module = sys.modules[FileLock.__module__]
+        path = tmp_path / "1.pdf.lock"
+        try_lock = module._try_lock
+        removals = []
+
+        def racing_try_lock(fd):
+            if not removals:
+                removals.append(fd)
+                path.unlink()
+            return try_lock(fd)
+
+        monkeypatch.setattr(module, "_try_lock", racing_try_lock)
+        first = FileLock(path)
+        assert first.try_acquire()
+        monkeypatch.setattr(module, "_try_lock", try_lock)
+
+        assert removals
+        assert path.exists()
+        assert not FileLock(path).try_acquire()
+        first.release()
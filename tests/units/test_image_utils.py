@@ -0,0 +1,137 @@
+"""
+image_utils 单元测试
+
+测试模糊预览图的缩放、编码格式、小图处理和图片处理进程池。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import types
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from nonebot_plugin_jmdownloader.core.enums import CoverFormat
+from nonebot_plugin_jmdownloader.infra.image_utils import (
+    PreviewOptions,
+    blur_image_async,
+    render_preview_async,
+    run_image_job,
+    shutdown_image_workers,
+    start_image_workers,
+)
+
+image_utils = sys.modules["nonebot_plugin_jmdownloader.infra.image_utils"]
+
+
+def _jpeg(width: int, height: int) -> BytesIO:
+    output = BytesIO()
+    Image.new("RGB", (width, height), "blue").save(output, format="JPEG")
+    output.seek(0)
+    return output
+
+
+class TestRenderPreview:
+    """预览图渲染测试"""
+
+    async def test_downscales_to_max_edge(self):
+        """测试大图按最长边缩小"""
+        result = await blur_image_async(_jpeg(1600, 800), PreviewOptions(max_edge=400))
+
+        image = Image.open(result)
+        assert image.format == "JPEG"
+        assert max(image.size) == 400
+        assert image.size[0] / image.size[1] == 2
+
+    async def test_small_image_keeps_size(self):
+        """测试小图保持原尺寸"""
+        result = await blur_image_async(_jpeg(200, 100), PreviewOptions(max_edge=400))
+
+        assert Image.open(result).size == (200, 100)
+
+    async def test_webp_output(self):
+        """测试 WebP 编码"""
+        result = await blur_image_async(
+            _jpeg(800, 800), PreviewOptions(format=CoverFormat.WEBP)
+        )
+
+        assert Image.open(result).format == "WEBP"
+
+    async def test_preview_is_smaller_than_full_size_render(self):
+        """测试预览图体积小于原尺寸渲染"""
+        full = await blur_image_async(_jpeg(1600, 1600), PreviewOptions(max_edge=0))
+        preview = await blur_image_async(_jpeg(1600, 1600), PreviewOptions())
+
+        assert len(preview.getvalue()) < len(full.getvalue())
+
+
+class TestImageWorkers:
+    """图片处理进程池测试"""
+
+    @pytest.fixture(autouse=True)
+    def _cleanup(self):
+        yield
+        shutdown_image_workers()
+
+    async def test_render_in_process_pool(self):
+        """测试进程池中生成的预览图与线程池一致"""
+        data = _jpeg(800, 400).getvalue()
+        by_thread = await render_preview_async(data, PreviewOptions(max_edge=200))
+
+        assert start_image_workers(1)
+        by_process = await render_preview_async(data, PreviewOptions(max_edge=200))
+
+        assert by_process == by_thread
+
+    async def test_job_runs_in_worker_process(self):
+        """测试任务在子进程中执行"""
+        assert start_image_workers(1)
+
+        assert await run_image_job(os.getpid) != os.getpid()
+
+    async def test_workers_are_not_forked(self):
+        """测试子进程不以 fork 方式创建"""
+        assert start_image_workers(1)
+
+        assert image_utils._process_pool._mp_context.get_start_method() != "fork"
+
+    async def test_workers_do_not_run_main_module(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试子进程不重新执行主模块（bot.py 顶层会初始化 NoneBot 并加载插件），也不导入插件包"""
+        marker = tmp_path / "imported"
+        script = tmp_path / "bot.py"
+        script.write_text(f"open({str(marker)!r}, 'w').close()\n")
+        main = types.ModuleType("__main__")
+        main.__file__ = str(script)
+        main.__spec__ = None
+        monkeypatch.setitem(sys.modules, "__main__", main)
+
+        assert start_image_workers(1)
+        assert await run_image_job(os.getpid) != os.getpid()
+
+        assert not marker.exists()
+        # 子进程也不导入插件包
+        check = "import sys; assert 'nonebot_plugin_jmdownloader' not in sys.modules"
+        await run_image_job(exec, check)
+
+    async def test_zero_workers_uses_threads(self):
+        """测试进程数为 0 时使用线程池"""
+        assert not start_image_workers(0)
+
+        assert await run_image_job(os.getpid) == os.getpid()
+
+    async def test_broken_pool_falls_back_to_threads(self):
+        """测试进程池崩溃后回退到线程池"""
+        assert start_image_workers(1)
+        pool = image_utils._process_pool
+        with pytest.raises(BrokenProcessPool):
+            await asyncio.wrap_future(pool.submit(os._exit, 1))
+
+        assert await run_image_job(os.getpid) == os.getpid()
+        assert image_utils._process_pool is None
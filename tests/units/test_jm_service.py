@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+import os
 import sys
+import traceback
 from typing import Any, cast
 
 import pytest
@@ -17,10 +19,16 @@ JMService = jm_service_module.JMService
 class DummyLogger:
     def __init__(self):
         self.exceptions: list[str] = []
+        self.messages: list[str] = []
 
     def exception(self, message: str):
         self.exceptions.append(message)
 
+    def warning(self, message: str):
+        self.messages.append(message)
+
+    error = info = warning
+
 
 class DummyOption:
     def __init__(self, fail_times: int = 0):
@@ -54,21 +62,23 @@ class TestOutputFormatValidation:
         with pytest.raises(ValueError, match="不支持的输出格式"):
             JMService(config, logger=cast(Any, object()))
 
-    def test_create_jm_option_preserves_album_filename_rule_as_string(self):
-        config = JMOptionContext(cache_dir="cache")
+    def test_create_jm_option_downloads_into_image_store(self, tmp_path):
+        """图片下载到图片库，打包不再交给 jmcomic 插件（不会删除原图）。"""
+        config = JMOptionContext(cache_dir=str(tmp_path))
 
-        option = jm_service_module.create_jm_option(config, mode="album")
+        option = jm_service_module.create_jm_option(config)
 
-        plugin = option.plugins.after_album[0]
-        assert plugin.kwargs.filename_rule == "{Aoutput_name}"
-        assert isinstance(plugin.kwargs.filename_rule, str)
+        assert option.dir_rule.base_dir.rstrip("/\\") == str(tmp_path / "images")
+        assert not option.plugins.get("after_photo")
+        assert not option.plugins.get("after_album")
 
 
 class TestDownloadPhoto:
     @pytest.mark.asyncio
     async def test_download_photo_raises_when_client_init_fails(
-        self, monkeypatch: pytest.MonkeyPatch
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
     ):
+        monkeypatch.chdir(tmp_path)
         option = DummyOption(fail_times=1)
         logger = DummyLogger()
 
@@ -99,14 +109,1178 @@ class TestPrepareAlbumFile:
         )
         album = type("Album", (), {"id": "123"})()
 
-        async def fake_download(received_album, episodes=None):
+        async def fake_download(received_album, episodes=None, **_kwargs):
             output = tmp_path / (
                 f"{service.get_album_output_name(received_album, episodes)}.pdf"
             )
-            output.write_bytes(b"pdf")
+            output.write_bytes(b"%PDF-1.3\n%%EOF\n")
+            return True
 
         monkeypatch.setattr(service, "download_album", fake_download)
 
         result = await service.prepare_album_file(cast(Any, album), [0, 1, 2])
 
         assert result == (str(tmp_path / "album_123_ep_1-3.pdf"), ".pdf")
+
+
+class TestPrepareFileCoalescing:
+    @pytest.mark.asyncio
+    async def test_concurrent_prepare_photo_file_downloads_once(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        import asyncio
+
+        service = JMService(
+            JMOptionContext(cache_dir=str(tmp_path)),
+            logger=cast(Any, object()),
+        )
+        photo = type("Photo", (), {"id": "123"})()
+        calls = 0
+
+        async def fake_download(received_photo, **_kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            (tmp_path / f"{received_photo.id}.pdf").write_bytes(b"%PDF-1.3\n%%EOF\n")
+            return True
+
+        monkeypatch.setattr(service, "download_photo", fake_download)
+
+        results = await asyncio.gather(
+            service.prepare_photo_file(cast(Any, photo)),
+            service.prepare_photo_file(cast(Any, photo)),
+        )
+        again = await service.prepare_photo_file(cast(Any, photo))
+
+        expected = (str(tmp_path / "123.pdf"), ".pdf")
+        assert results == [expected, expected]
+        assert again == expected
+        assert calls == 1
+        assert service.download_stats == {
+            "artifact_hits": 1,
+            "leaders": 1,
+            "joins": 1,
+            "inflight": 0,
+        }
+
+
+class TestArtifactPublication:
+    PDF = b"%PDF-1.3\n%%EOF\n"
+
+    @pytest.mark.asyncio
+    async def test_incomplete_leftover_is_rebuilt(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """崩溃遗留的不完整输出文件不会被当作缓存命中。"""
+        service = JMService(
+            JMOptionContext(cache_dir=str(tmp_path)), logger=cast(Any, object())
+        )
+        (tmp_path / "123.pdf").write_bytes(b"%PDF-1.3\n half written")
+        calls = 0
+
+        async def fake_download(received_photo, **_kwargs):
+            nonlocal calls
+            calls += 1
+            (tmp_path / f"{received_photo.id}.pdf").write_bytes(self.PDF)
+            return True
+
+        monkeypatch.setattr(service, "download_photo", fake_download)
+        photo = type("Photo", (), {"id": "123"})()
+
+        result = await service.prepare_photo_file(cast(Any, photo))
+
+        assert result == (str(tmp_path / "123.pdf"), ".pdf")
+        assert calls == 1
+        assert service.artifact_hits == 0
+
+    @pytest.mark.asyncio
+    async def test_incomplete_episode_is_not_cached(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """章节图片不完整时不生成输出文件，下次请求重新下载而不是复用残缺文件。"""
+        logger = DummyLogger()
+        service = JMService(
+            JMOptionContext(cache_dir=str(tmp_path)), logger=cast(Any, logger)
+        )
+        runs: list[bool] = []
+
+        class FakeDownloader:
+            def __init__(self, _option):
+                # 第一次下载有图片失败，第二次成功
+                self.has_download_failures = not runs
+                runs.append(self.has_download_failures)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *_exc):
+                return False
+
+            def download_by_photo_detail(self, _photo):
+                (tmp_path / "images" / "123").mkdir(parents=True, exist_ok=True)
+
+        async def fake_pack(image_dirs, filename, *, nested=False):
+            (tmp_path / filename).write_bytes(self.PDF)
+
+        monkeypatch.setattr(jm_service_module, "JmDownloader", FakeDownloader)
+        monkeypatch.setattr(service, "pack_output", fake_pack)
+        photo = type("Photo", (), {"id": "123"})()
+
+        assert await service.prepare_photo_file(cast(Any, photo)) is None
+        assert not (tmp_path / "123.pdf").exists()
+        assert not service.is_episode_cached("123")
+
+        result = await service.prepare_photo_file(cast(Any, photo))
+
+        assert result == (str(tmp_path / "123.pdf"), ".pdf")
+        assert runs == [True, False]
+        assert service.is_episode_cached("123")
+
+    @pytest.mark.asyncio
+    async def test_prepared_file_stays_pinned_until_used(self, tmp_path):
+        """准备好的输出文件返回时已固定，交给 hold_file 或 discard_file 后解除。"""
+        service = JMService(
+            JMOptionContext(cache_dir=str(tmp_path), cache_max_age=1),
+            logger=cast(Any, object()),
+        )
+        (tmp_path / "123.pdf").write_bytes(self.PDF)
+        os.utime(tmp_path / "123.pdf", (0, 0))
+        photo = type("Photo", (), {"id": "123"})()
+
+        first = await service.prepare_photo_file(cast(Any, photo))
+        second = await service.prepare_photo_file(cast(Any, photo))
+        assert first is not None
+        assert second is not None
+
+        assert service.artifacts.evict(now=10**10) == []
+        with service.hold_file(first[0]):
+            pass
+        assert service.artifacts.is_pinned("123.pdf")
+        service.discard_file(second[0])
+        assert not service.artifacts.is_pinned("123.pdf")
+        assert service.artifacts.evict(now=10**10) == ["123.pdf"]
+
+    @pytest.mark.asyncio
+    async def test_waits_for_build_lock_held_by_another_process(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """其他进程持有构建锁时等待，对方生成输出后直接复用。"""
+        import asyncio
+
+        file_lock = cast(
+            Any, sys.modules["nonebot_plugin_jmdownloader.infra.file_lock"]
+        )
+        service = JMService(
+            JMOptionContext(cache_dir=str(tmp_path)), logger=cast(Any, object())
+        )
+        monkeypatch.setattr(
+            service,
+            "artifact_lock",
+            lambda name: file_lock.FileLock(
+                tmp_path / ".locks" / f"{name}.lock", poll_interval=0.01
+            ),
+        )
+
+        async def fake_download(*_args, **_kwargs):
+            raise AssertionError("不应重复下载")
+
+        monkeypatch.setattr(service, "download_photo", fake_download)
+        other = file_lock.FileLock(tmp_path / ".locks" / "123.pdf.lock")
+        assert other.try_acquire()
+        photo = type("Photo", (), {"id": "123"})()
+
+        task = asyncio.create_task(service.prepare_photo_file(cast(Any, photo)))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        (tmp_path / "123.pdf").write_bytes(self.PDF)
+        other.release()
+
+        assert await asyncio.wait_for(task, 1) == (str(tmp_path / "123.pdf"), ".pdf")
+        assert service.artifact_hits == 1
+
+
+class TestSharedCacheDir:
+    def test_instances_share_store_but_not_upload_copies(self, tmp_path):
+        """共享缓存目录时图片库和输出文件共享，上传副本留在实例自己的目录。"""
+        service = JMService(
+            JMOptionContext(
+                cache_dir=str(tmp_path / "a"), shared_cache_dir=str(tmp_path / "s")
+            ),
+            logger=cast(Any, object()),
+        )
+        option = jm_service_module.create_jm_option(service._config)
+
+        assert service.output_dir == tmp_path / "s"
+        assert service.image_dir == tmp_path / "s" / "images"
+        assert option.dir_rule.base_dir.rstrip("/\\") == str(tmp_path / "s" / "images")
+        assert service.upload_dir == tmp_path / "a" / "uploads"
+
+    @pytest.mark.asyncio
+    async def test_waits_for_episode_downloaded_by_another_instance(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """其他实例正在下载同一章节时等待，完成后直接复用，不重复下载。"""
+        import asyncio
+
+        file_lock = cast(
+            Any, sys.modules["nonebot_plugin_jmdownloader.infra.file_lock"]
+        )
+        service = JMService(
+            JMOptionContext(
+                cache_dir=str(tmp_path / "a"), shared_cache_dir=str(tmp_path / "s")
+            ),
+            logger=cast(Any, object()),
+        )
+        lock_path = tmp_path / "s" / ".locks" / "episodes" / "1.lock"
+        monkeypatch.setattr(
+            service,
+            "episode_lock",
+            lambda _photo_id: file_lock.FileLock(lock_path, poll_interval=0.01),
+        )
+
+        async def fake_fetch(*_args):
+            raise AssertionError("不应重复下载")
+
+        monkeypatch.setattr(service, "_fetch_images", fake_fetch)
+        other = file_lock.FileLock(lock_path)
+        assert other.try_acquire()
+
+        task = asyncio.create_task(service.ensure_episode("1"))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        episode = tmp_path / "s" / "images" / "1"
+        episode.mkdir(parents=True)
+        (episode / ".complete").touch()
+        other.release()
+
+        await asyncio.wait_for(task, 1)
+        assert service.episode_hits == 1
+
+
+class TestAlbumEpisodes:
+    @pytest.mark.asyncio
+    async def test_episode_details_are_fetched_within_scheduler_slots(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """本子集各章节的详情请求受调度器并发上限约束，不会同时发出。"""
+        import asyncio
+
+        service = JMService(
+            JMOptionContext(cache_dir=str(tmp_path), max_concurrent_downloads=2),
+            logger=cast(Any, object()),
+        )
+        active = peak = 0
+
+        async def fake_get_photo(photo_id):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return type("Photo", (), {"id": photo_id})()
+
+        class FakeDownloader:
+            has_download_failures = False
+
+            def __init__(self, _option):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *_exc):
+                return False
+
+            def download_by_photo_detail(self, _photo):
+                pass
+
+        async def fake_pack(*_args, **_kwargs):
+            pass
+
+        monkeypatch.setattr(service, "get_photo", fake_get_photo)
+        monkeypatch.setattr(jm_service_module, "JmDownloader", FakeDownloader)
+        monkeypatch.setattr(service, "pack_output", fake_pack)
+        album = type(
+            "Album", (), {"id": "9", "episode_list": [(str(i),) for i in range(8)]}
+        )()
+
+        await service.download_album(cast(Any, album))
+
+        assert peak == 2
+
+
+class TestSharedClient:
+    class FlakyClient:
+        def __init__(self, fail: bool):
+            self.fail = fail
+            self.calls = 0
+
+        def get_photo_detail(self, photo_id):
+            self.calls += 1
+            if self.fail:
+                raise jm_service_module.RequestRetryAllFailException("all failed", {})
+            return photo_id
+
+    class PoolOption:
+        def __init__(self, first, rebuilt):
+            self.first = first
+            self.rebuilt = rebuilt
+            self.build_calls = 0
+            self.new_calls = 0
+
+        def build_jm_client(self):
+            self.build_calls += 1
+            return self.first
+
+        def new_jm_client(self):
+            self.new_calls += 1
+            return self.rebuilt
+
+    def _service(self, monkeypatch: pytest.MonkeyPatch, option):
+        monkeypatch.setattr(
+            jm_service_module,
+            "create_jm_option",
+            lambda _config, mode="photo": option,
+        )
+        logger = type("Logger", (), {"warning": lambda self, _msg: None})()
+        return JMService(JMOptionContext(cache_dir="cache"), logger=cast(Any, logger))
+
+    @pytest.mark.asyncio
+    async def test_client_is_built_once(self, monkeypatch: pytest.MonkeyPatch):
+        option = self.PoolOption(self.FlakyClient(fail=False), None)
+        service = self._service(monkeypatch, option)
+
+        assert await service.get_photo("1") == "1"
+        assert await service.get_photo("2") == "2"
+        assert option.build_calls == 1
+        assert service.client_rebuilds == 0
+
+    @pytest.mark.asyncio
+    async def test_client_is_rebuilt_on_domain_failure(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        broken = self.FlakyClient(fail=True)
+        healthy = self.FlakyClient(fail=False)
+        option = self.PoolOption(broken, healthy)
+        service = self._service(monkeypatch, option)
+
+        assert await service.get_photo("1") == "1"
+        assert await service.get_photo("2") == "2"
+        assert broken.calls == 1
+        assert healthy.calls == 2
+        assert option.new_calls == 1
+        assert service.client_rebuilds == 1
+
+
+class TestSearchPreviews:
+    def test_search_previews_read_page_content(self):
+        page = jm_service_module.JmSearchPage(
+            [
+                ("1", {"name": "t1", "author": "a1", "tags": ["x"]}),
+                ("2", {"name": "t2", "tags": []}),
+            ],
+            2,
+        )
+
+        previews = JMService.search_previews(page)
+
+        assert previews[0] == jm_service_module.SearchPreview(
+            id="1", title="t1", author="a1", tags=("x",)
+        )
+        assert previews[1].author == ""
+        assert not previews[1].is_complete
+
+    def test_api_search_page_lacks_tags(self):
+        """API 客户端的真实搜索结果没有标签，每条都需要请求详情"""
+        from jmcomic import AdvancedDict, JmPageTool
+
+        page = JmPageTool.parse_api_to_search_page(
+            AdvancedDict(
+                {
+                    "search_query": "MANA",
+                    "total": "1",
+                    "content": [
+                        {
+                            "id": "441923",
+                            "author": "MANA",
+                            "description": "",
+                            "name": "[MANA] 神里绫华5",
+                            "image": "",
+                            "category": {"id": "1", "title": "同人"},
+                            "category_sub": {"id": "1", "title": "同人"},
+                        }
+                    ],
+                }
+            ),
+            1,
+        )
+
+        (preview,) = JMService.search_previews(page)
+
+        assert preview.title == "[MANA] 神里绫华5"
+        assert preview.author == "MANA"
+        assert not preview.is_complete
+
+    def test_single_album_page_uses_album_detail(self):
+        album = jm_service_module.JmAlbumDetail(
+            album_id="7",
+            scramble_id="0",
+            name="t",
+            episode_list=[],
+            page_count=0,
+            pub_date="",
+            update_date="",
+            likes=0,
+            views=0,
+            comment_count=0,
+            works=[],
+            actors=[],
+            authors=["a"],
+            tags=["x"],
+        )
+
+        (preview,) = JMService.search_previews(
+            jm_service_module.JmSearchPage.wrap_single_album(album)
+        )
+
+        assert preview == jm_service_module.SearchPreview(
+            id="7", title="t", author="a", tags=("x",)
+        )
+        assert preview.is_complete
+
+    @pytest.mark.asyncio
+    async def test_complete_preview_only_fetches_incomplete(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        service = JMService(
+            JMOptionContext(cache_dir="cache"), logger=cast(Any, object())
+        )
+        fetched: list[str] = []
+
+        async def fake_get_photo(photo_id):
+            fetched.append(photo_id)
+            return type(
+                "Photo",
+                (),
+                {"id": photo_id, "title": "t", "author": "a", "tags": ["x"]},
+            )()
+
+        monkeypatch.setattr(service, "get_photo", fake_get_photo)
+        complete = jm_service_module.SearchPreview(
+            id="1", title="t", author="a", tags=("x",)
+        )
+
+        assert await service.complete_preview(complete) is complete
+        filled = await service.complete_preview(
+            jm_service_module.SearchPreview(id="2", title="t")
+        )
+        assert filled.tags == ("x",)
+        assert fetched == ["2"]
+        assert service.search_stats["preview_hits"] == 1
+        assert service.search_stats["preview_fetches"] == 1
+
+
+class TestBlurredCover:
+    @pytest.mark.asyncio
+    async def test_cached_cover_skips_download_and_blur(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        from io import BytesIO
+
+        from PIL import Image
+
+        service = JMService(
+            JMOptionContext(
+                cache_dir=str(tmp_path),
+                cover_cache_memory_bytes=1024 * 1024,
+                cover_cache_ttl=60,
+            ),
+            logger=cast(Any, object()),
+        )
+        downloads = 0
+
+        async def fake_download_avatar(_photo_id):
+            nonlocal downloads
+            downloads += 1
+            raw = BytesIO()
+            Image.new("RGB", (32, 32), "red").save(raw, format="JPEG")
+            raw.seek(0)
+            return raw
+
+        monkeypatch.setattr(service, "download_avatar", fake_download_avatar)
+
+        first = await service.get_blurred_cover(1)
+        second = await service.get_blurred_cover(1)
+
+        assert first.getvalue() == second.getvalue()
+        assert downloads == 1
+        assert (tmp_path / "covers" / "1.img").exists()
+        assert service.covers.stats()["memory_hits"] == 1
+
+
+class TestMetadataCache:
+    class CountingClient:
+        def __init__(self, missing: set[str] = frozenset()):
+            self.missing = missing
+            self.calls: list[str] = []
+
+        def get_photo_detail(self, photo_id):
+            self.calls.append(photo_id)
+            if photo_id in self.missing:
+                raise jm_service_module.MissingAlbumPhotoException("missing", {})
+            return type("Photo", (), {"id": photo_id})()
+
+    def _service(self, monkeypatch: pytest.MonkeyPatch, client, **config):
+        option = type("Option", (), {"build_jm_client": lambda self: client})()
+        monkeypatch.setattr(
+            jm_service_module,
+            "create_jm_option",
+            lambda _config, mode="photo": option,
+        )
+        return JMService(
+            JMOptionContext(cache_dir="cache", metadata_cache_ttl=60, **config),
+            logger=cast(Any, object()),
+        )
+
+    @pytest.mark.asyncio
+    async def test_repeated_lookup_hits_cache(self, monkeypatch: pytest.MonkeyPatch):
+        """测试重复查询只请求一次"""
+        client = self.CountingClient()
+        service = self._service(monkeypatch, client)
+
+        first = await service.get_photo("1")
+        second = await service.get_photo("1")
+
+        assert first is second
+        assert client.calls == ["1"]
+        assert service.metadata_stats["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_are_coalesced(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试同一 id 的并发查询合并为一次请求"""
+        import asyncio
+
+        client = self.CountingClient()
+        service = self._service(monkeypatch, client)
+
+        await asyncio.gather(service.get_photo("1"), service.get_photo("1"))
+
+        assert client.calls == ["1"]
+        assert service.metadata_stats["joins"] == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_id_is_negatively_cached(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试不存在的 id 不会重复请求"""
+        client = self.CountingClient(missing={"404"})
+        service = self._service(monkeypatch, client)
+
+        errors = []
+        for _ in range(3):
+            with pytest.raises(
+                jm_service_module.MissingAlbumPhotoException, match="missing"
+            ) as exc_info:
+                await service.get_photo("404")
+            errors.append(exc_info.value)
+
+        assert client.calls == ["404"]
+        # 每次命中抛出新的异常，traceback 不会随重复抛出而增长
+        assert errors[1] is not errors[2]
+        assert len(traceback.extract_tb(errors[1].__traceback__)) == len(
+            traceback.extract_tb(errors[2].__traceback__)
+        )
+
+    @pytest.mark.asyncio
+    async def test_disabled_cache_always_fetches(self, monkeypatch: pytest.MonkeyPatch):
+        """测试缓存时间为 0 时不缓存"""
+        client = self.CountingClient()
+        service = self._service(monkeypatch, client)
+        service._details = service._missing = None
+
+        await service.get_photo("1")
+        await service.get_photo("1")
+
+        assert client.calls == ["1", "1"]
+
+    @pytest.mark.asyncio
+    async def test_failed_download_invalidates_entry(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试下载失败后丢弃缓存的详情"""
+        monkeypatch.chdir(tmp_path)
+        client = self.CountingClient()
+        service = self._service(monkeypatch, client)
+        photo = await service.get_photo("1")
+
+        def broken_downloader(_option):
+            raise OSError("network down")
+
+        monkeypatch.setattr(jm_service_module, "JmDownloader", broken_downloader)
+        with pytest.raises(OSError, match="network down"):
+            await service.download_photo(photo)
+        await service.get_photo("1")
+
+        assert client.calls == ["1", "1"]
+
+    @pytest.mark.asyncio
+    async def test_download_album_does_not_mutate_cached_album(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试按章节下载不会修改缓存中的本子集"""
+        album = type("Album", (), {"id": "9", "episode_list": [("1",), ("2",)]})()
+        ensured = []
+        packed = []
+
+        async def fake_ensure(photo_id, **_kwargs):
+            ensured.append(photo_id)
+            return True
+
+        async def fake_pack(image_dirs, filename, *, nested=False):
+            packed.append((image_dirs, filename, nested))
+
+        service = self._service(monkeypatch, self.CountingClient())
+        monkeypatch.setattr(service, "ensure_episode", fake_ensure)
+        monkeypatch.setattr(service, "pack_output", fake_pack)
+
+        await service.download_album(cast(Any, album), [1])
+
+        assert ensured == ["2"]
+        assert album.episode_list == [("1",), ("2",)]
+        assert packed == [(["2"], "album_9_ep_2.pdf", True)]
+
+
+class TestSearchCache:
+    class SearchClient:
+        def __init__(self):
+            self.calls: list[tuple[str, int]] = []
+
+        def search_site(self, search_query, page):
+            self.calls.append((search_query, page))
+            return jm_service_module.JmSearchPage({"content": [], "total": 0}, 0)
+
+    def _service(self, monkeypatch: pytest.MonkeyPatch, client):
+        option = type("Option", (), {"build_jm_client": lambda self: client})()
+        monkeypatch.setattr(
+            jm_service_module,
+            "create_jm_option",
+            lambda _config, mode="photo": option,
+        )
+        return JMService(
+            JMOptionContext(cache_dir="cache", search_cache_ttl=60),
+            logger=cast(Any, object()),
+        )
+
+    @pytest.mark.asyncio
+    async def test_normalized_queries_share_cache(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试空白和大小写不同的关键词共享同一缓存，请求时使用原始关键词"""
+        client = self.SearchClient()
+        service = self._service(monkeypatch, client)
+
+        first = await service.search("Full  Color ")
+        second = await service.search("full color")
+
+        assert first is second
+        assert client.calls == [("Full  Color ", 1)]
+        assert service.search_stats["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_pages_are_cached_separately(self, monkeypatch: pytest.MonkeyPatch):
+        """测试不同页码分别缓存"""
+        client = self.SearchClient()
+        service = self._service(monkeypatch, client)
+
+        await service.search("a")
+        await service.search("a", page=2)
+
+        assert client.calls == [("a", 1), ("a", 2)]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_searches_are_coalesced(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试相同的并发搜索只请求一次"""
+        import asyncio
+
+        client = self.SearchClient()
+        service = self._service(monkeypatch, client)
+
+        await asyncio.gather(service.search("a"), service.search("A"))
+
+        assert client.calls == [("a", 1)]
+        assert service.search_stats["joins"] == 1
+
+
+class TestSearchCards:
+    def _service(self, **config):
+        logger = type("Logger", (), {"warning": lambda self, _msg: None})()
+        return JMService(
+            JMOptionContext(cache_dir="cache", **config), logger=cast(Any, logger)
+        )
+
+    @pytest.mark.asyncio
+    async def test_slow_cover_degrades_to_text_card(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试超时的封面降级为纯文字卡片，失败的详情被略过"""
+        import asyncio
+        from io import BytesIO
+
+        service = self._service(search_deadline=0.05)
+        previews = [jm_service_module.SearchPreview(id=str(i)) for i in range(3)]
+
+        async def fake_complete(preview):
+            if preview.id == "2":
+                raise jm_service_module.MissingAlbumPhotoException("missing", {})
+            return jm_service_module.SearchPreview(
+                id=preview.id, title="t", author="a", tags=("x",)
+            )
+
+        async def fake_cover(photo_id):
+            if photo_id == "1":
+                await asyncio.sleep(10)
+            return BytesIO(b"img")
+
+        monkeypatch.setattr(service, "complete_preview", fake_complete)
+        monkeypatch.setattr(service, "get_blurred_cover", fake_cover)
+
+        cards = await service.prepare_search_cards(previews)
+
+        assert [(detail.id, cover is not None) for detail, cover in cards] == [
+            ("0", True),
+            ("1", False),
+        ]
+        assert service.degraded_cards == 1
+
+    @pytest.mark.asyncio
+    async def test_late_detail_falls_back_to_search_preview(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试详情超时的结果退回搜索页信息，产出不带封面的文字卡片；
+        搜索页没有标签（API 客户端）的结果无法检查限制标签，不展示"""
+        import asyncio
+        from io import BytesIO
+
+        service = self._service(search_deadline=0.05)
+        preview = jm_service_module.SearchPreview(id="1", title="t", tags=("x",))
+        tagless = jm_service_module.SearchPreview(id="2", title="t", author="a")
+
+        async def slow_complete(_preview):
+            await asyncio.sleep(10)
+
+        async def fake_cover(_photo_id):
+            return BytesIO(b"img")
+
+        monkeypatch.setattr(service, "complete_preview", slow_complete)
+        monkeypatch.setattr(service, "get_blurred_cover", fake_cover)
+
+        assert await service.prepare_search_cards([preview, tagless]) == [
+            (preview, None)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_complete_previews_skip_concurrency_limit(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        """测试信息完整的结果不排在封面下载之后等待并发名额"""
+        import asyncio
+
+        service = self._service(search_concurrency=1, search_deadline=0.05)
+        release = asyncio.Event()
+
+        async def blocked_cover(_photo_id):
+            await release.wait()
+
+        monkeypatch.setattr(service, "get_blurred_cover", blocked_cover)
+        previews = [
+            jm_service_module.SearchPreview(
+                id=str(i), title="t", author="a", tags=("x",)
+            )
+            for i in range(3)
+        ]
+
+        cards = await service.prepare_search_cards(previews)
+
+        assert [(detail, cover) for detail, cover in cards] == [
+            (preview, None) for preview in previews
+        ]
+        release.set()
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit_is_shared(self, monkeypatch: pytest.MonkeyPatch):
+        """测试详情和封面请求共享并发上限"""
+        import asyncio
+        from io import BytesIO
+
+        service = self._service(search_concurrency=2)
+        running = peak = 0
+
+        async def track():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        async def fake_complete(preview):
+            await track()
+            return preview
+
+        async def fake_cover(_photo_id):
+            await track()
+            return BytesIO(b"img")
+
+        monkeypatch.setattr(service, "complete_preview", fake_complete)
+        monkeypatch.setattr(service, "get_blurred_cover", fake_cover)
+
+        cards = await service.prepare_search_cards(
+            [jm_service_module.SearchPreview(id=str(i)) for i in range(4)]
+        )
+
+        assert len(cards) == 4
+        assert peak == 2
+
+
+class TestImageStore:
+    @pytest.mark.asyncio
+    async def test_outputs_are_rebuilt_from_stored_images(self, tmp_path):
+        """图片库中已有章节图片时，不同格式的输出都只需本地打包。"""
+        import zipfile
+
+        episode = tmp_path / "images" / "1"
+        episode.mkdir(parents=True)
+        (episode / "00001.jpg").write_bytes(b"jpg")
+
+        service = JMService(
+            JMOptionContext(
+                cache_dir=str(tmp_path),
+                output_format=jm_service_module.OutputFormat.ZIP,
+            ),
+            logger=cast(Any, object()),
+        )
+        await service.pack_output(["1"], "1.zip")
+        await service.pack_output(["1"], "album_1_all.zip", nested=True)
+
+        with zipfile.ZipFile(tmp_path / "1.zip") as archive:
+            assert archive.namelist() == ["00001.jpg"]
+        with zipfile.ZipFile(tmp_path / "album_1_all.zip") as archive:
+            assert archive.namelist() == ["1/00001.jpg"]
+        assert (episode / "00001.jpg").exists()
+
+    @pytest.mark.asyncio
+    async def test_album_selections_only_fetch_missing_episodes(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """先下载 1-2 章再下载 1-3 章时，只下载第 3 章。"""
+        import zipfile
+
+        downloaded: list[str] = []
+
+        class FakeDownloader:
+            has_download_failures = False
+
+            def __init__(self, _option):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *_args):
+                return False
+
+            def download_by_photo_detail(self, photo):
+                downloaded.append(photo.id)
+                episode = tmp_path / "images" / photo.id
+                episode.mkdir(parents=True, exist_ok=True)
+                (episode / "00001.jpg").write_bytes(b"jpg")
+
+        service = JMService(
+            JMOptionContext(
+                cache_dir=str(tmp_path),
+                output_format=jm_service_module.OutputFormat.ZIP,
+            ),
+            logger=cast(Any, object()),
+        )
+
+        async def fake_get_photo(photo_id):
+            return type("Photo", (), {"id": photo_id})()
+
+        monkeypatch.setattr(jm_service_module, "JmDownloader", FakeDownloader)
+        monkeypatch.setattr(service, "get_photo", fake_get_photo)
+        album = type(
+            "Album", (), {"id": "9", "episode_list": [("1",), ("2",), ("3",)]}
+        )()
+
+        await service.download_album(cast(Any, album), [0, 1])
+        await service.download_album(cast(Any, album), [0, 1, 2])
+
+        assert sorted(downloaded) == ["1", "2", "3"]
+        assert downloaded[-1] == "3"
+        assert service.episode_hits == 2
+        with zipfile.ZipFile(tmp_path / "album_9_ep_1-3.zip") as archive:
+            assert archive.namelist() == ["1/00001.jpg", "2/00001.jpg", "3/00001.jpg"]
+
+    @pytest.mark.asyncio
+    async def test_album_episodes_download_in_parallel(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """本子集的多个章节同时下载，并共享同一个图片线程池。"""
+        import threading
+
+        from jmcomic import JTC, JmRuntime
+
+        barrier = threading.Barrier(2, timeout=5)
+        runtimes: list[Any] = []
+
+        class FakeDownloader:
+            has_download_failures = False
+
+            def __init__(self, _option):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *_args):
+                return False
+
+            def download_by_photo_detail(self, photo):
+                runtimes.append(JTC.get_runtime())
+                # 两个章节都进入下载后才能继续，串行下载会超时
+                barrier.wait()
+                episode = tmp_path / "images" / photo.id
+                episode.mkdir(parents=True, exist_ok=True)
+                (episode / "00001.jpg").write_bytes(b"jpg")
+
+        service = JMService(
+            JMOptionContext(
+                cache_dir=str(tmp_path),
+                output_format=jm_service_module.OutputFormat.ZIP,
+                max_concurrent_downloads=2,
+                image_download_workers=3,
+            ),
+            logger=cast(Any, object()),
+        )
+
+        async def fake_get_photo(photo_id):
+            return type("Photo", (), {"id": photo_id})()
+
+        monkeypatch.setattr(jm_service_module, "JmDownloader", FakeDownloader)
+        monkeypatch.setattr(service, "get_photo", fake_get_photo)
+        album = type("Album", (), {"id": "9", "episode_list": [("1",), ("2",)]})()
+
+        try:
+            await service.download_album(cast(Any, album))
+        finally:
+            await service.aclose()
+
+        assert len(runtimes) == 2
+        assert runtimes[0] is runtimes[1]
+        assert runtimes[0].has_executor(JmRuntime.LEVEL_IMAGE)
+        assert (tmp_path / "album_9.zip").exists()
+
+    @pytest.mark.asyncio
+    async def test_retry_resumes_from_recorded_pages(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """部分图片下载失败后重试时，已记录的图片保留，未完成的图片被删除重下。"""
+        page_manifest = cast(
+            Any, sys.modules["nonebot_plugin_jmdownloader.infra.page_manifest"]
+        )
+        runs: list[list[str]] = []
+
+        class FakeDownloader:
+            def __init__(self, _option):
+                self.has_download_failures = False
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *_args):
+                return False
+
+            def download_by_photo_detail(self, photo):
+                episode = tmp_path / "images" / photo.id
+                episode.mkdir(parents=True, exist_ok=True)
+                existing = sorted(p.name for p in episode.glob("*.jpg"))
+                runs.append(existing)
+                if not existing:
+                    # 第 1 张完成，第 2 张写到一半失败
+                    (episode / "00001.jpg").write_bytes(b"a" * 100)
+                    page_manifest.record_page(episode / "00001.jpg")
+                    (episode / "00002.jpg").write_bytes(b"b" * 3)
+                    self.has_download_failures = True
+                    return
+                (episode / "00002.jpg").write_bytes(b"b" * 50)
+                page_manifest.record_page(episode / "00002.jpg")
+
+        messages: list[str] = []
+        logger = type(
+            "Logger",
+            (),
+            {
+                "info": lambda self, msg: messages.append(msg),
+                "warning": lambda self, msg: messages.append(msg),
+            },
+        )()
+        service = JMService(
+            JMOptionContext(cache_dir=str(tmp_path)), logger=cast(Any, logger)
+        )
+        monkeypatch.setattr(jm_service_module, "JmDownloader", FakeDownloader)
+        photo = type("Photo", (), {"id": "1"})()
+
+        await service.ensure_episode(cast(Any, photo))
+        assert not service.is_episode_cached("1")
+        await service.ensure_episode(cast(Any, photo))
+
+        assert runs == [[], ["00001.jpg"]]
+        assert service.is_episode_cached("1")
+        assert (service.resumed_pages, service.resumed_bytes) == (1, 100)
+        assert any("断点续传" in msg for msg in messages)
+
+    @pytest.mark.asyncio
+    async def test_failed_episode_cancels_album(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """任一章节失败时本子集下载抛出原始异常，不打包输出。"""
+        service = JMService(
+            JMOptionContext(cache_dir=str(tmp_path)), logger=cast(Any, object())
+        )
+
+        async def fake_ensure_episode(photo_id, **_kwargs):
+            if photo_id == "2":
+                raise OSError("boom")
+
+        async def fake_pack_output(*_args, **_kwargs):
+            raise AssertionError("不应打包")
+
+        monkeypatch.setattr(service, "ensure_episode", fake_ensure_episode)
+        monkeypatch.setattr(service, "pack_output", fake_pack_output)
+        album = type("Album", (), {"id": "9", "episode_list": [("1",), ("2",)]})()
+
+        with pytest.raises(OSError, match="boom"):
+            await service.download_album(cast(Any, album))
+
+
+class TestStreamAlbumFiles:
+    @pytest.mark.asyncio
+    async def test_episodes_are_yielded_in_order_while_others_prepare(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        """章节按顺序产出，失败章节为 None，上传第一话时后续章节已在准备。"""
+        import asyncio
+
+        logger = type("Logger", (), {"warning": lambda self, _msg: None})()
+        service = JMService(
+            JMOptionContext(cache_dir="cache"), logger=cast(Any, logger)
+        )
+        album = type(
+            "Album", (), {"id": "9", "episode_list": [("1",), ("2",), ("3",)]}
+        )()
+        started: list[str] = []
+
+        async def fake_prepare(photo_id, **_kwargs):
+            started.append(photo_id)
+            await asyncio.sleep(0.01 if photo_id == "1" else 0)
+            if photo_id == "2":
+                raise OSError("boom")
+            return (f"{photo_id}.pdf", ".pdf")
+
+        monkeypatch.setattr(service, "prepare_episode_file", fake_prepare)
+
+        results = []
+        async for index, result in service.stream_album_files(cast(Any, album)):
+            if index == 0:
+                assert started == ["1", "2", "3"]
+            results.append((index, result))
+
+        assert results == [(0, ("1.pdf", ".pdf")), (1, None), (2, ("3.pdf", ".pdf"))]
+
+
+class TestUploadCopies:
+    class Logger:
+        def __init__(self):
+            self.messages: list[str] = []
+
+        def debug(self, msg):
+            self.messages.append(msg)
+
+        info = error = debug
+
+    @staticmethod
+    def _service(tmp_path, logger) -> Any:
+        (tmp_path / "123.pdf").write_bytes(b"%PDF-1.3\n" + b"x" * 100 + b"\n%%EOF\n")
+        return JMService(
+            JMOptionContext(cache_dir=str(tmp_path), modify_md5=True),
+            logger=cast(Any, logger),
+        )
+
+    @pytest.mark.asyncio
+    async def test_copy_is_deleted_after_upload(self, tmp_path):
+        """每次上传生成独立副本，上传结束后副本被删除，原文件保留。"""
+        import hashlib
+
+        logger = self.Logger()
+        service = self._service(tmp_path, logger)
+        photo = type("Photo", (), {"id": 123})()
+
+        result = await service.prepare_photo_file(cast(Any, photo))
+        assert result is not None
+        copy = tmp_path / "uploads" / os.path.basename(result[0])
+        assert str(copy) == result[0]
+        assert copy.exists()
+        assert (
+            hashlib.md5(copy.read_bytes()).digest()
+            != hashlib.md5((tmp_path / "123.pdf").read_bytes()).digest()
+        )
+
+        with service.hold_file(result[0]):
+            assert service.upload_stats["held"] == 1
+            assert service.upload_stats["held_bytes"] == copy.stat().st_size
+
+        assert not copy.exists()
+        assert (tmp_path / "123.pdf").exists()
+        stats = service.upload_stats
+        assert (stats["copies"], stats["held"], stats["held_bytes"]) == (1, 0, 0)
+        assert stats["bytes_written"] > 0
+        assert any("已删除上传副本" in msg for msg in logger.messages)
+
+    @pytest.mark.asyncio
+    async def test_trim_removes_only_stale_copies(self, tmp_path):
+        """缓存整理删除遗留的副本，使用中的副本保留。"""
+        service = self._service(tmp_path, self.Logger())
+        photo = type("Photo", (), {"id": 123})()
+        result = await service.prepare_photo_file(cast(Any, photo))
+        assert result is not None
+        stale = tmp_path / "uploads" / "123_dead.pdf"
+        stale.write_bytes(b"stale")
+
+        removed = await service.trim_cache()
+
+        assert removed == ["uploads/123_dead.pdf"]
+        assert not stale.exists()
+        assert (tmp_path / "uploads" / os.path.basename(result[0])).exists()
+
+    @pytest.mark.asyncio
+    async def test_sweep_removes_crash_leftovers(self, tmp_path):
+        """定时整理删除无人持有的锁文件和写入者已退出的临时文件。"""
+        service = self._service(tmp_path, self.Logger())
+        (tmp_path / ".1.pdf.1.tmp").write_bytes(b"partial")
+        (tmp_path / ".2.pdf.1.tmp").write_bytes(b"partial")
+        (tmp_path / ".locks" / "episodes").mkdir(parents=True)
+        (tmp_path / ".locks" / "episodes" / "7.lock").touch()
+
+        with service.artifact_lock("2.pdf").hold():
+            removed = await service.trim_cache(sweep=True)
+
+        assert sorted(removed) == [
+            ".1.pdf.1.tmp",
+            ".locks/1.pdf.lock",
+            ".locks/episodes/7.lock",
+        ]
+        assert (tmp_path / ".2.pdf.1.tmp").exists()
+        assert (tmp_path / ".locks" / "2.pdf.lock").exists()
@@ -0,0 +1,94 @@
+"""
+JobJournal 单元测试
+
+测试后台任务的持久化、状态流转、次数预扣统计和清理。
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from nonebot_plugin_jmdownloader.core.download_job import DownloadJob
+from nonebot_plugin_jmdownloader.core.enums import DownloadPriority, JobKind, JobState
+from nonebot_plugin_jmdownloader.infra.job_journal import JobJournal
+
+
+def make_job(**kwargs) -> DownloadJob:
+    fields = {"kind": JobKind.PHOTO, "jm_id": "123", "bot_id": "1", "user_id": 10}
+    fields.update(kwargs)
+    return DownloadJob(**fields)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = JobJournal(tmp_path / "jobs.db")
+    yield journal
+    journal.close()
+
+
+class TestJobJournal:
+    """任务日志测试"""
+
+    def test_add_round_trip(self, journal):
+        """测试写入后可按 id 读回所有字段"""
+        job = journal.add(
+            make_job(
+                kind=JobKind.ALBUM,
+                group_id=20,
+                episodes=[0, 2],
+                priority=DownloadPriority.HIGH,
+                charge=False,
+            )
+        )
+
+        assert job.id > 0
+        assert job.created_at > 0
+        assert journal.get(job.id) == job
+
+    def test_survives_reopen(self, tmp_path):
+        """测试重新打开数据库后未结束的任务仍在（模拟重启）"""
+        journal = JobJournal(tmp_path / "jobs.db")
+        running = journal.add(make_job(jm_id="1"))
+        journal.start(running)
+        pending = journal.add(make_job(jm_id="2", episodes=None))
+        done = journal.add(make_job(jm_id="3"))
+        journal.finish(done, JobState.DONE)
+        journal.close()
+
+        reopened = JobJournal(tmp_path / "jobs.db")
+        try:
+            unfinished = reopened.unfinished()
+        finally:
+            reopened.close()
+
+        assert [job.id for job in unfinished] == [running.id, pending.id]
+        assert unfinished[0].state == JobState.RUNNING
+        assert unfinished[0].attempts == 1
+        assert unfinished[1].episodes is None
+
+    def test_finish_rejects_unfinished_state(self, journal):
+        """测试只能以结束状态结束任务"""
+        job = journal.add(make_job())
+
+        with pytest.raises(ValueError, match="不是结束状态"):
+            journal.finish(job, JobState.RUNNING)
+
+    def test_pending_charges(self, journal):
+        """测试只统计该用户未结束且需要扣次数的任务"""
+        journal.add(make_job())
+        journal.add(make_job(charge=False))
+        journal.add(make_job(user_id=11))
+        journal.finish(journal.add(make_job()), JobState.DONE)
+
+        assert journal.pending_charges(10) == 1
+
+    def test_prune_removes_old_finished_jobs(self, journal):
+        """测试清理只删除已结束超过保留时间的任务"""
+        finished = journal.add(make_job())
+        journal.finish(finished, JobState.FAILED)
+        pending = journal.add(make_job())
+
+        assert journal.prune(3600) == 0
+        assert journal.prune(-1) == 1
+        assert journal.get(finished.id) is None
+        assert journal.get(pending.id) is not None
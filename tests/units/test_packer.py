@@ -0,0 +1,134 @@
+"""
+packer 单元测试
+
+测试从图片库打包 PDF/ZIP、加密和图片筛选。
+"""
+
+from __future__ import annotations
+
+import re
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+import pyzipper
+from PIL import Image
+
+from nonebot_plugin_jmdownloader.core.enums import OutputFormat
+from nonebot_plugin_jmdownloader.infra.packer import (
+    PackError,
+    is_complete_output,
+    list_images,
+    pack_images,
+)
+
+
+def _make_episode(root: Path, name: str, pages: int) -> Path:
+    episode = root / name
+    episode.mkdir(parents=True)
+    for page in range(1, pages + 1):
+        output = BytesIO()
+        Image.new("RGB", (8, 8), "white").save(output, format="JPEG")
+        (episode / f"{page:05}.jpg").write_bytes(output.getvalue())
+    return episode
+
+
+class TestListImages:
+    """图片筛选测试"""
+
+    def test_skips_non_images_and_hidden_files(self, tmp_path):
+        """测试忽略非图片、隐藏文件和临时文件"""
+        episode = _make_episode(tmp_path, "1", 2)
+        (episode / "notes.txt").write_text("x")
+        (episode / ".00003.jpg").write_bytes(b"partial")
+
+        assert [p.name for p in list_images(episode)] == ["00001.jpg", "00002.jpg"]
+
+    def test_missing_dir(self, tmp_path):
+        """测试目录不存在时返回空列表"""
+        assert list_images(tmp_path / "missing") == []
+
+
+class TestPackImages:
+    """打包测试"""
+
+    def test_pdf_merges_episodes_in_order(self, tmp_path):
+        """测试多个章节合并为一个 PDF，且不删除原图"""
+        dirs = [_make_episode(tmp_path, "1", 2), _make_episode(tmp_path, "2", 3)]
+        output = tmp_path / "out" / "album.pdf"
+
+        pack_images(OutputFormat.PDF, dirs, output)
+
+        assert output.read_bytes().startswith(b"%PDF")
+        assert len(re.findall(rb"/Type\s*/Page\b", output.read_bytes())) == 5
+        assert all(list_images(d) for d in dirs)
+
+    def test_zip_photo_layout(self, tmp_path):
+        """测试单章节 ZIP 直接包含图片"""
+        episode = _make_episode(tmp_path, "1", 2)
+        output = tmp_path / "1.zip"
+
+        pack_images(OutputFormat.ZIP, [episode], output)
+
+        with zipfile.ZipFile(output) as archive:
+            assert archive.namelist() == ["00001.jpg", "00002.jpg"]
+
+    def test_zip_album_layout_is_nested(self, tmp_path):
+        """测试本子集 ZIP 按章节分文件夹"""
+        dirs = [_make_episode(tmp_path, "1", 1), _make_episode(tmp_path, "2", 1)]
+        output = tmp_path / "album.zip"
+
+        pack_images(OutputFormat.ZIP, dirs, output, nested=True)
+
+        with zipfile.ZipFile(output) as archive:
+            assert archive.namelist() == ["1/00001.jpg", "2/00001.jpg"]
+
+    def test_encrypted_zip(self, tmp_path):
+        """测试设置密码时使用 AES 加密"""
+        episode = _make_episode(tmp_path, "1", 1)
+        output = tmp_path / "1.zip"
+
+        pack_images(OutputFormat.ZIP, [episode], output, password="secret")
+
+        with pyzipper.AESZipFile(output) as archive:
+            with pytest.raises(RuntimeError):
+                archive.read("00001.jpg")
+            archive.setpassword(b"secret")
+            assert archive.read("00001.jpg") == (episode / "00001.jpg").read_bytes()
+
+    def test_no_images_raises(self, tmp_path):
+        """测试没有图片时抛出 PackError 且不生成文件"""
+        output = tmp_path / "1.pdf"
+
+        with pytest.raises(PackError):
+            pack_images(OutputFormat.PDF, [tmp_path / "missing"], output)
+        assert not output.exists()
+        assert list(tmp_path.iterdir()) == []
+
+    def test_failure_keeps_previous_output(self, tmp_path):
+        """测试打包失败时不覆盖已有输出，也不遗留临时文件"""
+        output = tmp_path / "1.pdf"
+        output.write_bytes(b"old")
+
+        with pytest.raises(PackError):
+            pack_images(OutputFormat.PDF, [tmp_path / "missing"], output)
+        assert output.read_bytes() == b"old"
+        assert list(tmp_path.iterdir()) == [output]
+
+
+class TestIsCompleteOutput:
+    """输出完整性检查测试"""
+
+    @pytest.mark.parametrize("fmt", [OutputFormat.PDF, OutputFormat.ZIP])
+    def test_complete_and_truncated(self, tmp_path, fmt):
+        """测试完整输出通过检查，截断的输出和不存在的文件不通过"""
+        episode = _make_episode(tmp_path / "images", "1", 2)
+        output = tmp_path / f"1{fmt.ext}"
+        pack_images(fmt, [episode], output)
+        truncated = tmp_path / f"truncated{fmt.ext}"
+        truncated.write_bytes(output.read_bytes()[: output.stat().st_size // 2])
+
+        assert is_complete_output(fmt, output)
+        assert not is_complete_output(fmt, truncated)
+        assert not is_complete_output(fmt, tmp_path / f"missing{fmt.ext}")
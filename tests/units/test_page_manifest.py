@@ -0,0 +1,83 @@
+"""
+page_manifest 单元测试
+
+测试章节清单的记录、校验和 jmcomic 插件回调。
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from nonebot_plugin_jmdownloader.core.enums import OutputFormat
+from nonebot_plugin_jmdownloader.infra.jm_service import (
+    JMOptionContext,
+    create_jm_option,
+)
+from nonebot_plugin_jmdownloader.infra.page_manifest import (
+    MANIFEST_NAME,
+    load_manifest,
+    prepare_resume,
+    record_page,
+)
+
+
+class TestPrepareResume:
+    """断点校验测试"""
+
+    def test_keeps_recorded_pages_and_discards_partial_ones(self, tmp_path):
+        """测试清单中大小一致的图片保留，未记录或大小不符的图片删除"""
+        episode = tmp_path / "1"
+        episode.mkdir()
+        (episode / "00001.jpg").write_bytes(b"a" * 10)
+        (episode / "00002.jpg").write_bytes(b"b" * 20)
+        record_page(episode / "00001.jpg")
+        record_page(episode / "00002.jpg")
+        # 第 2 张在记录后被改写（残缺），第 3 张写入中断未记录
+        (episode / "00002.jpg").write_bytes(b"b" * 5)
+        (episode / "00003.jpg").write_bytes(b"c" * 3)
+
+        stats = prepare_resume(episode)
+
+        assert (stats.pages, stats.bytes, stats.discarded) == (1, 10, 2)
+        assert sorted(p.name for p in episode.iterdir()) == [
+            MANIFEST_NAME,
+            "00001.jpg",
+        ]
+        assert load_manifest(episode) == {"00001.jpg": 10}
+
+    def test_missing_directory(self, tmp_path):
+        """测试章节目录不存在时无可复用图片"""
+        stats = prepare_resume(tmp_path / "missing")
+
+        assert (stats.pages, stats.bytes, stats.discarded) == (0, 0, 0)
+
+    def test_ignores_malformed_lines(self, tmp_path):
+        """测试清单中格式错误的行被忽略"""
+        (tmp_path / MANIFEST_NAME).write_text("00001.jpg\t10\nbroken\n00002.jpg\tx\n")
+
+        assert load_manifest(tmp_path) == {"00001.jpg": 10}
+
+
+class TestCheckpointPlugin:
+    """jmcomic 插件测试"""
+
+    def test_after_image_records_downloaded_pages_only(self, tmp_path):
+        """测试下载完成的图片被记录，已存在而跳过的图片不重复记录"""
+        option = create_jm_option(
+            JMOptionContext(cache_dir=str(tmp_path), output_format=OutputFormat.ZIP)
+        )
+        page = tmp_path / "00001.jpg"
+        page.write_bytes(b"a" * 4)
+
+        option.call_all_plugin(
+            "after_image",
+            image=SimpleNamespace(save_path=str(page), exists=False, cache=True),
+            downloader=None,
+        )
+        option.call_all_plugin(
+            "after_image",
+            image=SimpleNamespace(save_path=str(page), exists=True, cache=True),
+            downloader=None,
+        )
+
+        assert (tmp_path / MANIFEST_NAME).read_text() == "00001.jpg\t4\n"
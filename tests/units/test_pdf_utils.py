@@ -0,0 +1,80 @@
+"""
+pdf_utils 单元测试
+
+测试流式修改 PDF 的 MD5。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+from io import BytesIO
+from typing import Any, cast
+
+import img2pdf
+import pytest
+from PIL import Image
+
+pdf_utils = cast(Any, sys.modules["nonebot_plugin_jmdownloader.infra.pdf_utils"])
+modify_pdf_md5 = pdf_utils.modify_pdf_md5
+
+
+def _make_pdf(path) -> bytes:
+    output = BytesIO()
+    Image.new("RGB", (8, 8), "white").save(output, format="JPEG")
+    content = img2pdf.convert([output.getvalue()])
+    path.write_bytes(content)
+    return content
+
+
+def _md5(path) -> str:
+    return hashlib.md5(path.read_bytes()).hexdigest()
+
+
+class TestModifyPdfMd5:
+    """MD5 修改测试"""
+
+    def test_appends_incremental_trailer(self, tmp_path):
+        """测试原内容不变，追加的尾部引用原交叉引用表，每次结果不同"""
+        src = tmp_path / "src.pdf"
+        original = _make_pdf(src)
+
+        assert modify_pdf_md5(str(src), str(tmp_path / "a.pdf"))
+        assert modify_pdf_md5(str(src), str(tmp_path / "b.pdf"))
+
+        modified = (tmp_path / "a.pdf").read_bytes()
+        startxref = original.rsplit(b"startxref", 1)[1].split()[0]
+        assert modified.startswith(original)
+        assert modified.endswith(b"startxref\n" + startxref + b"\n%%EOF\n")
+        assert len({_md5(src), _md5(tmp_path / "a.pdf"), _md5(tmp_path / "b.pdf")}) == 3
+
+    def test_modified_pdf_still_opens(self, tmp_path):
+        """测试修改后的 PDF 仍可被解析"""
+        pikepdf = pytest.importorskip("pikepdf")
+        src = tmp_path / "src.pdf"
+        _make_pdf(src)
+
+        assert modify_pdf_md5(str(src), str(tmp_path / "out.pdf"))
+
+        with pikepdf.open(tmp_path / "out.pdf") as pdf:
+            assert len(pdf.pages) == 1
+
+    def test_falls_back_to_chunked_copy(self, tmp_path, monkeypatch):
+        """测试文件系统不支持零拷贝时回退到普通复制"""
+        src = tmp_path / "src.pdf"
+        original = _make_pdf(src)
+
+        def unsupported(*_args):
+            raise OSError("not supported")
+
+        monkeypatch.setattr(pdf_utils.os, "copy_file_range", unsupported, raising=False)
+
+        assert modify_pdf_md5(str(src), str(tmp_path / "out.pdf"))
+        assert (tmp_path / "out.pdf").read_bytes().startswith(original)
+
+    def test_missing_source_leaves_no_output(self, tmp_path):
+        """测试源文件不存在时返回 False 且不留下输出文件"""
+        output = tmp_path / "out.pdf"
+
+        assert not modify_pdf_md5(str(tmp_path / "missing.pdf"), str(output))
+        assert not output.exists()
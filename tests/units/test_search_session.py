@@ -6,7 +6,10 @@ SearchSession 单元测试
 
 from __future__ import annotations
 
-from nonebot_plugin_jmdownloader.core.search_session import SearchSession
+from nonebot_plugin_jmdownloader.core.search_session import (
+    SearchPreview,
+    SearchSession,
+)
 
 
 class TestSearchSessionBasic:
@@ -308,3 +311,23 @@ class TestPaginationWorkflow:
         page = session.get_current_page()
         assert len(page) == 20
         assert page[0] == "80"
+
+
+class TestSearchPreviews:
+    """搜索页结果信息测试"""
+
+    def test_current_previews_fall_back_to_id(self):
+        """测试没有搜索页数据的结果只包含 ID"""
+        session = SearchSession(query="test", results=["1", "2"], page_size=2)
+        session.add_previews([SearchPreview(id="1", title="t", author="a")])
+
+        previews = session.get_current_previews()
+
+        assert previews[0].title == "t"
+        assert previews[1] == SearchPreview(id="2")
+
+    def test_preview_completeness(self):
+        """测试缺少标签时需要请求详情"""
+        assert SearchPreview(id="1", title="t", author="a", tags=("x",)).is_complete
+        assert not SearchPreview(id="1", title="t", author="a").is_complete
+        assert not SearchPreview(id="1").is_complete
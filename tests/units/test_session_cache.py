@@ -1,11 +1,12 @@
 """
 SessionCache 单元测试
 
-测试搜索会话缓存的功能。
+测试搜索会话缓存和下一页预取的功能。
 """
 
 from __future__ import annotations
 
+import asyncio
 import time
 
 from nonebot_plugin_jmdownloader.infra.search_session import SessionCache
@@ -186,3 +187,105 @@ class TestSessionCacheIsolation:
 
         assert cache.get("user1") is None
         assert cache.get("user2") is not None
+
+
+class TestPrefetch:
+    """下一页预取测试"""
+
+    async def test_take_prefetched_result(self):
+        """测试取出与当前页匹配的预取结果"""
+        sessions = SessionCache()
+        session = sessions.create(1, "q", [str(i) for i in range(40)])
+        session.advance_page()
+
+        async def prepare():
+            return session.get_current_page()
+
+        sessions.start_prefetch(1, session, prepare)
+
+        assert await sessions.take_prefetched(1, session) == session.get_current_page()
+        assert await sessions.take_prefetched(1, session) is None
+
+    async def test_stale_page_is_discarded(self):
+        """测试页码已变化时丢弃预取结果"""
+        sessions = SessionCache()
+        session = sessions.create(1, "q", [str(i) for i in range(60)])
+
+        async def prepare():
+            return "page"
+
+        sessions.start_prefetch(1, session, prepare)
+        session.advance_page()
+
+        assert await sessions.take_prefetched(1, session) is None
+
+    async def test_failed_prefetch_returns_none(self):
+        """测试预取失败时返回 None"""
+        sessions = SessionCache()
+        session = sessions.create(1, "q", ["1"])
+
+        async def prepare():
+            raise OSError("boom")
+
+        sessions.start_prefetch(1, session, prepare)
+
+        assert await sessions.take_prefetched(1, session) is None
+
+    async def test_remove_and_replace_cancel_prefetch(self):
+        """测试移除或替换会话时取消预取"""
+        sessions = SessionCache()
+        started = asyncio.Event()
+
+        async def prepare():
+            started.set()
+            await asyncio.Event().wait()
+
+        session = sessions.create(1, "q", ["1"])
+        sessions.start_prefetch(1, session, prepare)
+        task = sessions._prefetches["1"].task
+        await started.wait()
+        sessions.remove(1)
+        await asyncio.sleep(0)
+        assert task.cancelled()
+
+        session = sessions.create(1, "q", ["1"])
+        sessions.start_prefetch(1, session, prepare)
+        task = sessions._prefetches["1"].task
+        sessions.set(1, session)
+        assert not task.cancelled()
+        sessions.create(1, "other", ["2"])
+        await asyncio.sleep(0)
+        assert task.cancelled()
+
+    async def test_expired_session_cancels_prefetch(self):
+        """测试会话过期时无需访问或定时清理即取消预取"""
+        sessions = SessionCache(ttl=0.01)
+        session = sessions.create(1, "q", ["1"])
+
+        async def prepare():
+            await asyncio.Event().wait()
+
+        sessions.start_prefetch(1, session, prepare)
+        task = sessions._prefetches["1"].task
+        await asyncio.sleep(0.05)
+
+        assert task.cancelled()
+        assert sessions.expire() == 0
+
+    async def test_renewed_session_keeps_prefetch(self):
+        """测试会话续期后预取在新的过期时间之前保留"""
+        sessions = SessionCache(ttl=0.05)
+        session = sessions.create(1, "q", ["1"])
+
+        async def prepare():
+            await asyncio.Event().wait()
+
+        sessions.start_prefetch(1, session, prepare)
+        task = sessions._prefetches["1"].task
+        await asyncio.sleep(0.03)
+        sessions.set(1, session)
+        await asyncio.sleep(0.03)
+
+        assert not task.done()
+        await asyncio.sleep(0.05)
+        assert task.cancelled()
@@ -0,0 +1,88 @@
+"""
+SingleFlight 单元测试
+
+测试并发请求合并、异常传递和计数。
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from nonebot_plugin_jmdownloader.infra.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """SingleFlight 基础功能测试"""
+
+    async def test_concurrent_calls_share_one_run(self):
+        """测试相同 key 的并发调用只执行一次"""
+        flight: SingleFlight[str, int] = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def work() -> int:
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return 42
+
+        waiters = [asyncio.create_task(flight.run("a", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*waiters) == [42, 42, 42]
+        assert calls == 1
+        assert flight.stats() == {"leaders": 1, "joins": 2, "inflight": 0}
+
+    async def test_different_keys_run_independently(self):
+        """测试不同 key 互不合并"""
+        flight: SingleFlight[str, str] = SingleFlight()
+
+        async def echo(value: str) -> str:
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(
+            flight.run("a", lambda: echo("a")),
+            flight.run("b", lambda: echo("b")),
+        )
+
+        assert results == ["a", "b"]
+        assert flight.leaders == 2
+        assert flight.joins == 0
+
+    async def test_exception_propagates_to_all_waiters(self):
+        """测试异常传递给所有等待者，且不会残留进行中的任务"""
+        flight: SingleFlight[str, int] = SingleFlight()
+
+        async def fail() -> int:
+            await asyncio.sleep(0)
+            raise OSError("boom")
+
+        results = await asyncio.gather(
+            flight.run("a", fail), flight.run("a", fail), return_exceptions=True
+        )
+
+        assert all(isinstance(r, OSError) for r in results)
+        assert "a" not in flight
+
+    async def test_leader_cancel_does_not_cancel_followers(self):
+        """测试发起者被取消时，其他等待者仍能拿到结果"""
+        flight: SingleFlight[str, int] = SingleFlight()
+        release = asyncio.Event()
+
+        async def work() -> int:
+            await release.wait()
+            return 1
+
+        leader = asyncio.create_task(flight.run("a", work))
+        follower = asyncio.create_task(flight.run("a", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+
+        assert await follower == 1
+        with pytest.raises(asyncio.CancelledError):
+            await leader